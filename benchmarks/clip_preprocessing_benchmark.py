@@ -0,0 +1,162 @@
+"""
+MICRO-BENCHMARK AND EQUIVALENCE CHECK OF THE CLIP-LEVEL PREPROCESSING PRIMITIVES
+
+Compares the clip-level crop, flip, resize, mean subtraction and oversampling functions of preprocessing_utils, which
+process every frame of a clip (or a batch of clips) with a single op, against the previous implementations which ran
+the per-image functions on each frame inside tf.map_fn. Deterministic primitives must produce identical frames, the
+random flip must return either the clip or its mirror image.
+
+Run from the root of the repository:
+    python -m benchmarks.clip_preprocessing_benchmark --frames 16 --height 240 --width 320
+"""
+
+import time
+import argparse
+
+import numpy      as np
+import tensorflow as tf
+
+from utils.preprocessing_utils import *
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--frames', action='store', type=int, default=16,
+        help = 'Number of frames of each synthetic clip')
+
+parser.add_argument('--height', action='store', type=int, default=240,
+        help = 'Frame height of the synthetic clips')
+
+parser.add_argument('--width', action='store', type=int, default=320,
+        help = 'Frame width of the synthetic clips')
+
+parser.add_argument('--batchSize', action='store', type=int, default=4,
+        help = 'Number of clips in the batched (5-D) configuration')
+
+parser.add_argument('--repeats', action='store', type=int, default=10,
+        help = 'Number of times each primitive is run, the fastest run is reported')
+
+
+def _map_fn_crop_clip(clip, offset_height, offset_width, crop_height, crop_width):
+    """
+    Previous implementation of crop_clip, kept as the reference for this benchmark
+    """
+    original_shape = tf.shape(clip)
+    clip = tf.map_fn(lambda img: crop(img, offset_height, offset_width, crop_height, crop_width), clip)
+    cropped_shape = tf.stack([original_shape[0], crop_height, crop_width, original_shape[3]])
+    return tf.reshape(clip, cropped_shape)
+
+
+def _map_fn_central_crop_clip(clip, crop_height, crop_width):
+    """
+    Previous implementation of central_crop_clip, kept as the reference for this benchmark
+    """
+    original_shape = tf.shape(clip)
+
+    offset_height = (original_shape[1] - crop_height) / 2
+    offset_width  = (original_shape[2] - crop_width) / 2
+
+    return _map_fn_crop_clip(clip, offset_height, offset_width, crop_height, crop_width)
+
+
+def _map_fn_random_flip_left_right_clip(clip):
+    """
+    Previous implementation of random_flip_left_right_clip, kept as the reference for this benchmark
+    """
+    to_flip = tf.random_uniform(dtype=tf.float32, minval=0, maxval=1, shape=np.asarray([1]))[0]
+    clip = tf.map_fn(lambda img: tf.cond(tf.greater_equal(to_flip, 0.5),
+                                    lambda: tf.image.flip_left_right(img),
+                                    lambda:tf.to_float(img)),
+                                    clip)
+    return clip
+
+
+def _map_fn_oversample_clip(clip, crop_dims):
+    """
+    Previous oversampling of every frame in the TSN evaluation preprocessing, kept as the reference for this benchmark
+    """
+    clip = tf.pad(tf.expand_dims(clip, axis=1), [[0,0],[0,9],[0,0],[0,0],[0,0]])
+    clip = tf.map_fn(lambda img: oversample(tf.expand_dims(tf.gather(img, 0), 0), crop_dims), clip)
+
+    return tf.reshape(clip, [-1, crop_dims[0], crop_dims[1], 3])
+
+
+def _primitives(clip, batch, height, width):
+    """
+    Return a list of (name, reference tensor, clip-level tensor, deterministic) tuples
+    """
+    crop_h = height/2
+    crop_w = width/2
+
+    return [('crop_clip',                     _map_fn_crop_clip(clip, 7, 11, crop_h, crop_w),
+                                              crop_clip(clip, 7, 11, crop_h, crop_w), True),
+            ('central_crop_clip',             _map_fn_central_crop_clip(clip, crop_h, crop_w),
+                                              central_crop_clip(clip, crop_h, crop_w), True),
+            ('random_flip_left_right_clip',   _map_fn_random_flip_left_right_clip(clip),
+                                              random_flip_left_right_clip(clip), False),
+            ('resize_clip',                   tf.map_fn(lambda img: resize(img, 128, 171), clip),
+                                              resize_clip(clip, 128, 171), True),
+            ('aspect_preserving_resize_clip', tf.map_fn(lambda img: aspect_preserving_resize(img, 256), clip),
+                                              aspect_preserving_resize_clip(clip, 256), True),
+            ('mean_clip_subtraction',         tf.map_fn(lambda img: mean_image_subtraction(img, [123., 117., 104.]), clip),
+                                              mean_clip_subtraction(clip, [123., 117., 104.]), True),
+            ('oversample_clip',               _map_fn_oversample_clip(clip, [crop_h, crop_w]),
+                                              oversample_clip(clip, [crop_h, crop_w]), True),
+            ('resize_clip (batched)',         tf.map_fn(lambda c: tf.map_fn(lambda img: resize(img, 128, 171), c), batch),
+                                              resize_clip(batch, 128, 171), True),
+            ('crop_clip (batched)',           tf.map_fn(lambda c: _map_fn_crop_clip(c, 7, 11, crop_h, crop_w), batch),
+                                              crop_clip(batch, 7, 11, crop_h, crop_w), True)]
+
+
+def _time_primitive(sess, tensor, repeats):
+    """
+    Return the fastest wall clock time over repeats runs and the output of the last run
+    """
+
+    best = None
+
+    for _ in range(repeats):
+        start  = time.time()
+        output = sess.run(tensor)
+        took   = time.time() - start
+
+        if best is None or took < best:
+            best = took
+
+        # END IF
+
+    # END FOR
+
+    return best, output
+
+
+if __name__=="__main__":
+    args  = parser.parse_args()
+    clips = np.random.randint(0, 256, size=(args.batchSize, args.frames, args.height, args.width, 3)).astype(np.float32)
+
+    # Clips are kept in a variable so that feeding them is not part of the measured time
+    clips_tensor = tf.Variable(clips, trainable=False)
+    clip_tensor  = clips_tensor[0]
+    sess         = tf.Session()
+
+    print "%-32s %16s %16s %9s" % ('primitive', 'map_fn (ms/clip)', 'clip (ms/clip)', 'speedup')
+
+    primitives = _primitives(clip_tensor, clips_tensor, args.height, args.width)
+    sess.run(tf.global_variables_initializer())
+
+    for name, old_tensor, new_tensor, deterministic in primitives:
+        old_time, old_output = _time_primitive(sess, old_tensor, args.repeats)
+        new_time, new_output = _time_primitive(sess, new_tensor, args.repeats)
+
+        if deterministic:
+            assert np.array_equal(old_output, new_output), name + ' differs from the reference implementation'
+
+        else:
+            assert np.array_equal(new_output, clips[0]) or np.array_equal(new_output, clips[0][:,:,::-1,:]), name + ' is neither the clip nor its mirror image'
+
+        # END IF
+
+        clips_per_run = args.batchSize if 'batched' in name else 1
+
+        print "%-32s %16.2f %16.2f %8.1fx" % (name, 1000*old_time/clips_per_run, 1000*new_time/clips_per_run, old_time/new_time)
+
+    # END FOR
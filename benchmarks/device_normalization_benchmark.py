@@ -0,0 +1,134 @@
+"""
+BENCHMARK AND EQUIVALENCE CHECK OF DEVICE NORMALIZATION (--deviceNormalization)
+
+Every model preprocesses the same synthetic clip for evaluation twice: on the host in float32 (the clip queued by
+default) and on the host in uint8 followed by the normalization the model applies on the device at the head of
+inference. The benchmark reports the size of a queued clip and the time of the host preprocessing of each path, and
+checks that both paths only differ by the rounding of the uint8 clip.
+
+Run from the root of the repository:
+    python -m benchmarks.device_normalization_benchmark --models c3d i3d resnet tsn
+"""
+
+import time
+import argparse
+
+import numpy      as np
+import tensorflow as tf
+
+from models                      import *
+from utils.temporal_index_utils  import TemporalPlan
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--models', nargs='+', type=str, default=['c3d', 'i3d', 'resnet', 'tsn'],
+        help = 'Models whose preprocessing is compared')
+
+parser.add_argument('--frames', action='store', type=int, default=100,
+        help = 'Number of frames of the synthetic video')
+
+parser.add_argument('--height', action='store', type=int, default=240,
+        help = 'Frame height of the synthetic video')
+
+parser.add_argument('--width', action='store', type=int, default=320,
+        help = 'Frame width of the synthetic video')
+
+parser.add_argument('--repeats', action='store', type=int, default=5,
+        help = 'Number of times each preprocessing is run, the fastest run is reported')
+
+# Evaluation inputs of every model: length of the clip cut from the video (0 for the entire video), number of frames,
+# frame size and largest step of a pixel value after normalization
+_MODEL_INPUTS = {'c3d':    (16, 16, 112, 1.0),
+                 'i3d':    (0,  64, 224, 2./255),
+                 'resnet': (0,  50, 224, 1.0),
+                 'tsn':    (0,  50, 224, 1.0)}
+
+
+def _build_paths(model_name, video, input_dims, size):
+    """
+    Build the float32 and uint8 preprocessing of one clip of video, both share the temporal sampling of the clip
+
+    Return:
+        Float32 clip, uint8 clip and the uint8 clip normalized as on the device
+    """
+    model = models_import.create_model_object(modelName = model_name, inputAlpha = 1.0, modelAlpha = 1.0, clipLength = -1, numVids = 1,
+                                              numEpochs = 1, batchSize = 1, numClips = 1, numGpus = 1, train = 0, expName = 'benchmark',
+                                              outputDims = 51, inputDims = input_dims, preprocMethod = 'default', dropoutRate = 0.5, freeze = 0,
+                                              loadWeights = 'default', verbose = 0)
+
+    frames = tf.shape(video)[0]
+    plan   = TemporalPlan(frames)
+
+    fused = model.add_temporal_steps(plan, input_dims, input_dims, False)
+
+    clip = plan.gather(video)
+
+    float_clip = model.preprocess_tfrecords(clip, tf.shape(clip)[0], video.shape[1], video.shape[2], 3, input_dims, 51, input_dims, [size, size], 0, False, 0, fused)
+
+    assert model.enable_device_normalization(), model_name + ' does not support device normalization'
+
+    uint8_clip      = model.preprocess_tfrecords(clip, tf.shape(clip)[0], video.shape[1], video.shape[2], 3, input_dims, 51, input_dims, [size, size], 0, False, 0, fused)
+    normalized_clip = model.normalize_inputs(tf.expand_dims(uint8_clip, 0), False, input_dims)[0]
+
+    return float_clip, uint8_clip, normalized_clip
+
+
+def _time_run(sess, tensor, repeats):
+    """
+    Return the fastest wall clock time over repeats runs
+    """
+    best = None
+
+    for _ in range(repeats):
+        start = time.time()
+        sess.run(tensor)
+        took  = time.time() - start
+
+        if best is None or took < best:
+            best = took
+
+        # END IF
+
+    # END FOR
+
+    return best
+
+
+if __name__=="__main__":
+    args  = parser.parse_args()
+    video = np.random.RandomState(0).randint(0, 256, size=(args.frames, args.height, args.width, 3)).astype(np.uint8)
+
+    print "%-8s %16s %16s %16s %16s %12s" % ('model', 'float32 (MB)', 'uint8 (MB)', 'float32 (ms)', 'uint8 (ms)', 'max diff')
+
+    for model_name in args.models:
+        clip_length, input_dims, size, step = _MODEL_INPUTS[model_name]
+
+        graph = tf.Graph()
+
+        with graph.as_default():
+            video_tensor = tf.constant(video[:clip_length] if clip_length > 0 else video)
+
+            float_clip, uint8_clip, normalized_clip = _build_paths(model_name, video_tensor, input_dims, size)
+
+            sess = tf.Session()
+
+            # Both paths are evaluated in a single run so that they share any random temporal offset
+            float_output, uint8_output, normalized_output = sess.run([float_clip, uint8_clip, normalized_clip])
+
+            float_time = _time_run(sess, float_clip, args.repeats)
+            uint8_time = _time_run(sess, uint8_clip, args.repeats)
+
+            sess.close()
+
+        # END WITH
+
+        assert uint8_output.dtype == np.uint8 and uint8_output.shape == float_output.shape, model_name + ' uint8 clip differs in type or shape'
+
+        # Rounding the uint8 clip moves every pixel by at most half a step of the normalized values
+        max_diff = np.abs(normalized_output - float_output).max()
+
+        assert max_diff <= 0.5*step + 1e-4, model_name + ' normalized uint8 clip differs from the float32 clip by more than rounding'
+
+        print "%-8s %16.2f %16.2f %16.1f %16.1f %12.4f" % (model_name, float_output.nbytes/1e6, uint8_output.nbytes/1e6, 1000*float_time, 1000*uint8_time, max_diff)
+
+    # END FOR
@@ -0,0 +1,269 @@
+"""
+MICRO-BENCHMARK AND EQUIVALENCE CHECK OF CLIP EXTRACTION IN THE INPUT PIPELINE
+
+Compares the clip extraction of the loader, the clip windows of a TemporalPlan gathered with a single index matrix,
+against the previous implementation which looped the video with tf.tile and sliced one clip at a time inside tf.map_fn
+after casting the video to int32. Deterministic clip settings must produce identical clips, randomly offset clips are
+checked to be contiguous windows of the (looped) video.
+
+Run from the root of the repository:
+    python -m benchmarks.extract_clips_benchmark --frames 300 --height 240 --width 320
+
+The equivalence checks alone run on a small video through check_clip_extraction:
+    python -c "from benchmarks.extract_clips_benchmark import check_clip_extraction; check_clip_extraction()"
+"""
+
+import time
+import argparse
+
+import numpy      as np
+import tensorflow as tf
+
+from utils.temporal_index_utils import TemporalPlan
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--frames', action='store', type=int, default=300,
+        help = 'Number of frames of the synthetic video')
+
+parser.add_argument('--height', action='store', type=int, default=240,
+        help = 'Frame height of the synthetic video')
+
+parser.add_argument('--width', action='store', type=int, default=320,
+        help = 'Frame width of the synthetic video')
+
+parser.add_argument('--repeats', action='store', type=int, default=5,
+        help = 'Number of times each configuration is run, the fastest run is reported')
+
+# (num_clips, clip_offset, clip_length, video_offset, clip_stride), includes clips that require looping the video
+CONFIGURATIONS = [(1,  'none',   16,  'none', 0),
+                  (5,  'none',   16,  'none', 0),
+                  (10, 'none',   64,  'none', 8),
+                  (3,  'none',   250, 'none', -4),
+                  (-1, 'none',   16,  'none', 0),
+                  (-1, 'none',   32,  'none', 16),
+                  (-1, 'none',   500, 'none', 0),
+                  (4,  'random', 16,  'none', 0),
+                  (2,  'random', 500, 'none', 0),
+                  (3,  'none',   64,  'random', 0)]
+
+
+def _plan_extract_clips(video, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride):
+    """
+    Clip extraction of the loader: the clip windows of a TemporalPlan gathered from the video
+    """
+    plan = TemporalPlan(frames)
+    plan.clip_windows(num_clips, clip_offset, clip_length, video_offset, clip_stride)
+
+    return plan.gather(video)
+
+
+def _map_fn_extract_clips(video, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride, height, width, channel):
+    """
+    Previous implementation of the clip extraction, kept as the reference for this benchmark
+    Args:
+        :video:                The video tensor that needs to be split into clips
+        :frames:               The number of frames of the video
+        :num_clips:            Number of clips to break video into
+        :clip_offset:          "none" or "random" indicating where to begin selecting video clips
+        :clip_length:          Length of clips to cut video into, -1 indicates using the entire video as one clip')
+        :clip_stride:          Number of frames that overlap between clips, 0 indicates no overlap and negative values indicate a gap of frames between clips
+
+
+    Return:
+        A tensor containing the clip(s) extracted from the video (shape [clip_number, clip_frames, height, width, channel])
+    """
+    if video_offset == 'random':
+        video_start = tf.random_uniform([], maxval=frames-1, dtype=tf.int32)
+
+    else:
+        video_start = 0
+
+    if clip_offset == 'random':
+        video = tf.cond(tf.greater(clip_length, frames),
+                        lambda: _loop_video_with_offset(video, video, 0, frames, height, width, channel, clip_length),
+                        lambda: video)
+
+        clip_begin = tf.random_uniform([num_clips], minval=0, maxval=tf.shape(video)[0]-clip_length+1, dtype=tf.int32)
+        rs = tf.reshape(clip_begin, [num_clips,1,1,1])
+        video = tf.to_int32(video)
+        clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+
+    else:
+        if num_clips > 0:
+            frames_needed = clip_length + (clip_length-clip_stride) * (num_clips-1)
+            video = tf.cond(tf.greater(frames_needed, frames-video_start),
+                            lambda: _loop_video_with_offset(video[video_start:,:,:,:], video, frames-video_start, frames, height, width, channel, frames_needed),
+                            lambda: video[video_start:,:,:,:])
+
+            clip_begin = tf.range(0, frames_needed, delta = clip_length-clip_stride)[:num_clips]
+
+            rs = tf.reshape(clip_begin, [num_clips,1,1,1])
+            video = tf.to_int32(video)
+            clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+
+        else:
+            # Get total number of clips possible given clip_length stride and offset
+
+            # Need minimum one clip: loop video until at least have clip_length frames
+            video = tf.cond(tf.greater(clip_length, frames-video_start),
+                            lambda: _loop_video_with_offset(video[video_start:,:,:,:], video, frames-video_start, frames, height, width, channel, clip_length+video_start),
+                            lambda: video[video_start:,:,:,:])
+
+            number_of_clips = tf.cond(tf.greater(clip_length, frames-video_start),
+                            lambda: 1,
+                            lambda: (frames-video_start-clip_length) / (clip_length - clip_stride) + 1)
+
+            clip_begin = tf.range(0, number_of_clips*(clip_length-clip_stride), delta=clip_length-clip_stride)[:number_of_clips]
+
+            rs = tf.reshape(clip_begin, [number_of_clips,1,1,1])
+
+            video = tf.to_int32(video)
+            clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+
+    return clips
+
+
+def _loop_video_with_offset(offset_tensor, input_data_tensor, offset_frames, frames, height, width, channel, footprint):
+    """
+    Loop the video the number of times necessary for the number of frames to be > footprint
+    Args:
+        :offset_tensor:     Raw input data from offset frame number
+        :input_data_tensor: Raw input data
+        :frames:            Total number of frames
+        :height:            Height of frame
+        :width:             Width of frame
+        :channel:           Total number of color channels
+        :footprint:         Total length of video to be extracted before sampling down
+
+    Return:
+        Looped video
+    """
+
+    loop_factor       = tf.cast(tf.add(tf.divide(tf.subtract(footprint, offset_frames), frames), 1), tf.int32)
+    loop_stack        = tf.stack([loop_factor,1,1,1])
+    input_data_tensor = tf.tile(input_data_tensor, loop_stack)
+    reshape_stack     = tf.stack([tf.multiply(frames, loop_factor),height,width,channel])
+    input_data_looped = tf.reshape(input_data_tensor, reshape_stack)
+
+    output_data       = tf.concat([offset_tensor, input_data_looped], axis = 0)
+
+    return output_data
+
+
+
+def _is_looped_window(clip, frames):
+    """
+    Check that a clip of frame numbers is a contiguous window of the video, wrapping around its end
+    """
+
+    return np.array_equal(clip, (clip[0] + np.arange(clip.shape[0])) % frames)
+
+
+def _time_extract(sess, clips_tensor, feed_dict, repeats):
+    """
+    Return the fastest wall clock time over repeats runs and the clips of the last run
+    """
+
+    best = None
+
+    for _ in range(repeats):
+        start = time.time()
+        clips = sess.run(clips_tensor, feed_dict=feed_dict)
+        took  = time.time() - start
+
+        if best is None or took < best:
+            best = took
+
+        # END IF
+
+    # END FOR
+
+    return best, clips
+
+
+def _check_clips(sess, configuration, old_clips, new_clips, frames):
+    """
+    Check the clips extracted by the loader from a video of frames frames against the clips of the reference implementation
+    """
+    num_clips, clip_offset, clip_length, video_offset, clip_stride = configuration
+
+    assert new_clips.dtype == np.uint8, 'Clips must keep the dtype of the video'
+
+    if clip_offset == 'none' and video_offset == 'none':
+        assert np.array_equal(old_clips, new_clips), 'Clips differ from the reference implementation'
+
+    else:
+        # Video whose frame i only contains the value i, used to verify randomly selected clips
+        numbered = np.arange(frames, dtype=np.int32).reshape(frames, 1, 1, 1)
+        clips    = sess.run(_plan_extract_clips(tf.constant(numbered), frames, num_clips, clip_offset, clip_length, video_offset, clip_stride))
+
+        assert old_clips.shape == new_clips.shape, 'Clip shapes differ from the reference implementation'
+        assert all(_is_looped_window(clip.reshape(-1), frames) for clip in clips), 'Randomly selected clips are not contiguous windows of the video'
+
+    # END IF
+
+
+def _build_extractions(video_tensor, configuration, height, width):
+    """
+    Return the clips tensors of the reference implementation and of the loader for one configuration
+    """
+    num_clips, clip_offset, clip_length, video_offset, clip_stride = configuration
+    frames = tf.shape(video_tensor)[0]
+
+    old_tensor = _map_fn_extract_clips(video_tensor, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride, height, width, 3)
+    new_tensor = _plan_extract_clips(video_tensor, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride)
+
+    return old_tensor, new_tensor
+
+
+def check_clip_extraction(frames=300, height=8, width=8):
+    """
+    Check the clip extraction of the loader against the reference implementation for every configuration, without timing
+    Args:
+        :frames: Number of frames of the synthetic video
+        :height: Frame height of the synthetic video
+        :width:  Frame width of the synthetic video
+    """
+    video = np.random.RandomState(0).randint(0, 256, size=(frames, height, width, 3)).astype(np.uint8)
+
+    with tf.Graph().as_default():
+        video_tensor = tf.placeholder(tf.uint8, [None, None, None, 3])
+        sess         = tf.Session()
+
+        for configuration in CONFIGURATIONS:
+            old_tensor, new_tensor = _build_extractions(video_tensor, configuration, height, width)
+            old_clips, new_clips   = sess.run([old_tensor, new_tensor], {video_tensor: video})
+
+            _check_clips(sess, configuration, old_clips, new_clips, frames)
+
+        # END FOR
+
+        sess.close()
+
+    # END WITH
+
+    print "Clip extraction matches the reference implementation for ", len(CONFIGURATIONS), " configurations"
+
+
+if __name__=="__main__":
+    args  = parser.parse_args()
+    video = np.random.randint(0, 256, size=(args.frames, args.height, args.width, 3)).astype(np.uint8)
+
+    video_tensor    = tf.placeholder(tf.uint8, [None, None, None, 3])
+    sess            = tf.Session()
+
+    print "%-44s %12s %12s %9s" % ('num_clips, clip_offset, length, video, stride', 'map_fn (s)', 'gather (s)', 'speedup')
+
+    for configuration in CONFIGURATIONS:
+        num_clips, clip_offset, clip_length, video_offset, clip_stride = configuration
+        old_tensor, new_tensor = _build_extractions(video_tensor, configuration, args.height, args.width)
+
+        old_time, old_clips = _time_extract(sess, old_tensor, {video_tensor: video}, args.repeats)
+        new_time, new_clips = _time_extract(sess, new_tensor, {video_tensor: video}, args.repeats)
+
+        _check_clips(sess, configuration, old_clips, new_clips, args.frames)
+
+        print "%-44s %12.4f %12.4f %8.1fx" % (str((num_clips, clip_offset, clip_length, video_offset, clip_stride)), old_time, new_time, old_time/new_time)
+
+    # END FOR
@@ -0,0 +1,155 @@
+"""
+STEP TIME BENCHMARK OF THE GRADIENT AGGREGATION MODES OF train.py (--gradAggregation)
+
+The trainable variables of a model (built with --freeze 1 so that every layer is trained) are recreated on a host with
+several CPU devices standing in for gpus. Every tower produces a synthetic gradient for each variable, the gradients
+are averaged by each aggregation mode and applied with gradient descent. The benchmark reports the number of ops built
+for the aggregation and the time of a training step, and checks that every mode produces the same averaged gradients.
+
+Run from the root of the repository:
+    python -m benchmarks.gradient_aggregation_benchmark --model resnet --numDevices 4 --gradBucketMB 4 8 32
+"""
+
+import time
+import argparse
+
+import numpy      as np
+import tensorflow as tf
+
+from models                import *
+from utils.gradient_utils  import average_gradients, fused_average_gradients, gradient_buckets
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--model', action='store', default='resnet',
+        help = 'Model whose trainable variables are aggregated (c3d, tsn, i3d, resnet)')
+
+parser.add_argument('--inputDims', action='store', type=int, default=16,
+        help = 'Number of frames input to the model when building its variables')
+
+parser.add_argument('--size', action='store', type=int, default=224,
+        help = 'Frame height and width input to the model when building its variables')
+
+parser.add_argument('--numDevices', action='store', type=int, default=4,
+        help = 'Number of CPU devices, one tower per device')
+
+parser.add_argument('--gradBucketMB', nargs='+', type=int, default=[4, 8, 32],
+        help = 'Bucket sizes in megabytes of the fused aggregation')
+
+parser.add_argument('--steps', action='store', type=int, default=10,
+        help = 'Number of timed training steps, after one warm up step')
+
+
+def _variable_shapes(model_name, input_dims, size):
+    """
+    Build the inference graph of a model and return the shapes of its trainable variables
+    """
+    graph = tf.Graph()
+
+    with graph.as_default():
+        model = models_import.create_model_object(modelName = model_name, inputAlpha = 1.0, modelAlpha = 1.0, clipLength = input_dims, numVids = 1,
+                                                  numEpochs = 1, batchSize = 1, numClips = 1, numGpus = 1, train = 1, expName = 'benchmark',
+                                                  outputDims = 51, inputDims = input_dims, preprocMethod = 'default', dropoutRate = 0.5, freeze = 1,
+                                                  loadWeights = 'default', verbose = 0)
+
+        model.inference(tf.zeros([1, input_dims, size, size, 3]), True, input_dims, 51, input_dims, 'tower_0/')
+
+        shapes = [var.get_shape().as_list() for var in tf.trainable_variables()]
+
+    # END WITH
+
+    return shapes
+
+
+def _build_step(shapes, devices, aggregation, bucket_bytes):
+    """
+    Build a training step whose towers produce synthetic gradients averaged by the selected aggregation
+
+    Return:
+        Training op, averaged gradient tensors, number of reductions across towers and number of ops created for the aggregation
+    """
+    with tf.device(devices[0]):
+        variables = [tf.Variable(tf.random_uniform(shape, seed=var_idx), name='var_'+str(var_idx)) for var_idx, shape in enumerate(shapes)]
+
+    # END WITH
+
+    tower_grads = []
+
+    for tower_idx, device in enumerate(devices):
+        with tf.device(device):
+            tower_grads.append([(var * float(tower_idx + 1), var) for var in variables])
+
+        # END WITH
+
+    # END FOR
+
+    ops_before = len(tf.get_default_graph().get_operations())
+
+    if aggregation == 'concat':
+        gradients  = average_gradients(tower_grads)
+        reductions = len(variables)
+
+    else:
+        gradients  = fused_average_gradients(tower_grads, devices, bucket_bytes)
+        reductions = len(gradient_buckets(tower_grads[0], bucket_bytes))
+
+    # END IF
+
+    aggregation_ops = len(tf.get_default_graph().get_operations()) - ops_before
+    train_op        = tf.train.GradientDescentOptimizer(1e-6).apply_gradients(gradients)
+
+    return train_op, [grad for grad, _ in gradients], reductions, aggregation_ops
+
+
+if __name__=="__main__":
+    args = parser.parse_args()
+
+    shapes  = _variable_shapes(args.model, args.inputDims, args.size)
+    devices = ['/cpu:'+str(device_idx) for device_idx in range(args.numDevices)]
+    config  = tf.ConfigProto(device_count={'CPU': args.numDevices}, inter_op_parallelism_threads=max(args.numDevices, 2))
+
+    print "Model %s: %d trainable variables, %.1fM parameters, %d towers" % (args.model, len(shapes), sum(np.prod(shape) for shape in shapes)/1e6, args.numDevices)
+    print
+    print "%-22s %10s %16s %14s" % ('aggregation', 'reductions', 'aggregation ops', 'step time (ms)')
+
+    reference = None
+
+    for aggregation, bucket_mb in [('concat', 0)] + [('fused', bucket_mb) for bucket_mb in args.gradBucketMB]:
+        graph = tf.Graph()
+
+        with graph.as_default():
+            train_op, gradients, reductions, aggregation_ops = _build_step(shapes, devices, aggregation, bucket_mb*1024*1024)
+
+            sess = tf.Session(config=config)
+            sess.run(tf.global_variables_initializer())
+
+            # The averaged gradients of every mode must match before any update is applied
+            averaged = sess.run(gradients)
+
+            if reference is None:
+                reference = averaged
+
+            else:
+                assert all(np.allclose(grad, reference_grad, rtol=1e-5, atol=1e-6) for grad, reference_grad in zip(averaged, reference)), 'Fused aggregation differs from concat aggregation'
+
+            # END IF
+
+            sess.run(train_op)
+            start = time.time()
+
+            for _ in range(args.steps):
+                sess.run(train_op)
+
+            # END FOR
+
+            step_time = (time.time() - start) / args.steps
+
+            sess.close()
+
+        # END WITH
+
+        name = aggregation if aggregation == 'concat' else aggregation + ' (' + str(bucket_mb) + ' MB)'
+
+        print "%-22s %10d %16d %14.1f" % (name, reductions, aggregation_ops, 1000*step_time)
+
+    # END FOR
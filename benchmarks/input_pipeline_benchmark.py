@@ -0,0 +1,149 @@
+"""
+THROUGHPUT BENCHMARK OF THE INPUT PIPELINES AVAILABLE IN load_dataset
+
+Compares the queue runner pipeline against the tf.data pipeline (--inputPipeline dataset) in clips per second.
+Synthetic videos are written as tfrecords to a temporary directory and loaded through load_dataset with a small
+stand-in model whose preprocessing resizes and crops each clip, similar to the models in this repository.
+The tfrecords are also converted to a memory-mapped video store and both pipelines are timed reading from the store.
+
+Run from the root of the repository:
+    python -m benchmarks.input_pipeline_benchmark --numVideos 64 --numParallelCalls 1 4 8
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy      as np
+import tensorflow as tf
+
+from utils.generate_tfrecords_dataset import save_tfrecords
+from utils.convert_tfrecords_to_video_store import convert_tfrecords
+from utils.load_dataset_tfrecords     import load_dataset
+from utils.preprocessing_utils        import resize_clip, central_crop_clip
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--numVideos', action='store', type=int, default=64,
+        help = 'Number of synthetic videos written as tfrecords')
+
+parser.add_argument('--frames', action='store', type=int, default=120,
+        help = 'Number of frames of each synthetic video')
+
+parser.add_argument('--height', action='store', type=int, default=240,
+        help = 'Frame height of the synthetic videos')
+
+parser.add_argument('--width', action='store', type=int, default=320,
+        help = 'Frame width of the synthetic videos')
+
+parser.add_argument('--clipLength', action='store', type=int, default=16,
+        help = 'Length of clips cut out of each video')
+
+parser.add_argument('--numClips', action='store', type=int, default=4,
+        help = 'Number of clips cut out of each video')
+
+parser.add_argument('--size', action='store', type=int, default=112,
+        help = 'Output size of preprocessed frames')
+
+parser.add_argument('--batchSize', action='store', type=int, default=8,
+        help = 'Number of clips in each batch')
+
+parser.add_argument('--numBatches', action='store', type=int, default=50,
+        help = 'Number of batches timed for each pipeline')
+
+parser.add_argument('--numParallelCalls', nargs='+', type=int, default=[1, 4, 8],
+        help = 'Values of num_parallel_calls (and num_parallel_reads) benchmarked for the tf.data pipeline')
+
+
+class _BenchmarkModel(object):
+    """
+    Stand-in for a model object, only provides the preprocessing used by load_dataset
+    """
+
+    def preprocess_tfrecords(self, input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step):
+        input_data_tensor = resize_clip(input_data_tensor, 128, 171)
+        input_data_tensor = central_crop_clip(input_data_tensor, size[0], size[1])
+
+        return input_data_tensor / 255.
+
+
+def _write_synthetic_tfrecords(save_dir, num_videos, frames, height, width):
+    """
+    Write num_videos tfrecords of random uint8 frames
+    """
+
+    for video_idx in range(num_videos):
+        data = np.random.randint(0, 256, size=(frames, height, width, 3)).astype(np.uint8)
+        save_tfrecords(data, video_idx % 10, 'synthetic_%04d' % video_idx, save_dir)
+
+    # END FOR
+
+
+def _clips_per_second(data_dir, args, input_pipeline, num_parallel_calls=1):
+    """
+    Build load_dataset in a fresh graph and time args.numBatches batches after a short warm up
+    """
+
+    tf.reset_default_graph()
+
+    video_step = tf.Variable(1.0, name='video_step', trainable=False)
+    size       = [args.size, args.size]
+
+    input_data_tensor, labels_tensor, names_tensor = load_dataset(_BenchmarkModel(), 1, args.batchSize, 10, args.clipLength, args.clipLength, size, data_dir, 'UCF101', False,
+                                                                  args.clipLength, 'none', 'none', args.numClips, 0, video_step, verbose=False, input_pipeline=input_pipeline,
+                                                                  num_parallel_reads=num_parallel_calls, num_parallel_calls=num_parallel_calls)
+
+    sess    = tf.Session()
+    sess.run(tf.global_variables_initializer())
+
+    coord   = tf.train.Coordinator()
+    threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+
+    for _ in range(5):
+        sess.run(input_data_tensor)
+
+    # END FOR
+
+    start = time.time()
+
+    for _ in range(args.numBatches):
+        sess.run(input_data_tensor)
+
+    # END FOR
+
+    took = time.time() - start
+
+    coord.request_stop()
+    sess.close()
+
+    return args.numBatches * args.batchSize / took
+
+
+if __name__=="__main__":
+    args     = parser.parse_args()
+    data_dir = tempfile.mkdtemp()
+
+    try:
+        _write_synthetic_tfrecords(data_dir, args.numVideos, args.frames, args.height, args.width)
+
+        store_dir = os.path.join(data_dir, 'video_store')
+        convert_tfrecords(data_dir, store_dir)
+
+        print "%-36s %12s" % ('pipeline', 'clips/sec')
+
+        for source, source_dir in [('tfrecords', data_dir), ('video store', store_dir)]:
+            print "%-36s %12.1f" % ('queue (%s)' % source, _clips_per_second(source_dir, args, 'queue'))
+
+            for num_parallel_calls in args.numParallelCalls:
+                print "%-36s %12.1f" % ('dataset (%s, parallel=%d)' % (source, num_parallel_calls), _clips_per_second(source_dir, args, 'dataset', num_parallel_calls))
+
+            # END FOR
+
+        # END FOR
+
+    finally:
+        shutil.rmtree(data_dir)
+
+    # END TRY
@@ -0,0 +1,136 @@
+"""
+BENCHMARK OF LENGTH-BUCKETED BATCHING AND OF DECODING LOOPED FRAMES ONCE
+
+Full-video evaluation (clipLength -1) loads one clip per video whose length varies from video to video. This benchmark
+measures, over the frame counts of a split, the share of loading time lost waiting on the longest video of every batch
+(equivalently the share of padding if batches were padded to their longest video) when videos are loaded in a random
+order and when they are loaded through the length-bucketed sampler (--bucketBoundaries).
+Short videos are looped up to the temporal footprint of a model, the second part counts the frames decoded with and
+without decoding repeated frames once and times both decoders on a short jpeg video, checking that they are identical.
+
+Frame counts are read from a dataset manifest (--dataPath) or drawn from a log-normal approximation of the UCF101 test
+split lengths (3783 videos, median around 165 frames at 25 fps, shortest 29 and longest 1776 frames).
+
+Run from the root of the repository:
+    python -m benchmarks.length_bucketing_benchmark --batchSize 8 --bucketBoundaries 50 100 150 200 300 600
+"""
+
+import time
+import argparse
+
+import numpy      as np
+import tensorflow as tf
+import cv2
+
+from utils.video_sampler_utils    import VideoSampler
+from utils.dataset_manifest_utils import load_manifest
+from utils.load_dataset_tfrecords import _decode_frames, _decode_clips
+from utils.temporal_index_utils   import loop_indices
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--dataPath', action='store', default='',
+        help = 'Split directory whose dataset manifest provides the frame counts, empty uses the UCF101 test approximation')
+
+parser.add_argument('--batchSize', action='store', type=int, default=8,
+        help = 'Number of videos in each batch')
+
+parser.add_argument('--bucketBoundaries', nargs='+', type=int, default=[50, 75, 100, 125, 150, 175, 200, 250, 300, 400, 600],
+        help = 'Frame counts separating length buckets')
+
+parser.add_argument('--footprint', action='store', type=int, default=250,
+        help = 'Number of frames short videos are looped to, e.g. the evaluation footprint of ResNet and I3D')
+
+parser.add_argument('--shortFrames', action='store', type=int, default=50,
+        help = 'Number of frames of the short jpeg video used to time decoding')
+
+parser.add_argument('--repeats', action='store', type=int, default=3,
+        help = 'Number of times each decoder is run, the fastest run is reported')
+
+
+def _ucf101_test_frames(seed=0):
+    """
+    Draw frame counts from a log-normal approximation of the UCF101 test split lengths
+    """
+    rng = np.random.RandomState(seed)
+
+    return np.clip(rng.lognormal(np.log(165), 0.55, 3783), 29, 1776).astype(np.int64)
+
+
+def _batch_waste(video_frames, order, batch_size):
+    """
+    Return the share of frame slots lost to the longest video of every batch
+    """
+    lengths = np.array(video_frames)[order]
+    lengths = lengths[:len(lengths) - len(lengths) % batch_size].reshape(-1, batch_size)
+
+    return 1. - float(lengths.sum()) / (lengths.max(1).sum() * batch_size)
+
+
+def _time_decoder(sess, tensor, repeats):
+    """
+    Return the fastest wall clock time over repeats runs and the output of the last run
+    """
+    best = None
+
+    for _ in range(repeats):
+        start  = time.time()
+        output = sess.run(tensor)
+        took   = time.time() - start
+
+        if best is None or took < best:
+            best = took
+
+        # END IF
+
+    # END FOR
+
+    return best, output
+
+
+if __name__=="__main__":
+    args = parser.parse_args()
+
+    if args.dataPath != '':
+        video_frames = [video['frames'] for video in load_manifest(args.dataPath)['videos']]
+
+    else:
+        video_frames = _ucf101_test_frames()
+
+    # END IF
+
+    print "Videos: %d, frames min/median/max: %d/%d/%d" % (len(video_frames), np.min(video_frames), np.median(video_frames), np.max(video_frames))
+    print
+
+    print "%-28s %24s" % ('order', 'slots lost to longest video')
+
+    random_order   = VideoSampler(video_frames, shuffle=True).epoch_order(0)
+    bucketed_order = VideoSampler(video_frames, shuffle=True, bucket_boundaries=args.bucketBoundaries, videos_per_batch=args.batchSize).epoch_order(0)
+
+    assert sorted(bucketed_order) == range(len(video_frames)), 'The bucketed order must contain every video once'
+
+    print "%-28s %23.1f%%" % ('random', 100*_batch_waste(video_frames, random_order, args.batchSize))
+    print "%-28s %23.1f%%" % ('length-bucketed', 100*_batch_waste(video_frames, bucketed_order, args.batchSize))
+    print
+
+    looped_frames  = len(video_frames) * args.footprint
+    decoded_frames = np.minimum(video_frames, args.footprint).sum()
+
+    print "Frames decoded to loop every video to %d frames: %d per frame index, %d decoding each frame once (%.1f%% saved)" % (args.footprint, looped_frames, decoded_frames, 100*(1. - float(decoded_frames)/looped_frames))
+
+    # Time both decoders on a short video looped to the footprint
+    frames  = np.random.randint(0, 256, size=(args.shortFrames, 240, 320, 3)).astype(np.uint8)
+    encoded = tf.constant([cv2.imencode('.jpg', frame)[1].tostring() for frame in frames])
+    indices = tf.expand_dims(loop_indices(args.shortFrames, args.footprint), 0)
+
+    old_tensor = tf.map_fn(lambda clip_indices: _decode_frames(tf.gather(encoded, clip_indices), 'jpeg'), indices, dtype=tf.uint8)
+    new_tensor = _decode_clips(encoded, indices, 'jpeg')
+
+    sess = tf.Session()
+
+    old_time, old_output = _time_decoder(sess, old_tensor, args.repeats)
+    new_time, new_output = _time_decoder(sess, new_tensor, args.repeats)
+
+    assert np.array_equal(old_output, new_output), 'Decoding every frame once differs from decoding every frame index'
+
+    print "Decoding %d jpeg frames looped to %d: %.1f ms per frame index, %.1f ms decoding each frame once (%.1fx)" % (args.shortFrames, args.footprint, 1000*old_time, 1000*new_time, old_time/new_time)
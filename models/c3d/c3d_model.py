@@ -10,7 +10,7 @@ import numpy      as np
 from models.models_abstract      import Abstract_Model_Class
 from utils.layers_utils          import *
 
-from default_preprocessing         import preprocess
+from default_preprocessing         import preprocess, add_temporal_steps, normalize
 from tf_version_HMDB51_preprocessing import preprocess as tf_HMDB51_preprocess
 
 class C3D(Abstract_Model_Class):
@@ -50,6 +50,9 @@ class C3D(Abstract_Model_Class):
 
         # END IF
 
+        # Clips queued as uint8 are cast and normalized on the device
+        inputs = self.normalize_inputs(inputs, is_training, input_dims)
+
         with tf.name_scope(scope, 'c3d', [inputs]):
             layers = {}
 
@@ -150,7 +153,65 @@ class C3D(Abstract_Model_Class):
 
         # END IF
 
-    def preprocess_tfrecords(self, input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step):
+    def add_temporal_steps(self, plan, input_dims, seq_length, istraining):
+        """
+        Args:
+            :plan:                  TemporalPlan of each clip loaded from tfrecords
+            :input_dims:            Number of frames used in input
+            :seq_length:            Length of output sequence
+            :is_training:           Boolean value indication phase (TRAIN OR TEST)
+
+        Return:
+            Boolean indicating whether the temporal steps were added to plan
+        """
+        if self.preproc_method == 'tf_version_HMDB51':
+            return False
+
+        # END IF
+
+        add_temporal_steps(plan, self.input_alpha)
+
+        return True
+
+    def enable_device_normalization(self):
+        """
+        Return:
+            Boolean indicating whether preprocess_tfrecords returns uint8 clips whose mean image is subtracted by normalize_inputs
+        """
+        if self.preproc_method == 'tf_version_HMDB51':
+            return False
+
+        # END IF
+
+        # Training clips are randomly cropped and flipped before the mean image would be subtracted, which normalize can
+        # not reproduce on the device
+        if self.istraining:
+            return False
+
+        # END IF
+
+        self.device_normalization = True
+
+        return True
+
+    def normalize_inputs(self, inputs, is_training, input_dims):
+        """
+        Args:
+            :inputs:      Clips of shape [BatchSize x Frames x Height x Width x Channels]
+            :is_training: Boolean variable indicating phase (TRAIN OR TEST)
+            :input_dims:  Number of frames used in input
+
+        Return:
+            Float32 inputs, normalized when device normalization is enabled
+        """
+        if not self.device_normalization:
+            return inputs
+
+        # END IF
+
+        return normalize(inputs)
+
+    def preprocess_tfrecords(self, input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, temporal_steps_fused=False):
         """
         Args:
             :input_data_tensor:     Data loaded from tfrecords containing either video or clips
@@ -165,12 +226,13 @@ class C3D(Abstract_Model_Class):
             :label:                 Label for loaded data
             :is_training:           Boolean value indication phase (TRAIN OR TEST)
             :video_step:            Tensorflow variable indicating the total number of videos (not clips) that have been loaded
+            :temporal_steps_fused:  Boolean indicating that the loader already applied the steps added by add_temporal_steps to input_data_tensor
         """
         if self.preproc_method == 'tf_version_HMDB51':
             return tf_HMDB51_preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, self.input_alpha)
 
         else:
-            return preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, self.input_alpha)
+            return preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, self.input_alpha, temporal_steps_fused, self.device_normalization)
 
         # END IF
 
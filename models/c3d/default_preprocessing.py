@@ -1,6 +1,7 @@
 import tensorflow as tf
 import numpy as np
-from utils.preprocessing_utils import *
+from utils.preprocessing_utils  import *
+from utils.temporal_index_utils import TemporalPlan
 
 
 def preprocess_for_train(image, output_height, output_width):
@@ -57,7 +58,43 @@ def preprocess_image(image, output_height, output_width, is_training=False):
 
 
 
-def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, input_alpha=1.0):
+def add_temporal_steps(plan, input_alpha=1.0):
+    """
+    Add the temporal preprocessing of each clip to a TemporalPlan
+    Args:
+        :plan:              TemporalPlan of a clip
+        :input_alpha:       Alpha value to resample the clip
+    """
+    plan.resample(alpha=input_alpha)
+
+
+def _load_mean_image():
+    """
+    Return:
+        Mean image of Sports1M of shape [16, 128, 171, 3], in the BGR order of the clips
+    """
+    _mean_image = np.load('models/weights/sport1m_train16_128_mean.npy')[0]
+    _mean_image = _mean_image.transpose(1,2,3,0)
+
+    return _mean_image[...,::-1]
+
+
+def normalize(inputs):
+    """
+    Device side normalization of the uint8 clips returned by preprocess with device_normalization
+    Only used when testing, where clips are centrally cropped and not flipped, so the central crop of the mean image matches
+    Args:
+        :inputs:            uint8 clips of shape [batch_size, 16, height, width, channels]
+
+    Return:
+        Float32 clips with the mean image subtracted
+    """
+    _mean_image = central_crop_clip(tf.constant(np.ascontiguousarray(_load_mean_image())), tf.shape(inputs)[2], tf.shape(inputs)[3])
+
+    return tf.to_float(inputs) - _mean_image
+
+
+def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, input_alpha=1.0, temporal_steps_fused=False, device_normalization=False):
     """
     Preprocessing function corresponding to the chosen model
     Args:
@@ -72,14 +109,13 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
         :size:              Output size of preprocessed frames
         :label:             Label of current sample
         :istraining:        Boolean indicating training or testing phase
+        :temporal_steps_fused: Boolean indicating that add_temporal_steps was already applied to input_data_tensor by the loader
+        :device_normalization: Boolean indicating that the mean image is subtracted on the device by normalize, the clip is returned as uint8
 
     Return:
         Preprocessing input data and labels tensor
     """
 
-    _mean_image = np.load('models/weights/sport1m_train16_128_mean.npy')[0]
-    _mean_image = _mean_image.transpose(1,2,3,0)
-
 
     # Convert to BGR as used by the original authors
     input_data_tensor = input_data_tensor[...,::-1]
@@ -88,17 +124,34 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
 
     input_data_tensor = tf.cast(input_data_tensor, tf.float32)
 
-    input_data_tensor = resample_input(input_data_tensor, frames, frames, input_alpha)
+    if not temporal_steps_fused:
+        plan = TemporalPlan(frames)
+        add_temporal_steps(plan, input_alpha)
+        input_data_tensor = plan.gather(input_data_tensor)
+
+    # END IF
 
-    input_data_tensor = tf.map_fn(lambda img: resize(img, 128, 171), input_data_tensor)
+    input_data_tensor = resize_clip(input_data_tensor, 128, 171)
 
-    input_data_tensor = input_data_tensor - _mean_image[...,::-1].tolist()
+    if not device_normalization:
+        input_data_tensor = input_data_tensor - _load_mean_image().tolist()
+
+    # END IF
 
     if istraining:
         input_data_tensor = random_crop_clip(input_data_tensor, size[0], size[1])
         input_data_tensor = random_flip_left_right_clip(input_data_tensor)
 
-    input_data_tensor = tf.map_fn(lambda img: preprocess_image(img, size[0], size[1], is_training=istraining), input_data_tensor)
+    else:
+        input_data_tensor = central_crop_clip(input_data_tensor, size[0], size[1])
+
+    # END IF
+
+    input_data_tensor.set_shape([None, size[0], size[1], 3])
 
+    if device_normalization:
+        input_data_tensor = quantize_clip(input_data_tensor)
+
+    # END IF
 
     return input_data_tensor
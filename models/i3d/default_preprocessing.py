@@ -1,6 +1,7 @@
 import tensorflow as tf
 import numpy as np
-from utils.preprocessing_utils import *
+from utils.preprocessing_utils  import *
+from utils.temporal_index_utils import TemporalPlan, loop_indices
 
 _R_MEAN = 123.68
 _G_MEAN = 116.78
@@ -83,25 +84,13 @@ def preprocess_image(image, output_height, output_width, is_training=False,
 
   # END IF
 
-def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, input_alpha):
+def add_temporal_steps(plan, input_dims, istraining):
     """
-    Preprocessing function corresponding to the chosen model
+    Add the temporal preprocessing of each clip to a TemporalPlan
     Args:
-        :input_data_tensor: Raw input data
-        :frames:            Total number of frames
-        :height:            Height of frame
-        :width:             Width of frame
-        :channel:           Total number of color channels
+        :plan:              TemporalPlan of a clip
         :input_dims:        Number of frames to be provided as input to model
-        :output_dims:       Total number of labels
-        :seq_length:        Number of frames expected as output of model
-        :size:              Output size of preprocessed frames
-        :label:             Label of current sample
         :istraining:        Boolean indicating training or testing phase
-        :input_alpha:       Alpha value to resample input_data_tensor (independent of model)
-
-    Return:
-        Preprocessing input data and labels tensor
     """
 
     # Setup different temporal footprints for training and testing phase
@@ -118,25 +107,72 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
 
     # END IF
 
+    def _footprint(frames):
+        # Ensure that sufficient frames exist in input to extract 250 frames (assuming a 5 sec temporal footprint), loop shorter inputs
+        temporal_offset = tf.cond(tf.greater(frames, footprint), lambda: tf.random_uniform(dtype=tf.int32, minval=0, maxval=frames - footprint + 1, shape=np.asarray([1]))[0], lambda: 0)
+
+        return loop_indices(frames, footprint, temporal_offset), footprint
+
+    plan.add_step(_footprint)
+    plan.resample(sample_dims)
+
+
+def normalize(inputs, is_training, input_dims):
+    """
+    Device side normalization of the uint8 clips returned by preprocess with device_normalization
+    Args:
+        :inputs:            uint8 clips of shape [batch_size, input_dims, height, width, channels]
+        :is_training:       Boolean indicating training or testing phase
+        :input_dims:        Number of frames to be provided as input to model
+
+    Return:
+        Float32 clips scaled to [-1, 1]
+    """
+    return (tf.to_float(inputs)/255.) * 2. - 1.
+
+
+def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, input_alpha, temporal_steps_fused=False, device_normalization=False):
+    """
+    Preprocessing function corresponding to the chosen model
+    Args:
+        :input_data_tensor: Raw input data
+        :frames:            Total number of frames
+        :height:            Height of frame
+        :width:             Width of frame
+        :channel:           Total number of color channels
+        :input_dims:        Number of frames to be provided as input to model
+        :output_dims:       Total number of labels
+        :seq_length:        Number of frames expected as output of model
+        :size:              Output size of preprocessed frames
+        :label:             Label of current sample
+        :istraining:        Boolean indicating training or testing phase
+        :input_alpha:       Alpha value to resample input_data_tensor (independent of model)
+        :temporal_steps_fused: Boolean indicating that add_temporal_steps was already applied to input_data_tensor by the loader
+        :device_normalization: Boolean indicating that scaling is applied on the device by normalize, the clip is returned as uint8
 
-    # Ensure that sufficient frames exist in input to extract 250 frames (assuming a 5 sec temporal footprint)
-    temporal_offset   = tf.cond(tf.greater(frames, footprint), lambda: tf.random_uniform(dtype=tf.int32, minval=0, maxval=frames - footprint + 1, shape=np.asarray([1]))[0], lambda: tf.random_uniform(dtype=tf.int32, minval=0, maxval=1, shape=np.asarray([1]))[0])
+    Return:
+        Preprocessing input data and labels tensor
+    """
+
+    if not temporal_steps_fused:
+        plan = TemporalPlan(frames)
+        add_temporal_steps(plan, input_dims, istraining)
+        input_data_tensor = plan.gather(input_data_tensor)
 
-    input_data_tensor = tf.cond(tf.less(frames, footprint),
-                                lambda: loop_video_with_offset(input_data_tensor, input_data_tensor, frames, frames, height, width, channel, footprint),
-                                lambda: input_data_tensor[temporal_offset:temporal_offset + footprint, :, :, :])
+    # END IF
 
-    # Remove excess frames after looping to reduce to footprint size
-    input_data_tensor = tf.slice(input_data_tensor, [0,0,0,0], tf.stack([footprint, height, width, channel]))
-    input_data_tensor = tf.reshape(input_data_tensor, tf.stack([footprint, height, width, channel]))
-    input_data_tensor = resample_input(input_data_tensor, sample_dims, footprint, 1.0)
     input_data_tensor = tf.cast(input_data_tensor, tf.float32)
 
     # Randomly flip entire video or not
     crop_type = tf.random_uniform(dtype=tf.float32, minval=0, maxval=1, shape=np.asarray([1]))[0]
 
     # Preprocess data
-    input_data_tensor = tf.map_fn(lambda img: preprocess_image(img, size[0], size[1], is_training=istraining, resize_side_min=_RESIZE_SIDE_MIN), input_data_tensor)
+    input_data_tensor = aspect_preserving_resize_clip(input_data_tensor, _RESIZE_SIDE_MIN)
+
+    if not device_normalization:
+        input_data_tensor = (input_data_tensor/255.) * 2. - 1.
+
+    # END IF
 
     if istraining:
         input_data_tensor = tf.cond(tf.greater_equal(crop_type, 0.5), lambda: random_crop_clip(input_data_tensor, size[0], size[1]), lambda: central_crop_clip(input_data_tensor, size[0], size[1]))
@@ -147,4 +183,9 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
 
     # END IF
 
+    if device_normalization:
+        input_data_tensor = quantize_clip(input_data_tensor)
+
+    # END IF
+
     return input_data_tensor
@@ -33,6 +33,7 @@ class Abstract_Model_Class(ABC):
         self.verbose = verbose
         self.name = modelName
         self.track_variables = {}
+        self.device_normalization = False
 
         if ((self.preproc_method == 'rr') or (self.preproc_method == 'sr')):
             self.store_alpha = True
@@ -55,6 +56,33 @@ class Abstract_Model_Class(ABC):
     def preprocess_tfrecords(self):
         raise NotImplementedError('Method not implemented in the specified model: preprocess_tfrecords')
 
+    def add_temporal_steps(self, plan, input_dims, seq_length, istraining):
+        """
+        Allow models to add the temporal steps of their preprocessing (looping, resampling, segment extraction) to the
+        TemporalPlan of each clip, the loader then gathers the frames of every clip once instead of preprocess_tfrecords
+        Return:
+            Boolean indicating whether the temporal steps were added to plan. The loader then calls preprocess_tfrecords with
+            temporal_steps_fused=True, models returning False apply them in preprocess_tfrecords
+        """
+        return False
+
+    def enable_device_normalization(self):
+        """
+        Allow models to split their preprocessing, preprocess_tfrecords then keeps the geometric and temporal transforms on
+        the host and returns uint8 clips while normalize_inputs casts and normalizes them on the device at the head of inference
+        Return:
+            Boolean indicating whether the normalization was moved to the device, models returning False keep returning float32 clips
+        """
+        return False
+
+    def normalize_inputs(self, inputs, is_training, input_dims):
+        """
+        Device side stage of the preprocessing, called at the head of inference
+        Return:
+            Inputs unchanged, models enabling device normalization return them cast to float32 and normalized
+        """
+        return inputs
+
     def add_track_variables(self, variable_name, variable):
         self.track_variables[variable_name] = variable
 
@@ -1,7 +1,8 @@
 import tensorflow as tf
 import numpy      as np
 
-from utils.preprocessing_utils import *
+from utils.preprocessing_utils  import *
+from utils.temporal_index_utils import TemporalPlan, loop_indices
 
 #slim = tf.contrib.slim
 
@@ -93,7 +94,63 @@ def preprocess_image(image, output_height, output_width, is_training=False,
     return preprocess_for_eval(image, output_height, output_width,
                                resize_side_min)
 
-def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, input_alpha, istraining):
+def _temporal_dims(input_dims, istraining):
+    """
+    Return the temporal footprint and number of sampled frames, assuming 25 fps input
+    """
+    if istraining:
+        footprint = 125
+        sample_dims = input_dims/2
+    else:
+        footprint = 250
+        sample_dims = input_dims
+
+    # END IF
+
+    return footprint, sample_dims
+
+def add_temporal_steps(plan, input_dims, istraining):
+    """
+    Add the temporal preprocessing of each clip to a TemporalPlan
+    Args:
+        :plan:              TemporalPlan of a clip
+        :input_dims:        Number of frames to be provided as input to model
+        :istraining:        Boolean indicating training or testing phase
+    """
+    footprint, sample_dims = _temporal_dims(input_dims, istraining)
+
+    def _footprint(frames):
+        # Selecting a random, seeded temporal offset and looping the input from it
+        temporal_offset = tf.random_uniform(dtype=tf.int32, minval=0, maxval=frames, shape=np.asarray([1]))[0]
+
+        return loop_indices(frames, footprint, temporal_offset), footprint
+
+    plan.add_step(_footprint)
+    plan.resample(sample_dims)
+
+def normalize(inputs, is_training, input_dims):
+    """
+    Device side normalization of the uint8 clips returned by preprocess with device_normalization
+    Args:
+        :inputs:            uint8 clips of shape [batch_size, input_dims, height, width, channels]
+        :is_training:       Boolean indicating training or testing phase
+        :input_dims:        Number of frames to be provided as input to model
+
+    Return:
+        Float32 clips with the mean subtracted, frames padded during training remain zero
+    """
+    footprint, sample_dims = _temporal_dims(input_dims, is_training)
+
+    inputs = mean_clip_subtraction(tf.to_float(inputs), [_R_MEAN, _G_MEAN, _B_MEAN])
+
+    if is_training:
+        inputs = tf.concat([inputs[:, :sample_dims], tf.zeros_like(inputs[:, sample_dims:])], 1)
+
+    # END IF
+
+    return inputs
+
+def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, input_alpha, istraining, temporal_steps_fused=False, device_normalization=False):
     """
     Preprocessing function corresponding to the chosen model
     Args:
@@ -108,35 +165,38 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
         :size:              Output size of preprocessed frames
         :label:             Label of current sample
         :istraining:        Boolean indicating training or testing phase
+        :temporal_steps_fused: Boolean indicating that add_temporal_steps was already applied to input_data_tensor by the loader
+        :device_normalization: Boolean indicating that the mean is subtracted on the device by normalize, the clip is returned as uint8
 
     Return:
         Preprocessing input data and labels tensor
     """
 
     # Fixed temporal footprint assuming 25 fps input
-    if istraining:
-        footprint = 125
-        sample_dims = input_dims/2
-    else:
-        footprint = 250
-        sample_dims = input_dims
+    footprint, sample_dims = _temporal_dims(input_dims, istraining)
 
-    # END IF
-
-    # Selecting a random, seeded temporal offset
-    temporal_offset   = tf.random_uniform(dtype=tf.int32, minval=0, maxval=frames, shape=np.asarray([1]))[0]
+    if not temporal_steps_fused:
+        plan = TemporalPlan(frames)
+        add_temporal_steps(plan, input_dims, istraining)
+        input_data_tensor = plan.gather(input_data_tensor)
 
-    input_data_tensor = loop_video_with_offset(input_data_tensor[temporal_offset:,:,:,:], input_data_tensor,
-                                               frames-temporal_offset, frames, height, width, channel, footprint)
+    # END IF
 
-    # Remove excess frames after looping to reduce to footprint size
-    input_data_tensor = tf.slice(input_data_tensor, [0,0,0,0], tf.stack([footprint, height, width, channel]))
-    input_data_tensor = tf.reshape(input_data_tensor, tf.stack([footprint, height, width, channel]))
-    input_data_tensor = resample_input(input_data_tensor, sample_dims, footprint, 1.0)
     input_data_tensor = tf.cast(input_data_tensor, tf.float32)
 
     # Preprocess data
-    input_data_tensor = tf.map_fn(lambda img: preprocess_image(img, size[0], size[1], is_training=istraining, resize_side_min=_RESIZE_SIDE_MIN), input_data_tensor)
+    input_data_tensor = aspect_preserving_resize_clip(input_data_tensor, _RESIZE_SIDE_MIN)
+
+    if not istraining:
+        input_data_tensor = central_crop_clip(input_data_tensor, size[0], size[1])
+        input_data_tensor.set_shape([None, size[0], size[1], 3])
+
+    # END IF
+
+    if not device_normalization:
+        input_data_tensor = mean_clip_subtraction(input_data_tensor, [_R_MEAN, _G_MEAN, _B_MEAN])
+
+    # END IF
 
     if istraining:
         input_data_tensor = random_crop_clip(input_data_tensor, size[0], size[1])
@@ -146,4 +206,9 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
 
     # END IF
 
+    if device_normalization:
+        input_data_tensor = quantize_clip(input_data_tensor)
+
+    # END IF
+
     return input_data_tensor
@@ -8,7 +8,7 @@ import numpy      as np
 from models.models_abstract import Abstract_Model_Class
 from utils.layers_utils     import *
 
-from default_preprocessing import preprocess
+from default_preprocessing import preprocess, add_temporal_steps, normalize
 
 class ResNet(Abstract_Model_Class):
 
@@ -164,6 +164,9 @@ class ResNet(Abstract_Model_Class):
 
         # END IF
 
+        # Clips queued as uint8 are cast and normalized on the device
+        inputs = self.normalize_inputs(inputs, is_training, input_dims)
+
         inputs = inputs[0]
 
         with tf.name_scope(scope, 'resnet', [inputs]):
@@ -252,7 +255,48 @@ class ResNet(Abstract_Model_Class):
         """
         return np.load('models/weights/resnet50_rgb_imagenet.npy')
 
-    def preprocess_tfrecords(self, input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step):
+    def add_temporal_steps(self, plan, input_dims, seq_length, istraining):
+        """
+        Args:
+            :plan:                  TemporalPlan of each clip loaded from tfrecords
+            :input_dims:            Number of frames used in input
+            :seq_length:            Length of output sequence
+            :is_training:           Boolean value indication phase (TRAIN OR TEST)
+
+        Return:
+            Boolean indicating whether the temporal steps were added to plan
+        """
+        add_temporal_steps(plan, input_dims, istraining)
+
+        return True
+
+    def enable_device_normalization(self):
+        """
+        Return:
+            Boolean indicating whether preprocess_tfrecords returns uint8 clips whose mean is subtracted by normalize_inputs
+        """
+        self.device_normalization = True
+
+        return True
+
+    def normalize_inputs(self, inputs, is_training, input_dims):
+        """
+        Args:
+            :inputs:      Clips of shape [BatchSize x Frames x Height x Width x Channels]
+            :is_training: Boolean variable indicating phase (TRAIN OR TEST)
+            :input_dims:  Number of frames used in input
+
+        Return:
+            Float32 inputs, normalized when device normalization is enabled
+        """
+        if not self.device_normalization:
+            return inputs
+
+        # END IF
+
+        return normalize(inputs, is_training, input_dims)
+
+    def preprocess_tfrecords(self, input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, temporal_steps_fused=False):
         """
         Args:
             :input_data_tensor:     Data loaded from tfrecords containing either video or clips
@@ -267,11 +311,12 @@ class ResNet(Abstract_Model_Class):
             :label:                 Label for loaded data
             :is_training:           Boolean value indication phase (TRAIN OR TEST)
             :video_step:            Tensorflow variable indicating the total number of videos (not clips) that have been loaded
+            :temporal_steps_fused:  Boolean indicating that the loader already applied the steps added by add_temporal_steps to input_data_tensor
 
         Return:
             Pointer to preprocessing function of current model
         """
-        return preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, self.input_alpha, istraining)
+        return preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, self.input_alpha, istraining, temporal_steps_fused, self.device_normalization)
 
     """ Function to return loss calculated on half the outputs of a given network """
     def half_loss(self, logits, labels):
@@ -1,7 +1,8 @@
 import tensorflow as tf
 import numpy      as np
 
-from utils.preprocessing_utils import *
+from utils.preprocessing_utils  import *
+from utils.temporal_index_utils import TemporalPlan, loop_indices
 
 
 def preprocess_for_train(image, output_height, output_width, resize_side):
@@ -79,7 +80,86 @@ def extract_segments(input_data_tensor, num_segs, snippet_length, segment_length
     input_data_tensor = tf.concat(input_data_tensor_temp, axis=0)
     return input_data_tensor
 
-def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, num_segs = 3, input_alpha=1.0):
+def _loop_step(footprint):
+    """
+    Temporal step that loops inputs with less than footprint frames, equivalent to loop_video_with_offset with no offset
+    """
+    def _loop(frames):
+        looped_frames = tf.cond(tf.less(frames, footprint),
+                                lambda: frames * (tf.cast(tf.add(tf.divide(footprint, frames), 1), tf.int32) + 1),
+                                lambda: tf.convert_to_tensor(frames))
+
+        return loop_indices(frames, looped_frames), looped_frames
+
+    return _loop
+
+def add_temporal_steps(plan, input_dims, seq_length, istraining, input_alpha=1.0):
+    """
+    Add the temporal preprocessing of each clip to a TemporalPlan
+    Args:
+        :plan:              TemporalPlan of a clip
+        :input_dims:        Number of frames to be provided as input to model
+        :seq_length:        Number of frames expected as output of model
+        :istraining:        Boolean indicating training or testing phase
+        :input_alpha:       Alpha value to resample the clip
+    """
+
+    # Allow for resampling of input during testing for evaluation of the model's stability over video speeds
+    plan.resample(alpha=input_alpha)
+
+    # During training, segment video into input_dims/seq_length segments, then randomly extract a seq_length snippet from each segment
+    if istraining:
+        combined_snippet_len = input_dims
+        snippet_length = seq_length # = 1 For original authors
+
+        num_segs       = combined_snippet_len/snippet_length
+
+        # Ensure enough frames to extract snippet_length number of frames from each of num_segs segments that the video is split into
+        plan.add_step(_loop_step(snippet_length * num_segs))
+
+        def _segments(frames):
+            segment_length = frames/num_segs
+            positions      = tf.cond(tf.equal(segment_length, snippet_length),
+                                     lambda: tf.range(snippet_length*num_segs),
+                                     lambda: extract_segments(tf.range(frames), num_segs, snippet_length, segment_length))
+
+            return positions, snippet_length*num_segs
+
+        plan.add_step(_segments)
+
+    # During testing, resample video down to seq_length/10 number of frames
+    else:
+        snippet_length = input_dims/10 # Equivalent to seq_length/10
+
+        # Ensure enough frames to extract snippet_length number of frames from each video
+        plan.add_step(_loop_step(snippet_length))
+
+        # Uniformly resample video down to snippet_length number of frames
+        plan.resample(snippet_length)
+
+    # END IF
+
+def normalize(inputs, is_training, input_dims):
+    """
+    Device side normalization of the uint8 clips returned by preprocess with device_normalization
+    Args:
+        :inputs:            uint8 clips of shape [batch_size, input_dims, height, width, channels] in BGR order
+        :is_training:       Boolean indicating training or testing phase
+        :input_dims:        Number of frames to be provided as input to model
+
+    Return:
+        Float32 clips, the mean is only subtracted during testing
+    """
+    inputs = tf.to_float(inputs)
+
+    if not is_training:
+        inputs = mean_clip_subtraction(inputs, [104, 117, 123])
+
+    # END IF
+
+    return inputs
+
+def preprocess(input_data_tensor, frames, height, width, channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, num_segs = 3, input_alpha=1.0, temporal_steps_fused=False, device_normalization=False):
     """
     Preprocessing function corresponding to the chosen model
     Args:
@@ -95,6 +175,8 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
         :label:             Label of current sample
         :istraining:        Boolean indicating training or testing phase
         :num_segs:          Number of segments to evenly divice the video into
+        :temporal_steps_fused: Boolean indicating that add_temporal_steps was already applied to input_data_tensor by the loader
+        :device_normalization: Boolean indicating that the mean is subtracted on the device by normalize, the clip is returned as uint8
 
     Return:
         Preprocessing input data and labels tensor
@@ -103,31 +185,18 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
     # CV2 uses BGR so convert from RGB
     #input_data_tensor = input_data_tensor[...,::-1]
 
-    # Allow for resampling of input during testing for evaluation of the model's stability over video speeds
-    input_data_tensor = tf.cast(input_data_tensor, tf.float32)
-    input_data_tensor = resample_input(input_data_tensor, frames, frames, input_alpha)
+    # Looping, resampling and segment extraction
+    if not temporal_steps_fused:
+        plan = TemporalPlan(frames)
+        add_temporal_steps(plan, input_dims, seq_length, istraining, input_alpha)
+        input_data_tensor = plan.gather(input_data_tensor)
 
-    # During training, segment video into input_dims/seq_length segments, then randomly extract a seq_length snippet from each segment
-    if istraining:
-        combined_snippet_len = input_dims
-        snippet_length = seq_length # = 1 For original authors
-
-        num_segs       = combined_snippet_len/snippet_length
-
-        # Ensure enough frames to extract snippet_length number of frames from each of num_segs segments that the video is split into
-        input_data_tensor = tf.cond(tf.less(frames, snippet_length * num_segs),
-                                    lambda: loop_video_with_offset(input_data_tensor, input_data_tensor, 0, frames, height, width, channel, snippet_length * num_segs),
-                                    lambda: input_data_tensor)
-
-        frames = tf.shape(input_data_tensor)[0]
-        segment_length = frames/num_segs
-
-        input_data_tensor = tf.cond(tf.equal(segment_length, snippet_length),
-                                    lambda: input_data_tensor[:snippet_length*num_segs],
-                                    lambda: extract_segments(input_data_tensor, num_segs, snippet_length, segment_length))
+    # END IF
 
+    input_data_tensor = tf.cast(input_data_tensor, tf.float32)
 
-        input_data_tensor = tf.map_fn(lambda img: resize(img, 256, 340), input_data_tensor)
+    if istraining:
+        input_data_tensor = resize_clip(input_data_tensor, 256, 340)
 
 
         # Now that num_seg snippets have been extracted, each frame must be preprocessed (cropping and flipping)
@@ -177,37 +246,35 @@ def preprocess(input_data_tensor, frames, height, width, channel, input_dims, ou
 
         input_data_tensor = random_flip_left_right_clip(input_data_tensor)
         input_data_tensor = crop_clip(input_data_tensor, tf.cast(offset_height, tf.int32), tf.cast(offset_width, tf.int32), tf.cast(crop_h, tf.int32), tf.cast(crop_w, tf.int32))
+        input_data_tensor = resize_clip(input_data_tensor, size[0], size[1])
 
-    # During testing, resample video down to seq_length/10 number of frames, then oversample (each frame x10 crops and mirrors) to seq_length frames
+    # During testing, the video was resampled down to seq_length/10 number of frames, oversample (each frame x10 crops and mirrors) to seq_length frames
     else:
         snippet_length = input_dims/10 # Equivalent to seq_length/10
 
-        # Ensure enough frames to extract snippet_length number of frames from each video
-        input_data_tensor = tf.cond(tf.less(frames, snippet_length),
-                                    lambda: loop_video_with_offset(input_data_tensor, input_data_tensor, 0, frames, height, width, channel, snippet_length),
-                                    lambda: input_data_tensor)
+        input_data_tensor = tf.reshape(resize_clip(input_data_tensor, 256, 340), [snippet_length, 256, 340, 3])
 
-        frames_after_loop = tf.shape(input_data_tensor)[0]
+        if not device_normalization:
+            input_data_tensor = mean_clip_subtraction(input_data_tensor, [123, 117, 104])
 
-        # Uniformly resample video down to snippet_length number of frames
-        input_data_tensor = resample_input(input_data_tensor, snippet_length, frames_after_loop, 1.0)
+        # END IF
 
-        # Prepare input_data_tensor for oversampling which will result in 10x the number of output frames per frame
-        # Pad the current output tensor since tf.map_fn requires identical dimension for input and output
-        input_data_tensor = tf.pad(tf.expand_dims(input_data_tensor, axis=1), [[0,0],[0,9],[0,0],[0,0],[0,0]])
+        # Oversampling results in 10x the number of output frames per frame
+        input_data_tensor = oversample_clip(input_data_tensor, [size[0], size[1]])
 
     # END IF
 
-    # Apply preprocessing related to individual frames (cropping, flipping, resize, etc.... )
-    input_data_tensor = tf.map_fn(lambda img: preprocess_image(img, size[0], size[1], is_training=istraining, resize_side_min=size[0]), input_data_tensor)
-
     # Ensure that the final output is the correct dimensionality, for testing this will result in [combined_snippet_len*10, out_H, out_W, chan]
     input_data_tensor = tf.reshape(input_data_tensor, [input_dims, size[0], size[1], 3])
 
-    input_data_tensor = tf.map_fn(lambda img: tf.image.rot90(img, 1), input_data_tensor)
+    input_data_tensor = rot90_clip(input_data_tensor)
 
     # CV2 uses BGR so convert from RGB
     input_data_tensor = input_data_tensor[...,::-1]
 
+    if device_normalization:
+        input_data_tensor = quantize_clip(input_data_tensor)
+
+    # END IF
 
     return input_data_tensor
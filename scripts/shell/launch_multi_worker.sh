@@ -0,0 +1,61 @@
+#!/usr/bin/env bash
+
+# Launch a multi-worker training job as local processes: NUM_PS parameter servers and NUM_WORKERS workers, all running
+# train.py with the arguments given to this script. Worker 0 is the chief, it initializes the model and saves checkpoints.
+# Run from the root of the repository, e.g.:
+#   NUM_WORKERS=2 scripts/shell/launch_multi_worker.sh --model c3d --dataset UCF101 --load 0 --inputDims 16 --outputDims 101 --seqLength 1 --size 112 --expName c3d_multi_worker --numClips 5 --clipLength 16 --clipOffset random --split 1 --nEpochs 10 --baseDataPath /data --fName trainlist --batchSize 10
+# Every worker uses --numGpus gpus, set WORKER_GPUS (e.g. "0,1 2,3") to give each worker its own CUDA_VISIBLE_DEVICES.
+# Output of every process is written to LOG_DIR/ps_N.log and LOG_DIR/worker_N.log
+
+NUM_PS=${NUM_PS:-1}
+NUM_WORKERS=${NUM_WORKERS:-2}
+HOST=${HOST:-localhost}
+BASE_PORT=${BASE_PORT:-2222}
+PYTHON=${PYTHON:-python}
+LOG_DIR=${LOG_DIR:-logs/multi_worker}
+
+read -a GPUS <<< "$WORKER_GPUS"
+
+PS_HOSTS=()
+WORKER_HOSTS=()
+
+for ((i=0; i<NUM_PS; i++)); do
+    PS_HOSTS+=("$HOST:$((BASE_PORT+i))")
+done
+
+for ((i=0; i<NUM_WORKERS; i++)); do
+    WORKER_HOSTS+=("$HOST:$((BASE_PORT+NUM_PS+i))")
+done
+
+mkdir -p $LOG_DIR
+
+PS_PIDS=()
+WORKER_PIDS=()
+
+# Parameter servers run until the workers are done
+trap 'kill ${PS_PIDS[@]} ${WORKER_PIDS[@]} 2> /dev/null' EXIT
+
+for ((i=0; i<NUM_PS; i++)); do
+    CUDA_VISIBLE_DEVICES="" $PYTHON train.py "$@" --psHosts ${PS_HOSTS[@]} --workerHosts ${WORKER_HOSTS[@]} --jobName ps --taskIndex $i > $LOG_DIR/ps_$i.log 2>&1 &
+    PS_PIDS+=($!)
+done
+
+for ((i=0; i<NUM_WORKERS; i++)); do
+    if [ ${#GPUS[@]} -gt 0 ]; then
+        CUDA_VISIBLE_DEVICES=${GPUS[$i]} $PYTHON train.py "$@" --psHosts ${PS_HOSTS[@]} --workerHosts ${WORKER_HOSTS[@]} --jobName worker --taskIndex $i > $LOG_DIR/worker_$i.log 2>&1 &
+
+    else
+        $PYTHON train.py "$@" --psHosts ${PS_HOSTS[@]} --workerHosts ${WORKER_HOSTS[@]} --jobName worker --taskIndex $i > $LOG_DIR/worker_$i.log 2>&1 &
+
+    fi
+
+    WORKER_PIDS+=($!)
+done
+
+STATUS=0
+
+for pid in ${WORKER_PIDS[@]}; do
+    wait $pid || STATUS=1
+done
+
+exit $STATUS
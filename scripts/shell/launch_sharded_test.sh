@@ -0,0 +1,39 @@
+#!/usr/bin/env bash
+
+# Launch a sharded evaluation as local processes: NUM_SHARDS processes running test.py with the arguments given to this
+# script, each evaluating a disjoint shard of the videos of the split, followed by the merge of their predictions into
+# the results of a single evaluation. Run from the root of the repository, e.g.:
+#   NUM_SHARDS=4 SHARD_GPUS="0 1 2 3" scripts/shell/launch_sharded_test.sh --model i3d --dataset Kinetics --loadedDataset Kinetics --load 1 --inputDims 250 --outputDims 400 --seqLength 1 --size 224 --expName i3d_Kinetics --split 1 --baseDataPath /data --fName vallist
+# Set SHARD_GPUS to give each shard its own CUDA_VISIBLE_DEVICES, without it every shard uses the default device (e.g. the cpu).
+# Output of every shard is written to LOG_DIR/shard_N.log, the merge prints the final results.
+
+NUM_SHARDS=${NUM_SHARDS:-2}
+PYTHON=${PYTHON:-python}
+LOG_DIR=${LOG_DIR:-logs/sharded_test}
+
+read -a GPUS <<< "$SHARD_GPUS"
+
+mkdir -p $LOG_DIR
+
+SHARD_PIDS=()
+
+trap 'kill ${SHARD_PIDS[@]} 2> /dev/null' EXIT
+
+for ((i=0; i<NUM_SHARDS; i++)); do
+    if [ ${#GPUS[@]} -gt 0 ]; then
+        CUDA_VISIBLE_DEVICES=${GPUS[$i]} $PYTHON test.py "$@" --numShards $NUM_SHARDS --shardIndex $i < /dev/null > $LOG_DIR/shard_$i.log 2>&1 &
+
+    else
+        $PYTHON test.py "$@" --numShards $NUM_SHARDS --shardIndex $i < /dev/null > $LOG_DIR/shard_$i.log 2>&1 &
+
+    fi
+
+    SHARD_PIDS+=($!)
+done
+
+for pid in ${SHARD_PIDS[@]}; do
+    wait $pid
+done
+
+# The merge verifies that every shard completed its predictions
+$PYTHON test.py "$@" --numShards $NUM_SHARDS --mergeShards 1
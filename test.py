@@ -2,7 +2,9 @@
 import os
 import time
 import sys
+import shutil
 import argparse
+import tempfile
 import tensorflow      as tf
 import numpy           as np
 import multiprocessing as mp
@@ -17,12 +19,15 @@ from tensorflow.python.training import queue_runner_impl
 
 # Custom imports
 from models                       import *
-from utils                        import initialize_from_dict, save_checkpoint, load_checkpoint, make_dir, Metrics
+from utils                        import initialize_from_dict, save_checkpoint, load_checkpoint, select_checkpoints, make_dir, Metrics, CheckpointRestorer
 from Queue                        import Queue
 from utils.logger                 import Logger
 from random                       import shuffle
-from utils.load_dataset_tfrecords import load_dataset
+from utils.load_dataset_tfrecords import load_dataset, create_video_sampler
+from utils.clip_cache_utils       import ClipCache
+from utils.shared_video_store_utils import attach_shared_store
 from utils.argument_utils         import read_json, assign_args
+from utils.dataset_manifest_utils import num_videos, get_manifest
 
 
 parser = argparse.ArgumentParser()
@@ -59,6 +64,9 @@ parser.add_argument('--modelAlpha', action='store', type=float, default=1.,
 parser.add_argument('--inputAlpha', action='store', type=float, default=1.,
         help = 'Resampling factor for constant value resampling of input video, used mainly for testing models.')
 
+parser.add_argument('--inputAlphas', nargs='+', type=float, default=[],
+        help = 'Input alphas evaluated in a single pass over the videos, every video is decoded once and its clips are resampled with each alpha. Results of each alpha are stored in metricsDir/input_alpha_<alpha>, with avgClips batchSize should cover the clips of every alpha (Default none, uses inputAlpha)')
+
 parser.add_argument('--dropoutRate', action='store', type=float, default=0.5,
         help = 'Value indicating proability of keeping inputs of the model\'s dropout layers.')
 
@@ -97,14 +105,17 @@ parser.add_argument('--load', action='store', type=int, default=1,
 parser.add_argument('--loadedCheckpoint', action='store', type=int, default=-1,
         help = 'Specify the step of the saved model checkpoint that will be loaded for testing. Defaults to most recent checkpoint.')
 
+parser.add_argument('--loadedCheckpoints', nargs='+', type=str, default=[],
+        help = 'Checkpoints evaluated in a sweep that builds the graph and reads the videos once: global steps, inclusive ranges start:stop of saved checkpoints, ranges start:stop:step or all. Results of each checkpoint are stored in metricsDir/checkpoint_<step> (Default none, uses loadedCheckpoint)')
+
 parser.add_argument('--size', action='store', required='size' not in json_keys, type=int,
         help = 'Input frame size')
 
 parser.add_argument('--expName', action='store', required='expName' not in json_keys,
         help = 'Unique name of experiment being run')
 
-parser.add_argument('--numVids', action='store', required='numVids' not in json_keys, type=int,
-        help = 'Number of videos to be used for testing')
+parser.add_argument('--numVids', action='store', type=int, default=0,
+        help = 'Number of videos to be used for testing, 0 reads the number of videos of the split from its dataset manifest (Default 0)')
 
 parser.add_argument('--split', action='store', type=int, default=1,
         help = 'Dataset split to use')
@@ -163,6 +174,45 @@ parser.add_argument('--topk', action='store', type=int, default=3,
 parser.add_argument('--save', action='store', type=int, default=1,
         help = 'Boolean indicating whether to save any metrics, logs, or results. Used for testing if the code runs.')
 
+parser.add_argument('--inputPipeline', action='store', default='queue',
+        help = 'Input pipeline used to load clips, queue (queue runners) or dataset (tf.data) (Default queue)')
+
+parser.add_argument('--numParallelReads', action='store', type=int, default=4,
+        help = 'Number of tfrecords files read concurrently when --inputPipeline dataset is used (Default 4)')
+
+parser.add_argument('--numParallelCalls', action='store', type=int, default=4,
+        help = 'Number of videos loaded and preprocessed in parallel when --inputPipeline dataset is used (Default 4)')
+
+parser.add_argument('--prefetchBatches', action='store', type=int, default=2,
+        help = 'Number of batches prepared ahead of time when --inputPipeline dataset is used (Default 2)')
+
+parser.add_argument('--numReaderThreads', action='store', type=int, default=1,
+        help = 'Number of threads per gpu, each with its own tfrecords reader, loading videos into the clip queue (Default 1)')
+
+parser.add_argument('--queueCapacity', action='store', type=int, default=0,
+        help = 'Maximum number of clips held by the clip queue, at least numGpus*batchSize. 0 indicates numGpus*batchSize*numReaderThreads (Default 0)')
+
+parser.add_argument('--clipCacheDir', action='store', default='',
+        help = 'Directory of an on-disk cache of preprocessed clips. The first evaluation of a configuration stores the clips fed to the model, later evaluations read them instead of loading and preprocessing videos. Empty string disables the cache (Default \'\')')
+
+parser.add_argument('--bucketBoundaries', nargs='+', type=int, default=[],
+        help = 'Frame counts separating length buckets, videos are loaded in an order where the clips of each batch come from videos of similar length, read from the dataset manifest (Default none)')
+
+parser.add_argument('--deviceNormalization', action='store', type=int, default=0,
+        help = 'Boolean indicating whether clips are queued as uint8 and cast, scaled and mean subtracted by the model on the gpu at the head of inference, models that do not support it keep normalizing on the host (Default 0)')
+
+parser.add_argument('--sharedVideoStore', action='store', type=str, default='',
+        help = 'Root directory, e.g. /dev/shm/mpact_video_stores, of video stores shared with concurrent processes. The first process decodes the split into a memory-mapped video store that every process then reads, empty string disables sharing (Default \'\')')
+
+parser.add_argument('--numShards', action='store', type=int, default=1,
+        help = 'Number of processes, each evaluating a disjoint shard of the videos of the split, whose predictions are merged by a final run with --mergeShards 1. See scripts/shell/launch_sharded_test.sh (Default 1)')
+
+parser.add_argument('--shardIndex', action='store', type=int, default=0,
+        help = 'Index of the shard of videos evaluated by this process when numShards is larger than 1 (Default 0)')
+
+parser.add_argument('--mergeShards', action='store', type=int, default=0,
+        help = 'Boolean indicating whether to merge the predictions of the numShards evaluated shards and compute the final results instead of evaluating videos (Default 0)')
+
 parser.add_argument('--reverse', action='store', type=int, default=0,
         help = 'Boolean indicating whether reverse videos and classify them as a new action class. 0 all videos are forward, 1 randomly reversed videos, 2 all videos are reversed')
 
@@ -171,6 +221,12 @@ args = parser.parse_args()
 
 args = assign_args(args, args_json, sys.argv)
 
+# The number of videos is read from the dataset manifest of the split when it is not specified
+if args.numVids <= 0:
+    args.numVids = num_videos(os.path.join(args.baseDataPath, 'tfrecords_'+args.dataset, 'Split'+str(args.split), args.fName))
+
+# END IF
+
 
 if args.verbose:
     print "Setup of current experiments"
@@ -207,7 +263,81 @@ model = models_import.create_model_object(modelName = model_name,
                                    verbose = args.verbose)
 
 
-def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_dataset, experiment_name, num_vids, split, base_data_path, f_name, load_model, return_layer, clip_length, video_offset, clip_offset, num_clips, clip_stride, metrics_method, batch_size, metrics_dir, loaded_checkpoint, verbose, gpu_list, preproc_method, loaded_preproc, random_init, avg_clips, use_softmax, preproc_debugging, reverse, topk):
+def metrics_subdirs(metrics_dir, input_alphas, loaded_checkpoints):
+    """
+    Args:
+        :metrics_dir:        Name of subdirectory within the experiment to store metrics
+        :input_alphas:       Input alphas evaluated in a single pass over the videos
+        :loaded_checkpoints: Global steps of the checkpoints evaluated in a sweep
+
+    Return:
+        List of the subdirectories storing the metrics of every input alpha or checkpoint evaluated
+    """
+    if len(input_alphas) > 1:
+        return [os.path.join(metrics_dir, 'input_alpha_'+str(alpha).replace('.', '_')) for alpha in input_alphas]
+
+    elif len(loaded_checkpoints) > 0:
+        return [os.path.join(metrics_dir, 'checkpoint_'+str(checkpoint)) for checkpoint in loaded_checkpoints]
+
+    # END IF
+
+    return [metrics_dir]
+
+
+def save_results(model_name, dataset, preproc_method, experiment_name, metrics_method, metrics, metrics_dirs, input_alphas, loaded_checkpoints, verbose):
+    """
+    Function to classify the logged predictions of every input alpha or checkpoint evaluated and save the results
+    Args:
+        :model_name:         Name of the model evaluated
+        :dataset:            Name of dataset being evaluated
+        :preproc_method:     The preprocessing method used
+        :experiment_name:    Name of current experiment
+        :metrics_method:     Which method to use to calculate accuracy metrics
+        :metrics:            List of Metrics objects holding the logged predictions of each metrics subdirectory
+        :metrics_dirs:       List of the metrics subdirectories, as returned by metrics_subdirs
+        :input_alphas:       Input alphas evaluated in a single pass over the videos
+        :loaded_checkpoints: Global steps of the checkpoints evaluated in a sweep
+        :verbose:            Boolean to indicate if all print statement should be procesed or not
+
+    Returns:
+        Does not return anything
+    """
+    alpha_accuracies = []
+
+    for alpha_metrics, alpha_dir in zip(metrics, metrics_dirs):
+        total_accuracy = alpha_metrics.total_classification()
+        total_pred = alpha_metrics.get_predictions_array()
+        alpha_accuracies.append(total_accuracy)
+
+        if verbose:
+            print "Total accuracy : ", total_accuracy
+            print total_pred
+
+        # Save results in numpy format
+        np.save(os.path.join('results', model_name, dataset, preproc_method, experiment_name, alpha_dir, 'test_predictions_'+dataset+"_"+metrics_method+'.npy'), np.array(total_pred))
+
+    # END FOR
+
+    if len(input_alphas) > 1:
+        print "Input alpha    Accuracy"
+
+        for alpha, total_accuracy in zip(input_alphas, alpha_accuracies):
+            print "%-14s %s" % (alpha, total_accuracy)
+
+        # END FOR
+
+    elif len(loaded_checkpoints) > 1:
+        print "Checkpoint     Accuracy"
+
+        for checkpoint, total_accuracy in zip(loaded_checkpoints, alpha_accuracies):
+            print "%-14s %s" % (checkpoint, total_accuracy)
+
+        # END FOR
+
+    # END IF
+
+
+def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_dataset, experiment_name, num_vids, split, base_data_path, f_name, load_model, return_layer, clip_length, video_offset, clip_offset, num_clips, clip_stride, metrics_method, batch_size, metrics_dir, loaded_checkpoint, verbose, gpu_list, preproc_method, loaded_preproc, random_init, avg_clips, use_softmax, preproc_debugging, reverse, topk, input_pipeline='queue', num_parallel_reads=4, num_parallel_calls=4, prefetch_batches=2, num_reader_threads=1, queue_capacity=0, clip_cache_dir='', bucket_boundaries=[], device_normalization=0, shared_video_store='', input_alphas=[], loaded_checkpoints=[], shard_index=0, num_shards=1):
     """
     Function used to test the performance and analyse a chosen model
     Args:
@@ -242,6 +372,20 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
         :avg_clips:          Binary boolean indicating whether to average predictions across clips
         :use_softmax:        Binary boolean indicating whether to apply softmax to the inference of the model
         :preproc_debugging:  Boolean indicating whether to load videos and clips in a queue or to load them directly for debugging (Default 0)
+        :input_pipeline:     Input pipeline used to load clips, queue or dataset
+        :num_parallel_reads: Number of tfrecords files read concurrently by the tf.data pipeline
+        :num_parallel_calls: Number of videos loaded and preprocessed in parallel by the tf.data pipeline
+        :prefetch_batches:   Number of batches prepared ahead of time by the tf.data pipeline
+        :num_reader_threads: Number of threads, each with its own reader, loading videos into the clip queue
+        :queue_capacity:     Maximum number of clips held by the clip queue, 0 indicates batch_size*num_reader_threads
+        :clip_cache_dir:     Directory of the on-disk cache of preprocessed clips, empty string disables the cache
+        :bucket_boundaries:  Frame counts separating length buckets, the clips of each batch are taken from videos of similar length
+        :device_normalization: Boolean indicating whether clips are queued as uint8 and normalized by the model on the gpu
+        :shared_video_store: Root directory of the video stores shared with concurrent processes, empty string reads the tfrecords of the split
+        :input_alphas:       Input alphas evaluated in a single pass over the videos, each with its own metrics, empty evaluates the input alpha of the model
+        :loaded_checkpoints: Checkpoints (global steps or ranges) evaluated with a single graph and pass over the videos, each with its own metrics, empty evaluates loaded_checkpoint
+        :shard_index:        Index of the shard of videos evaluated by this process
+        :num_shards:         Number of processes evaluating disjoint shards of the videos, their predictions are combined by merge_shards
 
     Returns:
         Does not return anything
@@ -255,6 +399,26 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
 
         ################################### Checkpoint loading block #######################################################
 
+        # A sweep evaluates every selected checkpoint on the clips of a single pass over the videos
+        if len(loaded_checkpoints) > 0:
+            if not load_model or len(input_alphas) > 1:
+                print "Error: a checkpoint sweep requires --load 1 and a single input alpha."
+                exit()
+
+            # END IF
+
+            loaded_checkpoints = select_checkpoints(loaded_checkpoints, model.name, loaded_dataset, experiment_name, loaded_preproc)
+
+            if len(loaded_checkpoints) == 0:
+                print "Error: none of the requested checkpoints are saved in experiment " + experiment_name + "."
+                exit()
+
+            # END IF
+
+            loaded_checkpoint = loaded_checkpoints[0]
+
+        # END IF
+
         # Load pre-trained/saved model
         if load_model:
             try:
@@ -292,13 +456,117 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
 
         data_path   = os.path.join(base_data_path, 'tfrecords_'+dataset, 'Split'+str(split), f_name)
 
+        # Preprocessing keeps clips as uint8 on the host, the model normalizes them on the gpu
+        if device_normalization and not model.enable_device_normalization():
+            print "Caution: " + model.name + " with preprocessing method " + preproc_method + " does not support device normalization, clips are normalized on the host."
+
+        # END IF
+
+        # A single input alpha is evaluated as the input alpha of the model
+        if len(input_alphas) == 1:
+            model.input_alpha = input_alphas[0]
+
+        elif len(input_alphas) > 1 and hasattr(model, 'store_alpha'):
+            print "Error: preprocessing method " + preproc_method + " tracks its own alpha of every clip, evaluate each input alpha separately using --inputAlpha."
+            exit()
+
+        # END IF
+
+        # Every input alpha or checkpoint evaluated in this pass is logged and stored in its own metrics directory
+        metrics_dirs = metrics_subdirs(metrics_dir, input_alphas, loaded_checkpoints)
+
+        # Each shard evaluates every video of its share of the split and logs its predictions below the metrics directories
+        if num_shards > 1:
+            num_vids     = len(create_video_sampler(get_manifest(data_path), 1, batch_size, clip_length, num_clips, istraining, 0, bucket_boundaries, shard_index, num_shards).epoch_order(0))
+            metrics_dirs = [os.path.join(alpha_dir, 'shard_'+str(shard_index)) for alpha_dir in metrics_dirs]
+
+            if verbose:
+                print "Evaluating shard ", shard_index, " of ", num_shards, ": ", num_vids, " videos"
+
+            # END IF
+
+        # END IF
+
+        # Preprocessed clips can only be reused if they are identical in every evaluation
+        clip_cache = None
+
+        if clip_cache_dir != '':
+            if len(input_alphas) > 1:
+                print "Clip cache is disabled since several input alphas are evaluated"
+
+            elif video_offset == 'random' or clip_offset == 'random' or reverse == 1:
+                print "Clip cache is disabled since clips are randomly selected (videoOffset, clipOffset or reverse)"
+
+            else:
+                cache_params = {'dataset': dataset, 'split': split, 'f_name': f_name, 'data_path': data_path, 'num_vids': num_vids, 'model': model.name,
+                                'preproc_method': preproc_method, 'input_alpha': getattr(model, 'input_alpha', 1.0), 'input_dims': input_dims,
+                                'seq_length': seq_length, 'size': size, 'clip_length': clip_length, 'video_offset': video_offset, 'clip_offset': clip_offset,
+                                'num_clips': num_clips, 'clip_stride': clip_stride, 'reverse': reverse}
+
+                # uint8 clips are cached separately, caches of normalized clips keep their key
+                if model.device_normalization:
+                    cache_params['device_normalization'] = 1
+
+                # END IF
+
+                if num_shards > 1:
+                    cache_params['shard'] = [shard_index, num_shards]
+
+                # END IF
+
+                clip_cache = ClipCache(clip_cache_dir, cache_params, verbose)
+
+            # END IF
+
+        # END IF
+
+        # Later checkpoints of a sweep are evaluated on the clips stored during the first pass. Clips that are not cached for
+        # later evaluations are stored in a temporary cache removed after the sweep, randomly selected clips are then shared by every checkpoint
+        sweep_cache_dir = None
+
+        if len(loaded_checkpoints) > 1 and clip_cache is None:
+            sweep_cache_dir = tempfile.mkdtemp(prefix='checkpoint_sweep_', dir=clip_cache_dir if clip_cache_dir != '' else None)
+            clip_cache      = ClipCache(sweep_cache_dir, {'loaded_checkpoints': loaded_checkpoints}, verbose)
+
+        # END IF
+
+        # Clips, labels and names evaluated by every checkpoint of a sweep without loading videos
+        replay = None
+
         # Setting up tensors for models
         # input_data_tensor - [batchSize, inputDims, height, width, channels]
-        input_data_tensor, labels_tensor, names_tensor = load_dataset(model, 1, batch_size, output_dims, input_dims, seq_length, size, data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging, 0, verbose, reverse=reverse)
+        if clip_cache is not None and clip_cache.exists() and len(loaded_checkpoints) > 1:
+            replay            = clip_cache.read()
+            input_data_tensor = tf.placeholder(tf.as_dtype(replay[0].dtype), (batch_size,) + replay[0].shape[1:])
+
+            # Nothing new needs to be written to the cache
+            clip_cache = None
+
+        elif clip_cache is not None and clip_cache.exists():
+            input_data_tensor, labels_tensor, names_tensor = clip_cache.load_dataset(batch_size)
+
+            # Nothing new needs to be written to the cache
+            clip_cache = None
+
+        else:
+            # Videos are decoded once into a video store in shared memory, read by every concurrent process
+            if shared_video_store != '':
+                data_path = attach_shared_store(data_path, shared_video_store, dataset, split, f_name, verbose)
+
+            # END IF
+
+            input_data_tensor, labels_tensor, names_tensor = load_dataset(model, 1, batch_size, output_dims, input_dims, seq_length, size, data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging, 0, verbose, reverse=reverse, input_pipeline=input_pipeline, num_parallel_reads=num_parallel_reads, num_parallel_calls=num_parallel_calls, prefetch_batches=prefetch_batches, num_reader_threads=num_reader_threads, queue_capacity=queue_capacity, bucket_boundaries=bucket_boundaries, shard_index=shard_index, num_shards=num_shards, input_alphas=input_alphas)
+
+        # END IF
 
         ######### GPU list check block ####################
 
-        assert(len(gpu_list)<=1)
+        # A single process evaluates on one device, evaluations are spread over devices as shards of processes
+        if len(gpu_list) > 1:
+            print "Error: test.py evaluates on a single device, shard the evaluation across devices with --numShards/--shardIndex (see scripts/shell/launch_sharded_test.sh)."
+            exit()
+
+        # END IF
 
         if len(gpu_list) == 0:
             gpu_list = ['0'] # Default choice is ID = 0
@@ -342,13 +610,19 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
             log_name    = ("exp_test_%s_%s_%s_%s_%s" % ( time.strftime("%d_%m_%H_%M_%S"),
                                                    dataset, preproc_method, experiment_name, metrics_method))
 
-            curr_logger = Logger(os.path.join('logs', model.name, dataset, preproc_method, metrics_dir, log_name))
+            curr_loggers = [Logger(os.path.join('logs', model.name, dataset, preproc_method, alpha_dir, log_name)) for alpha_dir in metrics_dirs]
             make_dir(os.path.join('results',model.name))
             make_dir(os.path.join('results',model.name, dataset))
             make_dir(os.path.join('results',model.name, dataset, preproc_method))
             make_dir(os.path.join('results',model.name, dataset, preproc_method, experiment_name))
             make_dir(os.path.join('results',model.name, dataset, preproc_method, experiment_name, metrics_dir))
 
+            for alpha_dir in metrics_dirs:
+                make_dir(os.path.join('results',model.name, dataset, preproc_method, experiment_name, os.path.dirname(alpha_dir)))
+                make_dir(os.path.join('results',model.name, dataset, preproc_method, experiment_name, alpha_dir))
+
+            # END FOR
+
             ###################################################################################
 
         # TF session setup
@@ -357,7 +631,7 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
         coord   = tf.train.Coordinator()
         threads = queue_runner_impl.start_queue_runners(sess=sess, coord=coord)
         if save_bool:
-            metrics = Metrics( output_dims, seq_length, curr_logger, metrics_method, istraining, model.name, experiment_name, preproc_method, dataset, metrics_dir, verbose=verbose, topk=topk)
+            metrics = [Metrics( output_dims, seq_length, curr_logger, metrics_method, istraining, model.name, experiment_name, preproc_method, dataset, alpha_dir, verbose=verbose, topk=topk) for curr_logger, alpha_dir in zip(curr_loggers, metrics_dirs)]
 
         # Variables get randomly initialized into tf graph
         sess.run(init)
@@ -385,14 +659,42 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
 
         # END IF
 
+        # Checkpoints of a sweep that are evaluated on the stored clips, the first is evaluated while loading the videos unless they are already cached
+        replayed_checkpoints = loaded_checkpoints[1:] if replay is None else loaded_checkpoints
+
         ########################################## Testing loop block ################################################################
 
-        while videos_loaded <= num_vids:
-            output_predictions, labels, names = sess.run([logits, labels_tensor, names_tensor])
+        # Videos are not loaded when every checkpoint is evaluated on cached clips
+        while replay is None and videos_loaded <= num_vids:
+            if clip_cache is not None:
+                output_predictions, labels, names, clips = sess.run([logits, labels_tensor, names_tensor, input_data_tensor])
+                clip_names = names
+
+            elif len(input_alphas) > 1:
+                output_predictions, labels, names, clip_alphas = sess.run([logits, labels_tensor, names_tensor, model.input_alphas_tensor])
+
+            else:
+                output_predictions, labels, names = sess.run([logits, labels_tensor, names_tensor])
+
+            # END IF
+
+            # Index of the metrics of the input alpha each clip was resampled with
+            if len(input_alphas) > 1:
+                alpha_indices = [np.abs(np.array(input_alphas) - clip_alpha).argmin() for clip_alpha in clip_alphas]
+
+            else:
+                alpha_indices = [0]*len(names)
+
+            # END IF
+
+            batch_clips = 0
 
             if avg_clips:
-                output_predictions = np.array([np.mean(output_predictions, 0)])
-                names = names[:1]
+                # Clips of every input alpha are averaged separately
+                batch_alphas       = sorted(set(alpha_indices), key=alpha_indices.index)
+                output_predictions = np.array([np.mean(output_predictions[np.array(alpha_indices) == alpha_index], 0) for alpha_index in batch_alphas])
+                names              = names[:len(batch_alphas)]
+                alpha_indices      = batch_alphas
 
             for batch_idx in range(len(names)):
                 vid_name = names[batch_idx]
@@ -407,15 +709,98 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
                 if videos_loaded > num_vids:
                     break
 
-                count += 1
-                
+                count       += 1
+                batch_clips += 1
+
                 if save_bool:
-                    metrics.log_prediction(labels[batch_idx][0], output_predictions[batch_idx], vid_name, count)
+                    metrics[alpha_indices[batch_idx]].log_prediction(labels[batch_idx][0], output_predictions[batch_idx], vid_name, count)
+
+            # END IF
+
+            # Store the clips of all counted videos, when averaging across clips the entire batch belongs to one video
+            if clip_cache is not None and batch_clips > 0:
+                if avg_clips:
+                    batch_clips = len(clip_names)
+
+                # END IF
+
+                clip_cache.add(clips[:batch_clips], labels[:batch_clips], clip_names[:batch_clips])
 
             # END IF
 
         # END WHILE
 
+        if clip_cache is not None:
+            clip_cache.close()
+
+            if len(replayed_checkpoints) > 0:
+                replay = clip_cache.read()
+
+            # END IF
+
+        # END IF
+
+        ########################################## Checkpoint sweep block ############################################################
+
+        # Weights are swapped in place, the graph and the clips are shared by every checkpoint
+        restorer = CheckpointRestorer(verbose)
+
+        for checkpoint in replayed_checkpoints:
+            ckpt_index = loaded_checkpoints.index(checkpoint)
+
+            if ckpt_index > 0:
+                restorer.restore(sess, load_checkpoint(model.name, loaded_dataset, experiment_name, checkpoint, loaded_preproc)[0])
+
+            # END IF
+
+            if verbose:
+                print "Evaluating checkpoint ", checkpoint
+
+            # END IF
+
+            clips, clip_labels, clip_names = replay
+            count                          = 0
+
+            for clip_idx in range(0, clips.shape[0], batch_size):
+                batch_data = np.array(clips[clip_idx:clip_idx+batch_size])
+                num_batch  = batch_data.shape[0]
+
+                # The last batch is padded to the batch size of the graph, only its stored clips are logged
+                if num_batch < batch_size:
+                    batch_data = np.concatenate([batch_data, np.repeat(batch_data[-1:], batch_size-num_batch, 0)])
+
+                # END IF
+
+                output_predictions = sess.run(logits, feed_dict={input_data_tensor: batch_data})[:num_batch]
+                labels             = clip_labels[clip_idx:clip_idx+num_batch]
+                names              = clip_names[clip_idx:clip_idx+num_batch]
+
+                # Batches are stored whole when averaging across clips, each holds the clips of one video
+                if avg_clips:
+                    output_predictions = np.mean(output_predictions, 0, keepdims=True)
+                    names              = names[:1]
+
+                # END IF
+
+                for batch_idx in range(len(names)):
+                    count += 1
+
+                    if save_bool:
+                        metrics[ckpt_index].log_prediction(labels[batch_idx][0], output_predictions[batch_idx], names[batch_idx], count)
+
+                    # END IF
+
+                # END FOR
+
+            # END FOR
+
+        # END FOR
+
+        if sweep_cache_dir is not None:
+            shutil.rmtree(sweep_cache_dir)
+
+        # END IF
+
         #########################################################################################################################################################
 
     # END WITH
@@ -425,19 +810,97 @@ def test(model, input_dims, output_dims, seq_length, size, dataset, loaded_datas
 
 
     if save_bool:
-        total_accuracy = metrics.total_classification()
-        total_pred = metrics.get_predictions_array()
+        # Predictions of a shard are only classified once merged with the other shards
+        if num_shards > 1:
+            for alpha_metrics in metrics:
+                alpha_metrics.close_shard()
 
-        if verbose:
-            print "Total accuracy : ", total_accuracy
-            print total_pred
+            # END FOR
 
-        # Save results in numpy format
-        np.save(os.path.join('results', model.name, dataset, preproc_method, experiment_name, metrics_dir, 'test_predictions_'+dataset+"_"+metrics_method+'.npy'), np.array(total_pred))
+            print "Shard ", shard_index, " of ", num_shards, " complete, merge the shards using --mergeShards 1"
+
+        else:
+            save_results(model.name, dataset, preproc_method, experiment_name, metrics_method, metrics, metrics_dirs, input_alphas, loaded_checkpoints, verbose)
+
+        # END IF
+
+
+def merge_shards(model_name, dataset, loaded_dataset, experiment_name, metrics_method, metrics_dir, preproc_method, loaded_preproc, output_dims, seq_length, num_shards, verbose, topk, input_alphas=[], loaded_checkpoints=[]):
+    """
+    Function used to merge the predictions logged by the shards of a sharded evaluation and compute the final results
+    Args:
+        :model_name:         Name of the model evaluated
+        :dataset:            Name of dataset being evaluated
+        :loaded_dataset:     Name of dataset which was used to train the current model
+        :experiment_name:    Name of current experiment
+        :metrics_method:     Which method to use to calculate accuracy metrics
+        :metrics_dir:        Name of subdirectory within the experiment to store metrics
+        :preproc_method:     The preprocessing method used
+        :loaded_preproc:     Name of preproc method which was used to train the current model
+        :output_dims:        Integer number of classes in current dataset
+        :seq_length:         Length of output sequence expected from LSTM
+        :num_shards:         Number of shards evaluated
+        :verbose:            Boolean to indicate if all print statement should be procesed or not
+        :topk:               Integer indication top k predictions made
+        :input_alphas:       Input alphas evaluated by every shard
+        :loaded_checkpoints: Checkpoints (global steps or ranges) evaluated by every shard
+
+    Returns:
+        Does not return anything
+    """
+    if len(loaded_checkpoints) > 0:
+        loaded_checkpoints = select_checkpoints(loaded_checkpoints, model_name, loaded_dataset, experiment_name, loaded_preproc)
+
+    # END IF
+
+    metrics_dirs = metrics_subdirs(metrics_dir, input_alphas, loaded_checkpoints)
+    log_name     = ("exp_test_%s_%s_%s_%s_%s" % ( time.strftime("%d_%m_%H_%M_%S"),
+                                            dataset, preproc_method, experiment_name, metrics_method))
+    metrics      = []
+
+    for alpha_dir in metrics_dirs:
+        alpha_metrics = Metrics(output_dims, seq_length, Logger(os.path.join('logs', model_name, dataset, preproc_method, alpha_dir, log_name)), metrics_method, False, model_name, experiment_name, preproc_method, dataset, alpha_dir, verbose=verbose, topk=topk)
+
+        for shard_index in range(num_shards):
+            alpha_metrics.merge_shard(os.path.join(alpha_dir, 'shard_'+str(shard_index)))
+
+        # END FOR
+
+        metrics.append(alpha_metrics)
+
+    # END FOR
+
+    save_results(model_name, dataset, preproc_method, experiment_name, metrics_method, metrics, metrics_dirs, input_alphas, loaded_checkpoints, verbose)
+
+    # Predictions of the shards are only removed once every shard has been merged, a failed merge can be repeated
+    for alpha_dir in metrics_dirs:
+        for shard_index in range(num_shards):
+            shutil.rmtree(os.path.join('results', model_name, dataset, preproc_method, experiment_name, alpha_dir, 'shard_'+str(shard_index)))
+
+        # END FOR
+
+    # END FOR
 
 
 if __name__=="__main__":
-    if not args.train:
+    if not args.train and args.mergeShards:
+        merge_shards(model_name         = model_name,
+                     dataset            = args.dataset,
+                     loaded_dataset     = args.loadedDataset,
+                     experiment_name    = args.expName,
+                     metrics_method     = args.metricsMethod,
+                     metrics_dir        = args.metricsDir,
+                     preproc_method     = args.preprocMethod,
+                     loaded_preproc     = loaded_preproc,
+                     output_dims        = args.outputDims,
+                     seq_length         = args.seqLength,
+                     num_shards         = args.numShards,
+                     verbose            = args.verbose,
+                     topk               = args.topk,
+                     input_alphas       = args.inputAlphas,
+                     loaded_checkpoints = args.loadedCheckpoints)
+
+    elif not args.train:
         test(   model             = model,
                 input_dims        = args.inputDims,
                 output_dims       = args.outputDims,
@@ -470,7 +933,21 @@ if __name__=="__main__":
                 use_softmax       = args.useSoftmax,
                 preproc_debugging = args.preprocDebugging,
                 reverse           = args.reverse,
-                topk              = args.topk)
+                topk              = args.topk,
+                input_pipeline    = args.inputPipeline,
+                num_parallel_reads = args.numParallelReads,
+                num_parallel_calls = args.numParallelCalls,
+                prefetch_batches  = args.prefetchBatches,
+                num_reader_threads = args.numReaderThreads,
+                queue_capacity    = args.queueCapacity,
+                clip_cache_dir    = args.clipCacheDir,
+                bucket_boundaries = args.bucketBoundaries,
+                device_normalization = args.deviceNormalization,
+                shared_video_store = args.sharedVideoStore,
+                input_alphas      = args.inputAlphas,
+                loaded_checkpoints = args.loadedCheckpoints,
+                shard_index       = args.shardIndex,
+                num_shards        = args.numShards)
 
     # END IF
 
@@ -17,12 +17,17 @@ from tensorflow.python.training import queue_runner_impl
 
 # Custom imports
 from models                       import *
-from utils                        import initialize_from_dict, save_checkpoint, load_checkpoint, make_dir, Metrics
+from utils                        import initialize_from_dict, save_checkpoint, load_checkpoint, load_checkpoint_data, make_dir, Metrics
 from Queue                        import Queue
 from utils.logger                 import Logger
 from random                       import shuffle
-from utils.load_dataset_tfrecords import load_dataset
+from utils.load_dataset_tfrecords import load_dataset, STAGING_WARMUP, STAGING_PUT
 from utils.argument_utils         import read_json, assign_args
+from utils.dataset_manifest_utils import num_videos, load_manifest, get_manifest, uniform_clips_per_video, clips_per_epoch
+from utils.gradient_utils         import average_gradients, fused_average_gradients
+from utils.video_cache_utils      import VideoCache
+from utils.shared_video_store_utils import attach_shared_store
+from utils.distributed_utils      import create_server, device_setter, wait_for_chief, start_sync_replicas, release_workers
 
 parser = argparse.ArgumentParser()
 
@@ -112,8 +117,8 @@ parser.add_argument('--size', action='store', required='size' not in json_keys,
 parser.add_argument('--expName', action='store', required='expName' not in json_keys,
         help = 'Unique name of experiment being run')
 
-parser.add_argument('--numVids', action='store', required='numVids' not in json_keys, type=int,
-        help = 'Number of videos to be used for training')
+parser.add_argument('--numVids', action='store', type=int, default=0,
+        help = 'Number of videos to be used for training, 0 reads the number of videos of the split from its dataset manifest (Default 0)')
 
 parser.add_argument('--nEpochs', action='store', type=int, default=1,
         help = 'Number of Epochs')
@@ -172,6 +177,63 @@ parser.add_argument('--verbose', action='store', type=int, default=1,
 parser.add_argument('--save', action='store', type=int, default=1,
         help = 'Boolean indicating whether to save results, metrics, and logs. Used to test code.')
 
+parser.add_argument('--inputPipeline', action='store', default='queue',
+        help = 'Input pipeline used to load clips, queue (queue runners) or dataset (tf.data) (Default queue)')
+
+parser.add_argument('--numParallelReads', action='store', type=int, default=4,
+        help = 'Number of tfrecords files read concurrently when --inputPipeline dataset is used (Default 4)')
+
+parser.add_argument('--numParallelCalls', action='store', type=int, default=4,
+        help = 'Number of videos loaded and preprocessed in parallel when --inputPipeline dataset is used (Default 4)')
+
+parser.add_argument('--prefetchBatches', action='store', type=int, default=2,
+        help = 'Number of batches prepared ahead of time when --inputPipeline dataset is used (Default 2)')
+
+parser.add_argument('--numReaderThreads', action='store', type=int, default=1,
+        help = 'Number of threads per gpu, each with its own tfrecords reader, loading videos into the clip queue (Default 1)')
+
+parser.add_argument('--queueCapacity', action='store', type=int, default=0,
+        help = 'Maximum number of clips held by the clip queue, at least numGpus*batchSize. 0 indicates numGpus*batchSize*numReaderThreads (Default 0)')
+
+parser.add_argument('--shuffleQueue', action='store', type=int, default=0,
+        help = 'Boolean indicating whether to shuffle clips across videos in the clip queue, intended for training with one clip per video since videos are counted from changes in video names (Default 0)')
+
+parser.add_argument('--bucketBoundaries', nargs='+', type=int, default=[],
+        help = 'Frame counts separating length buckets, videos are loaded in an order where the clips of each batch come from videos of similar length, read from the dataset manifest (Default none)')
+
+parser.add_argument('--resumableSampler', action='store', type=int, default=0,
+        help = 'Boolean indicating whether to load videos in a seeded order whose position is saved with every checkpoint, --load resumes from the next video instead of restarting the epoch. Exact with --inputPipeline dataset or a single reader thread (Default 0)')
+
+parser.add_argument('--inputSharding', action='store', type=int, default=0,
+        help = 'Boolean indicating whether every gpu loads a disjoint shard of the videos of each epoch with its own input pipeline, prefetching batches to the gpu, instead of slicing one batch of numGpus*batchSize clips (Default 0)')
+
+parser.add_argument('--gradAggregation', action='store', type=str, default='concat',
+        help = 'Averaging of the gradients of every gpu: concat (each gradient separately), fused (gradients packed into buckets summed by a tree of adds over the gpus) or fused_nccl (buckets reduced by NCCL all-reduce) (Default concat)')
+
+parser.add_argument('--gradBucketMB', action='store', type=int, default=8,
+        help = 'Minimum size in megabytes of the buckets gradients are packed into when --gradAggregation is fused or fused_nccl (Default 8)')
+
+parser.add_argument('--deviceNormalization', action='store', type=int, default=0,
+        help = 'Boolean indicating whether clips are queued as uint8 and cast, scaled and mean subtracted by the model on the gpus at the head of inference, models that do not support it keep normalizing on the host (Default 0)')
+
+parser.add_argument('--videoCacheMB', action='store', type=int, default=0,
+        help = 'Memory budget in megabytes of an in-process cache of decoded videos reused across epochs, least recently used videos are evicted first (Default 0, disabled)')
+
+parser.add_argument('--sharedVideoStore', action='store', type=str, default='',
+        help = 'Root directory, e.g. /dev/shm/mpact_video_stores, of video stores shared with concurrent processes. The first process decodes the split into a memory-mapped video store that every process then reads, empty string disables sharing (Default \'\')')
+
+parser.add_argument('--psHosts', nargs='+', type=str, default=[],
+        help = 'host:port of every parameter server when training with several workers (Default none)')
+
+parser.add_argument('--workerHosts', nargs='+', type=str, default=[],
+        help = 'host:port of every worker when training with several workers, each worker trains on its own shard of videos with numGpus gpus (Default none, single process training)')
+
+parser.add_argument('--jobName', action='store', type=str, default='worker',
+        help = 'Job of this process when training with several workers: ps or worker (Default worker)')
+
+parser.add_argument('--taskIndex', action='store', type=int, default=0,
+        help = 'Index of this process within its job when training with several workers, worker 0 is the chief saving checkpoints (Default 0)')
+
 parser.add_argument('--reverse', action='store', type=int, default=0,
         help = 'Boolean indicating whether reverse videos and classify them as a new action class. 0 all videos are forward, 1 randomly reversed videos, 2 all videos are reversed')
 
@@ -180,6 +242,12 @@ args = parser.parse_args()
 
 args = assign_args(args, args_json, sys.argv)
 
+# The number of videos is read from the dataset manifest of the split when it is not specified
+if args.numVids <= 0:
+    args.numVids = num_videos(os.path.join(args.baseDataPath, 'tfrecords_'+args.dataset, 'Split'+str(args.split), args.fName))
+
+# END IF
+
 if args.verbose:
     print "Setup of current experiments"
     print "\n############################"
@@ -210,50 +278,35 @@ model = models_import.create_model_object(modelName = model_name,
 
 
 
-def _average_gradients(tower_grads):
+def _sampler_data(resumable_sampler, videos_loaded, videos_resume, tot_count, clips_per_video, num_workers=1):
     """
-    Calculate the average gradient for each shared variable across all towers.
-    Note that this function provides a synchronization point across all towers.
+    Position of the video sampler saved with a checkpoint
     Args:
-        tower_grads: List of lists of (gradient, variable) tuples. The outer list
-                     is over individual gradients. The inner list is over the gradient
-                     calculation for each tower.
-    Returns:
-        List of pairs of (gradient, variable) where the gradient has been averaged
-        across all towers.
+        :resumable_sampler: Boolean indicating whether the position of the video sampler is saved
+        :videos_loaded:     Number of videos loaded, counting the video whose clips are currently being trained on
+        :videos_resume:     Number of videos trained on before the current run
+        :tot_count:         Number of clips trained on during the current run
+        :clips_per_video:   Number of clips extracted from every video, None when it depends on the length of each video
+        :num_workers:       Number of workers, each counting the videos of its own shard
+
+    Return:
+        Dictionary containing the number of videos whose clips have all been trained on by all workers, empty if the sampler is not resumable
     """
+    if not resumable_sampler:
+        return {}
 
-    average_grads = []
-
-    for grad_and_vars in zip(*tower_grads):
-        # Note that each grad_and_vars looks like the following:
-        #   ((grad0_gpu0, var0_gpu0), ... , (grad0_gpuN, var0_gpuN))
-        grads = []
-
-        for g, _ in grad_and_vars:
-            # Add 0 dimension to the gradients to represent the tower.
-            expanded_g = tf.expand_dims(g, 0)
+    # END IF
 
-            # Append on a 'tower' dimension which we will average over below.
-            grads.append(expanded_g)
+    if clips_per_video is not None:
+        return {'videos_loaded': (videos_resume + tot_count / clips_per_video) * num_workers}
 
-        # END FOR
-
-        # Average over the 'tower' dimension.
-        grad = tf.concat(axis=0, values=grads)
-        grad = tf.reduce_mean(grad, 0)
+    # END IF
 
-        # Keep in mind that the Variables are redundant because they are shared
-        # across towers. So .. we will just return the first tower's pointer to
-        # the Variable.
-        v = grad_and_vars[0][1]
-        grad_and_var = (grad, v)
-        average_grads.append(grad_and_var)
+    # The last video counted from its name may have clips left in the queue, it is loaded again on resume
+    return {'videos_loaded': max(videos_loaded - 1, videos_resume) * num_workers}
 
-    # END FOR
-    return average_grads
 
-def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, experiment_name, load_model, num_vids, n_epochs, split, base_data_path, f_name, learning_rate_init, wd, save_freq, clip_length, video_offset, clip_offset, num_clips, clip_stride, batch_size, loss_type, metrics_dir, loaded_checkpoint, verbose, opt_choice, gpu_list, grad_clip_value, preproc_method, random_init, shuffle_seed, preproc_debugging, reverse):
+def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, experiment_name, load_model, num_vids, n_epochs, split, base_data_path, f_name, learning_rate_init, wd, save_freq, clip_length, video_offset, clip_offset, num_clips, clip_stride, batch_size, loss_type, metrics_dir, loaded_checkpoint, verbose, opt_choice, gpu_list, grad_clip_value, preproc_method, random_init, shuffle_seed, preproc_debugging, reverse, input_pipeline='queue', num_parallel_reads=4, num_parallel_calls=4, prefetch_batches=2, num_reader_threads=1, queue_capacity=0, shuffle_queue=0, bucket_boundaries=[], resumable_sampler=0, input_sharding=0, grad_aggregation='concat', grad_bucket_mb=8, device_normalization=0, video_cache_mb=0, shared_video_store='', ps_hosts=[], worker_hosts=[], task_index=0):
     """
     Training function used to train or fine-tune a chosen model
     Args:
@@ -293,16 +346,48 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
         :random_init:        Randomly initialize model weights, not loading from any files (deafult False)
         :preproc_debugging:  Boolean indicating whether to load videos and clips in a queue or to load them directly for debugging (Default 0)
         :reverse:            Boolean indicating whether reverse videos and classify them as a new action class.
+        :input_pipeline:     Input pipeline used to load clips, queue or dataset
+        :num_parallel_reads: Number of tfrecords files read concurrently by the tf.data pipeline
+        :num_parallel_calls: Number of videos loaded and preprocessed in parallel by the tf.data pipeline
+        :prefetch_batches:   Number of batches prepared ahead of time by the tf.data pipeline
+        :num_reader_threads: Number of threads per gpu, each with its own reader, loading videos into the clip queue
+        :queue_capacity:     Maximum number of clips held by the clip queue, 0 indicates num_gpus*batch_size*num_reader_threads
+        :shuffle_queue:      Boolean indicating whether to shuffle clips across videos in the clip queue
+        :bucket_boundaries:  Frame counts separating length buckets, the clips of each batch are taken from videos of similar length
+        :resumable_sampler:  Boolean indicating whether to save the position of the video sampler with checkpoints and resume loading from it
+        :input_sharding:     Boolean indicating whether every gpu loads a disjoint shard of the videos with its own input pipeline prefetching to the gpu
+        :grad_aggregation:   "concat", "fused" or "fused_nccl" indicating how the gradients of every gpu are averaged
+        :grad_bucket_mb:     Minimum size in megabytes of the buckets gradients are packed into by fused aggregation
+        :device_normalization: Boolean indicating whether clips are queued as uint8 and normalized by the model on the gpus
+        :video_cache_mb:     Memory budget in megabytes of the cache of decoded videos reused across epochs, 0 disables the cache
+        :shared_video_store: Root directory of the video stores shared with concurrent processes, empty string reads the tfrecords of the split
+        :ps_hosts:           List of host:port of the parameter servers when training with several workers
+        :worker_hosts:       List of host:port of the workers, empty trains in a single process
+        :task_index:         Index of this worker, worker 0 is the chief
 
     Returns:
         Does not return anything
     """
 
-    with tf.name_scope("my_scope") as scope:
+    # With several workers, variables are placed on the parameter servers and the chief (worker 0) initializes, loads and saves them
+    cluster       = None
+    worker_device = ''
+    num_workers   = max(len(worker_hosts), 1)
+    is_chief      = task_index == 0
+    save_results  = save_bool and is_chief
 
-        # Initializers for checkpoint and global step variable
-        ckpt    = None
-        gs_init = 0
+    if len(worker_hosts) > 0:
+        cluster, server = create_server(ps_hosts, worker_hosts, 'worker', task_index)
+        worker_device   = '/job:worker/task:' + str(task_index)
+
+    # END IF
+
+    with tf.name_scope("my_scope") as scope, tf.device(device_setter(cluster, worker_device)):
+
+        # Initializers for checkpoint, global step variable and number of videos trained on before this run
+        ckpt          = None
+        gs_init       = 0
+        videos_resume = 0
 
         ################################### Checkpoint loading block #######################################################
 
@@ -313,6 +398,13 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
                 if verbose:
                     print 'A better checkpoint is found. The global_step value is: ' + str(gs_init)
 
+                # END IF
+
+                if resumable_sampler:
+                    videos_resume = int(load_checkpoint_data(model.name, dataset, experiment_name, loaded_checkpoint, preproc_method).get('videos_loaded', 0))
+
+                # END IF
+
             except:
                 if verbose:
                     print "Failed loading checkpoint requested. Please check."
@@ -330,17 +422,33 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
         global_step        = tf.Variable(gs_init, name='global_step', trainable=False)
         number_of_videos   = tf.Variable(num_vids, name='number_of_videos', trainable=False)
         number_of_epochs   = tf.Variable(n_epochs, name='number_of_epochs', trainable=False)
-        video_step         = tf.Variable(1.0, name='video_step', trainable=False)
+        # The resumable sampler numbers videos from its saved position, otherwise video_step keeps its original start
+        if resumable_sampler:
+            video_step     = tf.Variable(float(videos_resume), name='video_step', trainable=False)
+
+        else:
+            video_step     = tf.Variable(1.0, name='video_step', trainable=False)
+
+        # END IF
+
         istraining         = True
         reuse_variables    = None
 
+        if cluster is not None:
+            chief_ready    = tf.Variable(False, name='chief_ready', trainable=False)
+
+        # END IF
+
         # TF session setup
         config  = tf.ConfigProto(allow_soft_placement=True) #, gpu_options = tf.GPUOptions(per_process_gpu_memory_fraction=0.8))
-        sess    = tf.Session(config=config)
+        sess    = tf.Session(server.target if cluster is not None else '', config=config)
         init    = tf.global_variables_initializer()
 
         # Variables get randomly initialized into tf graph
-        sess.run(init)
+        if is_chief:
+            sess.run(init)
+
+        # END IF
 
         tower_losses       = []
         tower_grads        = []
@@ -348,20 +456,91 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
 
         data_path = os.path.join(base_data_path, 'tfrecords_'+dataset, 'Split'+str(split), f_name)
 
+        # Videos are decoded once into a video store in shared memory, read by every concurrent process
+        if shared_video_store != '':
+            data_path = attach_shared_store(data_path, shared_video_store, dataset, split, f_name, verbose)
+
+        # END IF
+
+        # Preprocessing keeps clips as uint8 on the host, the model normalizes them on the gpus
+        if device_normalization and not model.enable_device_normalization():
+            print "Caution: " + model.name + " with preprocessing method " + preproc_method + " does not support device normalization, clips are normalized on the host."
+
+        # END IF
+
+        # Decoded videos are kept in memory after the first epoch, shared by the input pipelines of every gpu
+        video_cache = None
+
+        if video_cache_mb > 0:
+            video_cache = VideoCache(video_cache_mb)
+
+        # END IF
+
+        ################# GPU list check block ####################
+
+        assert((len(gpu_list) == num_gpus) or (len(gpu_list) == 0))
+
+        if len(gpu_list) == 0:
+            gpu_list = [str(x) for x in range(num_gpus)]
+
+        # END IF
+
+        ###########################################################
+
+
         # Setup tensors for models
         # input_data_tensor - [batchSize, inputDims, height, width, channels]
-        input_data_tensor, labels_tensor, names_tensor = load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging, shuffle_seed, verbose, reverse=reverse)
+        if input_sharding:
+            # Every gpu reads its own shard of videos on the host and prefetches its batches to the gpu
+            tower_inputs = []
 
-        ############### TO DO: FIX THIS ASAP ########################
-        if ((batch_size == 1) and (num_clips==1)):
-            sess.run(tf.assign_add(video_step, -2))
+            for gpu_idx in range(num_gpus):
+                with tf.device(worker_device+'/cpu:0'):
+                    tower_inputs.append(load_dataset(model, 1, batch_size, output_dims, input_dims, seq_length, size, data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging, shuffle_seed, verbose, reverse=reverse, input_pipeline=input_pipeline, num_parallel_reads=num_parallel_reads, num_parallel_calls=num_parallel_calls, prefetch_batches=prefetch_batches, num_reader_threads=num_reader_threads, queue_capacity=queue_capacity, shuffle_queue=shuffle_queue, bucket_boundaries=bucket_boundaries, sampler_position=videos_resume if resumable_sampler else None, shard_index=task_index*num_gpus+gpu_idx, num_shards=num_workers*num_gpus, device=worker_device+'/gpu:'+str(gpu_list[gpu_idx]), video_cache=video_cache))
+
+                # END WITH
+
+            # END FOR
+
+            tower_data    = [tower_input[0] for tower_input in tower_inputs]
+            tower_labels  = [tower_input[1] for tower_input in tower_inputs]
+            labels_tensor = tf.concat(tower_labels, 0)
+            names_tensor  = tf.concat([tower_input[2] for tower_input in tower_inputs], 0)
 
         else:
-            sess.run(tf.assign_add(video_step, -1))
+            input_data_tensor, labels_tensor, names_tensor = load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging, shuffle_seed, verbose, reverse=reverse, input_pipeline=input_pipeline, num_parallel_reads=num_parallel_reads, num_parallel_calls=num_parallel_calls, prefetch_batches=prefetch_batches, num_reader_threads=num_reader_threads, queue_capacity=queue_capacity, shuffle_queue=shuffle_queue, bucket_boundaries=bucket_boundaries, sampler_position=videos_resume if resumable_sampler else None, shard_index=task_index, num_shards=num_workers, video_cache=video_cache)
+
+            tower_data   = [input_data_tensor[gpu_idx*batch_size:gpu_idx*batch_size+batch_size,:,:,:,:] for gpu_idx in range(num_gpus)]
+            tower_labels = [labels_tensor[gpu_idx*batch_size:gpu_idx*batch_size+batch_size, :] for gpu_idx in range(num_gpus)]
+
+        # END IF
+
+        ############### TO DO: FIX THIS ASAP ########################
+        if not resumable_sampler and is_chief:
+            if ((batch_size == 1) and (num_clips==1)):
+                sess.run(tf.assign_add(video_step, -2))
+
+            else:
+                sess.run(tf.assign_add(video_step, -1))
+
+            # END IF
 
         # END IF
         ############################################################
 
+        # Number of clips every video contributes when it does not depend on the length of the video
+        clips_per_video = uniform_clips_per_video(clip_length, num_clips)
+
+        if verbose:
+            manifest = load_manifest(data_path)
+
+            if manifest is not None:
+                print "Clips per epoch: ", clips_per_epoch(manifest, dataset, clip_length, num_clips, clip_stride, video_offset)
+
+            # END IF
+
+        # END IF
+
 
         learning_rate = tf.Variable(learning_rate_init, name='learning_rate', trainable=False)
 
@@ -382,24 +561,12 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
                              2) Setup tower name scope for variables
         """
 
-        ################# GPU list check block ####################
-
-        assert((len(gpu_list) == num_gpus) or (len(gpu_list) == 0))
-
-        if len(gpu_list) == 0:
-            gpu_list = [str(x) for x in range(num_gpus)]
-
-        # END IF
-
-        ###########################################################
-
-
         ################################################## Setup TF graph block ######################################################
         for gpu_idx in range(num_gpus):
-            with tf.device('/gpu:'+str(gpu_list[gpu_idx])):
+            with tf.device(device_setter(cluster, worker_device, '/gpu:'+str(gpu_list[gpu_idx]))):
                 with tf.name_scope('%s_%d' % ('tower', int(gpu_list[gpu_idx]))) as scope:
                     with tf.variable_scope(tf.get_variable_scope(), reuse = reuse_variables):
-                        returned_layers = model.inference(input_data_tensor[gpu_idx*batch_size:gpu_idx*batch_size+batch_size,:,:,:,:],
+                        returned_layers = model.inference(tower_data[gpu_idx],
                                                  istraining,
                                                  input_dims,
                                                  output_dims,
@@ -423,7 +590,7 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
                                                4) Aggregate losses, gradients and logits
                     """
 
-                    total_loss = model.loss(logits, labels_tensor[gpu_idx*batch_size:gpu_idx*batch_size+batch_size, :], loss_type)
+                    total_loss = model.loss(logits, tower_labels[gpu_idx], loss_type)
                     opt        = optimizer(learning_rate)
                     gradients  = opt.compute_gradients(total_loss, vars_.trainable_variables())
 
@@ -443,16 +610,32 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
                     3) Apply mean gradient updates
         """
 
-        gradients            = _average_gradients(tower_grads)
+        if grad_aggregation == 'concat':
+            gradients = average_gradients(tower_grads)
+
+        else:
+            gradients = fused_average_gradients(tower_grads, [worker_device+'/gpu:'+str(gpu_id) for gpu_id in gpu_list], grad_bucket_mb*1024*1024, 'nccl' if grad_aggregation == 'fused_nccl' else 'tree')
+
+        # END IF
+
         gradients, variables = zip(*gradients)
         clipped_gradients, _ = clip_ops.clip_by_global_norm(gradients, grad_clip_value)
         gradients            = list(zip(clipped_gradients, variables))
+
+        # The averaged gradients of all workers are aggregated into a single update per step
+        if cluster is not None:
+            opt = tf.train.SyncReplicasOptimizer(opt, replicas_to_aggregate=num_workers, total_num_replicas=num_workers)
+
+        # END IF
+
         grad_updates         = opt.apply_gradients(gradients, global_step=global_step, name="train")
-        train_op             = grad_updates
+
+        # Every step stages the batches of the following step on the gpus while it trains on the current ones
+        train_op             = tf.group(grad_updates, *tf.get_collection(STAGING_PUT))
 
         ############################################################################################################################################
 
-        if save_bool:
+        if save_results:
             ######################### Logger Setup block ######################################
 
             # Logging setup initialization (Naming format: Date, month, hour, minute, second)
@@ -473,30 +656,72 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
 
         init    = tf.global_variables_initializer()
         coord   = tf.train.Coordinator()
+
+        # Workers other than the chief start loading videos once the chief has initialized the variables and loaded the weights
+        if not is_chief:
+            wait_for_chief(sess, chief_ready)
+
+        # END IF
+
         threads = queue_runner_impl.start_queue_runners(sess=sess, coord=coord)
 
-        # Variables get randomly initialized into tf graph
-        sess.run(init)
+        if is_chief:
+            # Variables get randomly initialized into tf graph
+            sess.run(init)
 
-        # Check that weights were loaded or random initializations are requested
-        if ((ckpt == None) or (random_init)):
-            print "Caution: Model weights are not being loaded, using random initialization."
+            # Check that weights were loaded or random initializations are requested
+            if ((ckpt == None) or (random_init)):
+                print "Caution: Model weights are not being loaded, using random initialization."
 
-        else:
-            # Model variables initialized from previous saved models
-            initialize_from_dict(sess, ckpt, model.name)
+            else:
+                # Model variables initialized from previous saved models
+                initialize_from_dict(sess, ckpt, model.name)
+
+            # END IF
 
         # END IF
 
         del ckpt
 
+        if cluster is not None:
+            start_sync_replicas(sess, opt, is_chief)
+
+            if is_chief:
+                sess.run(tf.assign(chief_ready, True))
+
+            # END IF
+
+        # END IF
+
+        # Stage the first batch of every gpu when batches are prefetched to the gpus through staging areas
+        sess.run(tf.get_collection(STAGING_WARMUP))
+
+
+        # With several workers, each worker counts the videos of its own shard (about numVids/numWorkers per epoch)
+        worker_vids  = num_vids / num_workers
+        videos_start = videos_resume / num_workers
+
+        # Workers must run the same number of synchronized steps, training stops at the global step covering every clip of every epoch
+        last_step = None
+
+        if cluster is not None:
+            epoch_clips = clips_per_epoch(get_manifest(data_path), dataset, clip_length, num_clips, clip_stride, video_offset)
+
+            if epoch_clips is None:
+                raise ValueError('Training with several workers requires a fixed number of clips per video, --videoOffset random is only supported with --numClips > 0')
+
+            # END IF
+
+            last_step = (n_epochs*epoch_clips + num_workers*num_gpus*batch_size - 1) / (num_workers*num_gpus*batch_size)
+
+        # END IF
 
         # Initialize tracking variables
         previous_vid_name = ""
-        videos_loaded     = 0
+        videos_loaded     = videos_start
         tot_count         = 0
         acc               = 0
-        epoch_count       = 0
+        epoch_count       = videos_start / worker_vids
         tot_load_time     = 0.0
         tot_train_time    = 0.0
         last_loss         = None
@@ -519,18 +744,18 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
         ########################################## Training loop block ################################################################
 
         # Loop epoch number of time over the training set
-        while videos_loaded < n_epochs*num_vids:
+        while (videos_loaded < n_epochs*num_vids) if last_step is None else (global_step.eval(session=sess) < last_step):
             # Variable to update during epoch intervals
-            if (epoch_count+1)*num_vids <= videos_loaded < (epoch_count+1)*num_vids + num_gpus*batch_size:
+            if (epoch_count+1)*worker_vids <= videos_loaded < (epoch_count+1)*worker_vids + num_gpus*batch_size:
                 batch_count = 0
                 epoch_acc   = 0
 
                 if epoch_count % save_freq == 0 and tot_count > 0:
-                    if save_bool:
+                    if save_results:
                         if verbose:
                             print "Saving..."
 
-                        save_checkpoint(sess, model.name, dataset, experiment_name, preproc_method, l_r, global_step.eval(session=sess))
+                        save_checkpoint(sess, model.name, dataset, experiment_name, preproc_method, l_r, global_step.eval(session=sess), _sampler_data(resumable_sampler, videos_loaded, videos_start, tot_count, clips_per_video, num_workers))
 
                 # END IF
 
@@ -558,6 +783,12 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
                     previous_vid_name = name
                 tot_count += 1
 
+            # Videos are counted exactly from the number of clips trained on, even when --shuffleQueue mixes clips of different videos
+            if clips_per_video is not None:
+                videos_loaded = videos_start + (tot_count + clips_per_video - 1) / clips_per_video
+
+            # END IF
+
             ######## Adaptive Learning Rate Control Block ############################
 
             losses_tracker.append(np.mean(loss_train))
@@ -634,7 +865,7 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
 
             # END IF
             
-            if save_bool:
+            if save_results:
                 curr_logger.add_scalar_value('train/train_time',time_post_train - time_pre_train, step=gs)
                 curr_logger.add_scalar_value('train/loss',      float(np.mean(loss_train)), step=gs)
                 curr_logger.add_scalar_value('train/epoch_acc', epoch_acc/float(batch_count), step=gs)
@@ -657,14 +888,19 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
         # END WHILE
 
         #########################################################################################################################################################
-        
-        if save_bool:
+
+        if cluster is not None and is_chief:
+            release_workers(sess, opt, num_workers)
+
+        # END IF
+
+        if save_results:
             if verbose:
                 print "Saving..."
 
             # END IF
 
-            save_checkpoint(sess, model.name, dataset, experiment_name, preproc_method, l_r, gs)
+            save_checkpoint(sess, model.name, dataset, experiment_name, preproc_method, l_r, gs, _sampler_data(resumable_sampler, videos_loaded, videos_start, tot_count, clips_per_video, num_workers))
             coord.request_stop()
             coord.join(threads)
 
@@ -674,10 +910,15 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
             print "Tot train time: ", tot_train_time
             print "Tot time:       ", time.time()-time_init
 
+            if video_cache is not None:
+                print video_cache.summary()
+
+            # END IF
+
     # END WITH
 
     
-        if save_bool: 
+        if save_results: 
             # Save tracked parameterization variables as a numpy file
 	    if len(total_params) != 0:
 	        total_params = np.array(total_params).flatten()
@@ -697,7 +938,12 @@ def train(model, input_dims, output_dims, seq_length, size, num_gpus, dataset, e
         # END IF
 
 if __name__=="__main__":
-    if args.train:
+    if args.jobName == 'ps':
+        # Parameter servers hold the variables of every worker until they are terminated
+        cluster, server = create_server(args.psHosts, args.workerHosts, 'ps', args.taskIndex)
+        server.join()
+
+    elif args.train:
         train(  model               = model,
                 input_dims          = args.inputDims,
                 output_dims         = args.outputDims,
@@ -732,6 +978,24 @@ if __name__=="__main__":
                 random_init         = args.randomInit,
                 shuffle_seed        = args.shuffleSeed,
                 preproc_debugging   = args.preprocDebugging,
-                reverse             = args.reverse)
+                reverse             = args.reverse,
+                input_pipeline      = args.inputPipeline,
+                num_parallel_reads  = args.numParallelReads,
+                num_parallel_calls  = args.numParallelCalls,
+                prefetch_batches    = args.prefetchBatches,
+                num_reader_threads  = args.numReaderThreads,
+                queue_capacity      = args.queueCapacity,
+                shuffle_queue       = args.shuffleQueue,
+                bucket_boundaries   = args.bucketBoundaries,
+                resumable_sampler   = args.resumableSampler,
+                input_sharding      = args.inputSharding,
+                grad_aggregation    = args.gradAggregation,
+                grad_bucket_mb      = args.gradBucketMB,
+                device_normalization = args.deviceNormalization,
+                video_cache_mb      = args.videoCacheMB,
+                shared_video_store  = args.sharedVideoStore,
+                ps_hosts            = args.psHosts,
+                worker_hosts        = args.workerHosts,
+                task_index          = args.taskIndex)
 
     # END IF
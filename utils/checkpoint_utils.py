@@ -71,7 +71,92 @@ def load_checkpoint(model, dataset, experiment_name, loaded_checkpoint, preproc_
 
     # END TRY
 
-def save_checkpoint(sess, model, dataset, experiment_name, preproc_method, lr, gs):
+def list_checkpoints(model, dataset, experiment_name, preproc_method):
+    """
+    Function to list the global steps of every saved checkpoint of an experiment
+    Args:
+        :model:           String indicating selected model
+        :dataset:         String indicating selected dataset
+        :experiment_name: Name of experiment folder
+        :preproc_method:  The preprocessing method to use, default, cvr, rr, sr, or any other custom preprocessing
+
+    Return:
+        Sorted list of the global steps of the saved checkpoints
+    """
+    checkpoint_dir = os.path.join('results', model, dataset, preproc_method, experiment_name, 'checkpoints')
+    steps          = []
+
+    if os.path.isdir(checkpoint_dir):
+        for filename in os.listdir(checkpoint_dir):
+            if filename.startswith('checkpoint-') and filename.endswith('.npy') and filename[len('checkpoint-'):-len('.npy')].isdigit():
+                steps.append(int(filename[len('checkpoint-'):-len('.npy')]))
+
+            # END IF
+
+        # END FOR
+
+    # END IF
+
+    return sorted(steps)
+
+
+def select_checkpoints(checkpoint_specs, model, dataset, experiment_name, preproc_method):
+    """
+    Function to resolve a list of checkpoint specifications into the saved checkpoints they select
+    Args:
+        :checkpoint_specs: List of strings, each a global step (e.g. 837), an inclusive range start:stop of saved checkpoints,
+                           a range start:stop:step of every step-th global step or all for every saved checkpoint
+        :model:            String indicating selected model
+        :dataset:          String indicating selected dataset
+        :experiment_name:  Name of experiment folder
+        :preproc_method:   The preprocessing method to use, default, cvr, rr, sr, or any other custom preprocessing
+
+    Return:
+        List of the global steps of the selected checkpoints, in the order they were specified
+    """
+    saved    = list_checkpoints(model, dataset, experiment_name, preproc_method)
+    selected = []
+
+    for spec in checkpoint_specs:
+        if spec == 'all':
+            steps = saved
+
+        elif ':' in spec:
+            bounds = [int(bound) for bound in spec.split(':')]
+
+            if len(bounds) == 2:
+                steps = [step for step in saved if bounds[0] <= step <= bounds[1]]
+
+            else:
+                steps = [step for step in range(bounds[0], bounds[1]+1, bounds[2]) if step in saved]
+
+            # END IF
+
+        else:
+            steps = [int(spec)]
+
+            if steps[0] not in saved:
+                print "Caution: checkpoint-" + spec + " is not saved in experiment " + experiment_name + ", it is skipped."
+                steps = []
+
+            # END IF
+
+        # END IF
+
+        for step in steps:
+            if step not in selected:
+                selected.append(step)
+
+            # END IF
+
+        # END FOR
+
+    # END FOR
+
+    return selected
+
+
+def save_checkpoint(sess, model, dataset, experiment_name, preproc_method, lr, gs, data={}):
     """
     Function to save numpy checkpoint file
     Args:
@@ -82,6 +167,7 @@ def save_checkpoint(sess, model, dataset, experiment_name, preproc_method, lr, g
         :preproc_method:  The preprocessing method to use, default, cvr, rr, sr, or any other custom preprocessing
         :lr:              Learning rate
         :gs:              Current global step
+        :data:            Dictionary of additional values saved alongside the learning rate, e.g. the position of the video sampler
 
     Return:
        Does not return anything
@@ -95,6 +181,12 @@ def save_checkpoint(sess, model, dataset, experiment_name, preproc_method, lr, g
 
     data_file = open(os.path.join('results', model, dataset, preproc_method, experiment_name, 'checkpoints', filename+'.dat'), 'w')
     data_file.write('lr:'+str(lr)+'\n')
+
+    for data_name in sorted(data.keys()):
+        data_file.write(data_name+':'+str(data[data_name])+'\n')
+
+    # END FOR
+
     data_file.close()
 
     data_dict = {}
@@ -108,6 +200,49 @@ def save_checkpoint(sess, model, dataset, experiment_name, preproc_method, lr, g
     np.save(os.path.join('results', model, dataset, preproc_method, experiment_name, 'checkpoints',filename+'.npy'), data_dict)
 
 
+def load_checkpoint_data(model, dataset, experiment_name, loaded_checkpoint, preproc_method):
+    """
+    Function to read the values saved in the data file of a checkpoint
+    Args:
+        :model:                 String indicating selected model
+        :dataset:               String indicating selected dataset
+        :experiment_name:       Name of experiment folder
+        :loaded_checkpoint:     Number of the checkpoint to be loaded, -1 loads the most recent checkpoint
+        :preproc_method:        The preprocessing method to use, default, cvr, rr, sr, or any other custom preprocessing
+
+    Return:
+        Dictionary mapping the name of every saved value to its string value
+    """
+    checkpoint_dir = os.path.join('results', model, dataset, preproc_method, experiment_name, 'checkpoints')
+
+    if loaded_checkpoint == -1:
+        f = open(os.path.join(checkpoint_dir, 'checkpoint'), 'r')
+        filename = f.readline().split(' ')[1].split('\"')[1]
+        f.close()
+
+    else:
+        filename = 'checkpoint-'+str(loaded_checkpoint)
+
+    # END IF
+
+    data = {}
+
+    data_file = open(os.path.join(checkpoint_dir, filename+'.dat'), 'r')
+
+    for line in data_file.readlines():
+        if ':' in line:
+            data_name, data_value = line.strip().split(':', 1)
+            data[data_name] = data_value
+
+        # END IF
+
+    # END FOR
+
+    data_file.close()
+
+    return data
+
+
 def _add_tensor(data_dict, keys_list, data):
     """
     Function recursively builds the dictionary with a layered structure
@@ -203,3 +338,100 @@ def initialize_from_dict(sess, data_dict, model_name):
         exit()
 
     # END TRY
+
+
+class CheckpointRestorer():
+    """
+    A class that swaps the weights of a model between checkpoints without growing the graph
+    initialize_from_dict adds a constant and an assign op for every tensor it loads, restoring many checkpoints into one
+    graph would keep every checkpoint's weights in the graph. The restorer builds one placeholder fed assign op per tensor
+    the first time the tensor is restored and loads every later checkpoint by feeding its values into the same ops.
+    Methods:
+        :__init__:
+        :restore:
+    """
+
+    def __init__(self, verbose=1):
+        """
+        Args:
+            :verbose: Setting verbose command
+        """
+        self.assign_ops = {}
+        self.verbose    = verbose
+
+    def _collect(self, curr_dict, tensor_name, feed_dict, ops):
+        """
+        Recursively add the assign op and value of every tensor of a dictionary, using the naming of _assign_tensors
+        """
+        if type(curr_dict) == type({}):
+            for key in curr_dict.keys():
+                self._collect(curr_dict[key], tensor_name+'/'+key, feed_dict, ops)
+
+            # END FOR
+
+            return
+
+        # END IF
+
+        if ':' not in tensor_name:
+            tensor_name = tensor_name + ':0'
+
+        # END IF
+
+        if 'weights' in tensor_name:
+            tensor_name = tensor_name.replace('weights', 'kernel')
+
+        # END IF
+
+        try:
+            if tensor_name not in self.assign_ops:
+                tensor      = tf.get_default_graph().get_tensor_by_name(tensor_name)
+                placeholder = tf.placeholder(tensor.dtype.base_dtype, tensor.get_shape())
+
+                self.assign_ops[tensor_name] = (placeholder, tf.assign(tensor, placeholder))
+
+            # END IF
+
+            placeholder, assign_op = self.assign_ops[tensor_name]
+
+            if not placeholder.get_shape().is_compatible_with(np.shape(curr_dict)):
+                raise ValueError(tensor_name)
+
+            # END IF
+
+            feed_dict[placeholder] = curr_dict
+            ops.append(assign_op)
+
+        except:
+            if 'Momentum' not in tensor_name:
+                print "Notice: Tensor " + tensor_name + " could not be assigned properly. The tensors' default initializer will be used if possible. Verify the shape and name of the tensor."
+
+            #END IF
+
+        # END TRY
+
+    def restore(self, sess, data_dict):
+        """
+        Assign the model parameters their values from a given dictionary in a single run
+        Args:
+            :sess:      Tensorflow session instance
+            :data_dict: Dictionary containing model parameter values, as returned by load_checkpoint
+
+        Return:
+           Does not return anything
+        """
+        if self.verbose:
+            print 'Restoring model weights...'
+
+        # END IF
+
+        feed_dict = {}
+        ops       = []
+        data_dict = data_dict.tolist()
+
+        for key in data_dict.keys():
+            self._collect(data_dict[key], key, feed_dict, ops)
+
+        # END FOR
+
+        sess.run(ops, feed_dict=feed_dict)
@@ -0,0 +1,185 @@
+"""
+ON-DISK CACHE OF PREPROCESSED CLIPS USED TO SKIP VIDEO LOADING AND PREPROCESSING DURING REPEATED EVALUATIONS
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy      as np
+import tensorflow as tf
+
+# Files stored within the directory of a single cache entry
+CACHE_INDEX  = 'index.json'
+CACHE_CLIPS  = 'clips.dat'
+CACHE_LABELS = 'labels.npy'
+CACHE_NAMES  = 'names.npy'
+
+
+class ClipCache():
+    """
+    A class that stores the clips fed to a model during evaluation and replays them in later evaluations
+    The clips of one configuration are stored as a single raw file which is memory mapped when read, the index file is
+    only written once every clip has been stored so that incomplete caches are never read.
+    Methods:
+        :__init__:
+        :exists:
+        :read:
+        :load_dataset:
+        :add:
+        :close:
+        :discard:
+    """
+
+    def __init__(self, cache_dir, params, verbose=1):
+        """
+        Args:
+            :cache_dir: Directory in which all cached configurations are stored
+            :params:    Dictionary of every parameter that affects the preprocessed clips (dataset, split, model, preprocessing and clip parameters)
+            :verbose:   Setting verbose command
+        """
+        self.params    = params
+        self.key       = hashlib.sha1(json.dumps(params, sort_keys=True)).hexdigest()
+        self.path      = os.path.join(cache_dir, self.key)
+        self.verbose   = verbose
+        self.temp_path = None
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        # END IF
+
+    def exists(self):
+        """
+        Return:
+            Boolean indicating whether a complete cache exists for the current configuration
+        """
+        return os.path.isfile(os.path.join(self.path, CACHE_INDEX))
+
+    def read(self):
+        """
+        Return:
+            Memory mapped array of the cached clips, array of their labels and array of the names of their videos
+        """
+        index_file = open(os.path.join(self.path, CACHE_INDEX), 'r')
+        index      = json.load(index_file)
+        index_file.close()
+
+        clips  = np.memmap(os.path.join(self.path, CACHE_CLIPS), dtype=index['dtype'], mode='r', shape=tuple(index['shape']))
+        labels = np.load(os.path.join(self.path, CACHE_LABELS))
+        names  = np.load(os.path.join(self.path, CACHE_NAMES))
+
+        if self.verbose:
+            print "Loading ", clips.shape[0], " cached clips from ", self.path
+
+        # END IF
+
+        return clips, labels, names
+
+    def load_dataset(self, batch_size):
+        """
+        Build tensors that replay the cached clips in the order they were stored, looping over them indefinitely like load_dataset
+        Args:
+            :batch_size: Number of clips to load into the model each step
+
+        Return:
+            Input data tensor, label tensor and name of loaded data (video/image)
+        """
+        clips, labels, names = self.read()
+
+        def _generator():
+            for clip_idx in range(clips.shape[0]):
+                yield clips[clip_idx], labels[clip_idx], names[clip_idx]
+
+            # END FOR
+
+        dataset = tf.data.Dataset.from_generator(_generator, (tf.as_dtype(clips.dtype), tf.int32, tf.string),
+                                                 (tf.TensorShape(clips.shape[1:]), tf.TensorShape(labels.shape[1:]), tf.TensorShape([])))
+        dataset = dataset.repeat().batch(batch_size, drop_remainder=True).prefetch(2)
+
+        return dataset.make_one_shot_iterator().get_next()
+
+    def add(self, clips, labels, names):
+        """
+        Append clips to the cache that is being written
+        Args:
+            :clips:  Array of clips fed to the model, shape [clips, input_dims, height, width, channels]
+            :labels: Array of labels of each clip, shape [clips, seq_length]
+            :names:  Names of the video each clip belongs to
+        """
+        if len(names) == 0:
+            return
+
+        # END IF
+
+        if self.temp_path is None:
+            # Each writer uses its own directory, concurrent evaluations of the same configuration do not collide
+            self.temp_path   = self.path + '.tmp%d' % os.getpid()
+            self.clip_shape  = list(clips.shape[1:])
+            self.clip_dtype  = str(clips.dtype)
+            self.num_clips   = 0
+            self.labels      = []
+            self.names       = []
+
+            if os.path.isdir(self.temp_path):
+                shutil.rmtree(self.temp_path)
+
+            # END IF
+
+            os.makedirs(self.temp_path)
+            self.clips_file  = open(os.path.join(self.temp_path, CACHE_CLIPS), 'wb')
+
+        # END IF
+
+        self.clips_file.write(np.ascontiguousarray(clips, dtype=self.clip_dtype).tostring())
+        self.labels.extend(np.array(labels, dtype=np.int32))
+        self.names.extend(names)
+        self.num_clips += len(names)
+
+    def close(self):
+        """
+        Write the index of the cache being written and make it available to later evaluations
+        """
+        if self.temp_path is None:
+            return
+
+        # END IF
+
+        self.clips_file.close()
+
+        np.save(os.path.join(self.temp_path, CACHE_LABELS), np.array(self.labels, dtype=np.int32))
+        np.save(os.path.join(self.temp_path, CACHE_NAMES), np.array(self.names))
+
+        index_file = open(os.path.join(self.temp_path, CACHE_INDEX), 'w')
+        json.dump({'params': self.params, 'shape': [self.num_clips] + self.clip_shape, 'dtype': self.clip_dtype}, index_file)
+        index_file.close()
+
+        try:
+            os.rename(self.temp_path, self.path)
+
+            if self.verbose:
+                print "Saved ", self.num_clips, " preprocessed clips to ", self.path
+
+            # END IF
+
+        except OSError:
+            # Another evaluation already completed the same cache
+            shutil.rmtree(self.temp_path)
+
+        # END TRY
+
+        self.temp_path = None
+
+    def discard(self):
+        """
+        Remove the cache being written without making it available
+        """
+        if self.temp_path is None:
+            return
+
+        # END IF
+
+        self.clips_file.close()
+        shutil.rmtree(self.temp_path)
+        self.temp_path = None
@@ -0,0 +1,101 @@
+import argparse
+import os
+
+import tensorflow as tf
+
+from utils.load_dataset_tfrecords import _detect_record_format, _parse_tfrecords, _decode_frames
+from utils.video_store_utils      import VideoStoreWriter, is_video_store
+from utils.dataset_manifest_utils import build_manifest
+
+# Definition of arguments used in functions defined within this file
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--tfrecords_dir', action='store',
+        help = 'Directory containing the tfrecords files (one per video or shards) of a single dataset split')
+parser.add_argument('--save_dir', action='store',
+        help = 'Directory to save the video store to, pass it to train.py/test.py in place of the tfrecords directory')
+
+
+'''
+
+Converts a split stored as tfrecords (raw, jpeg or png frames) into a memory-mapped video store, every video is
+decoded once and stored as uint8 RGB frames
+
+'''
+
+
+def _decoded_video(serialized_example, record_format):
+    """
+    Build the graph decoding a single serialized example into its RGB frames
+    Args:
+        :serialized_example: String placeholder containing a serialized tf.train.Example
+        :record_format:      Format of the frames stored in the tfrecords (raw, jpeg or png)
+
+    Returns:
+        Frames tensor of shape [frames, height, width, channels], label tensor and name tensor
+    """
+    features = _parse_tfrecords(serialized_example, record_format)
+
+    if record_format == 'raw':
+        shape = tf.stack([features['Frames'], features['Height'], features['Width'], features['Channels']])
+        video = tf.reshape(tf.decode_raw(features['Data'], tf.uint8), tf.cast(shape, tf.int32))
+
+        # BGR to RGB
+        video = video[...,::-1]
+
+    else:
+        # Encoded images are already decoded as RGB
+        video = _decode_frames(features['EncodedFrames'], record_format)
+
+    # END IF
+
+    return video, features['Label'], features['Name']
+
+
+def convert_tfrecords(tfrecords_dir, save_dir):
+    """
+    Write every video of the tfrecords in tfrecords_dir to a video store in save_dir
+    Args:
+        :tfrecords_dir: Directory containing the tfrecords files of a single dataset split
+        :save_dir:      Directory to save the video store to
+    """
+    filenames = sorted([os.path.join(tfrecords_dir, f) for f in os.listdir(tfrecords_dir) if f.endswith('.tfrecords')])
+
+    if is_video_store(save_dir):
+        print "A video store already exists in ", save_dir
+        return
+
+    # END IF
+
+    record_format      = _detect_record_format(filenames)
+    serialized_example = tf.placeholder(tf.string, [])
+    video_tensors      = _decoded_video(serialized_example, record_format)
+
+    writer = VideoStoreWriter(save_dir)
+    sess   = tf.Session()
+
+    for filename in filenames:
+        for record in tf.python_io.tf_record_iterator(filename):
+            video, label, name = sess.run(video_tensors, feed_dict={serialized_example: record})
+            writer.add(video, label, name)
+
+        # END FOR
+
+    # END FOR
+
+    sess.close()
+    writer.close()
+    build_manifest(save_dir)
+
+    print "Converted ", len(writer.videos), " videos from ", len(filenames), " tfrecords files into ", save_dir
+
+
+if __name__=='__main__':
+
+    args = parser.parse_args()
+
+    print "Provide a single directory of tfrecords files of a dataset split to convert (--tfrecords_dir) and a directory to save the video store to (--save_dir)."
+    print "The video store can be used by train.py and test.py by placing it where the tfrecords of the split are expected (--baseDataPath)."
+
+    convert_tfrecords(args.tfrecords_dir, args.save_dir)
@@ -0,0 +1,419 @@
+"""
+MANIFEST OF THE VIDEOS CONTAINED IN A DATASET SPLIT
+
+A split directory (tfrecords_<dataset>/Split<N>/<fName>) is scanned once and the frame count, resolution, label, name,
+byte size and file of every video are stored in a manifest next to the videos. Loaders read the manifest instead of
+inspecting records, the number of videos and the exact number of clips in an epoch are derived from it. The manifest
+records the size and modification time of every tfrecords file, it is rebuilt when files are added, removed or rewritten.
+
+Build (or rebuild) the manifest of one or more splits from the root of the repository:
+    python -m utils.dataset_manifest_utils --data_dirs /data/tfrecords_HMDB51/Split1/trainlist /data/tfrecords_HMDB51/Split1/testlist
+"""
+
+import os
+import json
+import fcntl
+import struct
+import argparse
+
+import tensorflow as tf
+
+import utils.video_store_utils as video_store_utils
+
+# Name of the manifest file stored within a split directory
+DATASET_MANIFEST = 'dataset_manifest.json'
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('--data_dirs', nargs='+', type=str, default=[],
+        help = 'Split directories containing tfrecords files or a video store to build manifests for')
+
+
+def _video_entry(serialized_example, filename, offset):
+    """
+    Describe the video stored in a single serialized example
+    Args:
+        :serialized_example: Serialized tf.train.Example string
+        :filename:           Name of the tfrecords file containing the example
+        :offset:             Byte offset of the record within the tfrecords file
+
+    Return:
+        Manifest entry of the video and the format of its frames (raw, jpeg or png)
+    """
+    feature = tf.train.Example.FromString(serialized_example).features.feature
+
+    if 'EncodedFrames' in feature:
+        record_format = feature['Format'].bytes_list.value[0]
+
+    else:
+        record_format = 'raw'
+
+    # END IF
+
+    entry = {'name':     feature['Name'].bytes_list.value[0],
+             'label':    feature['Label'].int64_list.value[0],
+             'frames':   feature['Frames'].int64_list.value[0],
+             'height':   feature['Height'].int64_list.value[0],
+             'width':    feature['Width'].int64_list.value[0],
+             'channels': feature['Channels'].int64_list.value[0],
+             'bytes':    len(serialized_example),
+             'file':     filename,
+             'offset':   offset}
+
+    return entry, record_format
+
+
+def record_fingerprint(data_path):
+    """
+    Args:
+        :data_path: Split directory containing tfrecords files or a video store
+
+    Return:
+        Dictionary mapping every tfrecords file (or the files of the video store) of the split to its size and modification time
+    """
+    if video_store_utils.is_video_store(data_path):
+        filenames = [video_store_utils.VIDEO_STORE_INDEX, video_store_utils.VIDEO_STORE_DATA]
+
+    else:
+        filenames = [f for f in os.listdir(data_path) if f.endswith('.tfrecords')]
+
+    # END IF
+
+    fingerprint = {}
+
+    for filename in filenames:
+        file_stat             = os.stat(os.path.join(data_path, filename))
+        fingerprint[filename] = [file_stat.st_size, int(file_stat.st_mtime)]
+
+    # END FOR
+
+    return fingerprint
+
+
+def build_manifest(data_path):
+    """
+    Scan every video of a split and write its manifest
+    Args:
+        :data_path: Split directory containing tfrecords files or a video store
+
+    Return:
+        Dictionary with the record format, the tfrecords files and one entry per video of the split
+    """
+    videos = []
+
+    # Taken before the scan, files rewritten during the scan make the manifest out of date
+    fingerprint = record_fingerprint(data_path)
+
+    if video_store_utils.is_video_store(data_path):
+        record_format = 'store'
+        filenames     = []
+
+        for video in video_store_utils.VideoStore(data_path).videos:
+            videos.append({'name': video['name'], 'label': video['label'], 'frames': video['frames'], 'height': video['height'], 'width': video['width'],
+                           'channels': video['channels'], 'bytes': video['frames']*video['height']*video['width']*video['channels'],
+                           'file': video_store_utils.VIDEO_STORE_DATA})
+
+        # END FOR
+
+    else:
+        record_format = 'raw'
+        filenames     = sorted([f for f in os.listdir(data_path) if f.endswith('.tfrecords')])
+
+        for filename in filenames:
+            offset = 0
+
+            for serialized_example in tf.python_io.tf_record_iterator(os.path.join(data_path, filename)):
+                entry, record_format = _video_entry(serialized_example, filename, offset)
+                videos.append(entry)
+
+                # Each record is framed as: uint64 length, uint32 length crc, data, uint32 data crc
+                offset += len(serialized_example) + 16
+
+            # END FOR
+
+        # END FOR
+
+    # END IF
+
+    manifest = {'record_format': record_format, 'files': filenames, 'fingerprint': fingerprint, 'videos': videos}
+
+    # The manifest only appears once complete, concurrent readers never see a partially written file
+    manifest_path = os.path.join(data_path, DATASET_MANIFEST)
+    temp_path     = manifest_path + '.tmp%d' % os.getpid()
+
+    manifest_file = open(temp_path, 'w')
+    json.dump(manifest, manifest_file)
+    manifest_file.close()
+
+    os.rename(temp_path, manifest_path)
+
+    return manifest
+
+
+def load_manifest(data_path):
+    """
+    Args:
+        :data_path: Split directory
+
+    Return:
+        Manifest of the split, None if it has not been built or the tfrecords of the split changed since it was built
+    """
+    manifest_path = os.path.join(data_path, DATASET_MANIFEST)
+
+    if not os.path.isfile(manifest_path):
+        return None
+
+    # END IF
+
+    manifest_file = open(manifest_path, 'r')
+    manifest      = json.load(manifest_file)
+    manifest_file.close()
+
+    if manifest.get('fingerprint') != record_fingerprint(data_path):
+        return None
+
+    # END IF
+
+    return manifest
+
+
+def get_manifest(data_path):
+    """
+    Load the manifest of a split, building it the first time the split is used or after its tfrecords changed
+    Args:
+        :data_path: Split directory
+
+    Return:
+        Manifest of the split
+    """
+    manifest = load_manifest(data_path)
+
+    if manifest is None:
+        # A single process builds the manifest, the others block until the lock is released and then read its manifest
+        lock_file = open(os.path.join(data_path, DATASET_MANIFEST + '.lock'), 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            manifest = load_manifest(data_path)
+
+            if manifest is None:
+                if os.path.isfile(os.path.join(data_path, DATASET_MANIFEST)):
+                    print "Rebuilding dataset manifest of ", data_path, ", its tfrecords changed since it was built"
+
+                else:
+                    print "Building dataset manifest of ", data_path
+
+                # END IF
+
+                manifest = build_manifest(data_path)
+
+            # END IF
+
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+        # END TRY
+
+    # END IF
+
+    return manifest
+
+
+def num_videos(data_path):
+    """
+    Args:
+        :data_path: Split directory
+
+    Return:
+        Number of videos in the split
+    """
+    return len(get_manifest(data_path)['videos'])
+
+
+def read_record(filename, offset):
+    """
+    Read a single serialized example out of a tfrecords file
+    Args:
+        :filename: Full path to the tfrecords file
+        :offset:   Byte offset of the record within the file
+
+    Return:
+        Serialized tf.train.Example string
+    """
+    # Each record is framed as: uint64 length, uint32 length crc, data, uint32 data crc
+    record_file = open(filename, 'rb')
+    record_file.seek(offset)
+    length      = struct.unpack('<Q', record_file.read(8))[0]
+    record_file.read(4)
+    serialized  = record_file.read(length)
+    record_file.close()
+
+    return serialized
+
+
+class RecordReader():
+    """
+    A class that reads the serialized example of any video of a split by its index in the manifest
+    Methods:
+        :__init__:
+        :__len__:
+        :features:
+        :read:
+    """
+
+    def __init__(self, data_path, manifest):
+        """
+        Args:
+            :data_path: Split directory containing the tfrecords files
+            :manifest:  Manifest of the split
+        """
+        if any('offset' not in video for video in manifest['videos']):
+            raise ValueError('The dataset manifest of ' + data_path + ' does not contain record offsets, rebuild it with utils/dataset_manifest_utils.py')
+
+        # END IF
+
+        self.videos    = manifest['videos']
+        self.filenames = [os.path.join(data_path, video['file']) for video in manifest['videos']]
+        self.offsets   = [video['offset'] for video in manifest['videos']]
+
+    def __len__(self):
+        return len(self.videos)
+
+    def features(self, video_index):
+        """
+        Look up the description of a video in the manifest, mirrors the features parsed from its serialized example
+        Args:
+            :video_index: Scalar tensor indicating the index of the video in the manifest
+
+        Return:
+            Dictionary containing the Frames, Height, Width, Channels, Label and Name of the video
+        """
+        features = {}
+
+        for feature, key in [('Frames', 'frames'), ('Height', 'height'), ('Width', 'width'), ('Channels', 'channels'), ('Label', 'label')]:
+            features[feature] = tf.gather(tf.constant([video[key] for video in self.videos], dtype=tf.int32), video_index)
+
+        # END FOR
+
+        features['Name'] = tf.gather(tf.constant([str(video['name']) for video in self.videos]), video_index)
+
+        return features
+
+    def _read(self, video_index):
+        return read_record(self.filenames[video_index], self.offsets[video_index])
+
+    def read(self, video_index):
+        """
+        Args:
+            :video_index: Scalar tensor indicating the index of the video in the manifest
+
+        Return:
+            String tensor containing the serialized example of the video
+        """
+        serialized_example = tf.py_func(self._read, [video_index], tf.string, stateful=False)
+        serialized_example.set_shape([])
+
+        return serialized_example
+
+
+def uniform_clips_per_video(clip_length, num_clips):
+    """
+    Args:
+        :clip_length: Length of clips to cut video into, -1 indicates using the entire video as one clip
+        :num_clips:   Number of clips to break video into, values <= 0 extract as many clips as the video contains
+
+    Return:
+        Number of clips extracted from every video, None when it depends on the length of each video
+    """
+    if clip_length <= 0:
+        return 1
+
+    # END IF
+
+    if num_clips > 0:
+        return num_clips
+
+    # END IF
+
+    return None
+
+
+def clips_per_video(video, dataset, clip_length, num_clips, clip_stride, video_offset='none'):
+    """
+    Number of clips the loader extracts from a video, mirrors the clip extraction of load_dataset
+    Args:
+        :video:        Manifest entry of the video
+        :dataset:      Name of dataset being processed
+        :clip_length:  Length of clips to cut video into, -1 indicates using the entire video as one clip
+        :num_clips:    Number of clips to break video into, values <= 0 extract as many clips as the video contains
+        :clip_stride:  Number of frames that overlap between clips, 0 indicates no overlap and negative values indicate a gap of frames between clips
+        :video_offset: "none" or "random" indicating where to begin selecting clips within the video
+
+    Return:
+        Number of clips, None when it is chosen randomly
+    """
+    uniform_clips = uniform_clips_per_video(clip_length, num_clips)
+
+    if uniform_clips is not None:
+        return uniform_clips
+
+    # END IF
+
+    if video_offset == 'random':
+        return None
+
+    # END IF
+
+    frames = video['frames']
+
+    # Reduction in fps to 25 for HMDB51 and MIT datasets
+    if ('HMDB51' in dataset) or ('MIT' in dataset):
+        frames = (frames / 6) * 5 + min(frames % 6, 5)
+
+    # END IF
+
+    if clip_length > frames:
+        return 1
+
+    # END IF
+
+    return (frames - clip_length) / (clip_length - clip_stride) + 1
+
+
+def clips_per_epoch(manifest, dataset, clip_length, num_clips, clip_stride, video_offset='none'):
+    """
+    Args:
+        :manifest: Manifest of the split
+        (Remaining arguments are identical to those of clips_per_video)
+
+    Return:
+        Number of clips loaded in one epoch over the split, None when the number of clips of a video is chosen randomly
+    """
+    total_clips = 0
+
+    for video in manifest['videos']:
+        video_clips = clips_per_video(video, dataset, clip_length, num_clips, clip_stride, video_offset)
+
+        if video_clips is None:
+            return None
+
+        # END IF
+
+        total_clips += video_clips
+
+    # END FOR
+
+    return total_clips
+
+
+if __name__=='__main__':
+
+    args = parser.parse_args()
+
+    for data_dir in args.data_dirs:
+        manifest = build_manifest(data_dir)
+
+        print "Manifest of ", data_dir, ": ", len(manifest['videos']), " videos stored as ", manifest['record_format']
+
+    # END FOR
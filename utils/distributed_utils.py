@@ -0,0 +1,111 @@
+"""
+DATA PARALLEL TRAINING ACROSS SEVERAL WORKER PROCESSES
+
+Parameter servers and workers (each running train.py with its own towers) form a tf.train.ClusterSpec. Variables are
+placed on the parameter servers by tf.train.replica_device_setter, every worker averages the gradients of its towers
+over its own shard of videos and SyncReplicasOptimizer aggregates the gradients of all workers into a single update
+per step. The chief worker (task 0) initializes the variables, loads weights and saves checkpoints.
+
+scripts/shell/launch_multi_worker.sh starts a cluster of local processes.
+"""
+
+import time
+
+import tensorflow as tf
+
+
+def create_server(ps_hosts, worker_hosts, job_name, task_index):
+    """
+    Args:
+        :ps_hosts:     List of host:port of the parameter servers
+        :worker_hosts: List of host:port of the workers
+        :job_name:     "ps" or "worker"
+        :task_index:   Index of this process within its job
+
+    Return:
+        Cluster specification and server of this process
+    """
+    cluster = tf.train.ClusterSpec({'ps': ps_hosts, 'worker': worker_hosts})
+    server  = tf.train.Server(cluster, job_name=job_name, task_index=task_index)
+
+    return cluster, server
+
+
+def device_setter(cluster, worker_device, device=''):
+    """
+    Args:
+        :cluster:       Cluster specification, None when training in a single process
+        :worker_device: Device name of this worker (/job:worker/task:N), empty when training in a single process
+        :device:        Device within the worker, e.g. /gpu:0
+
+    Return:
+        Device (or device function) of the ops created within its scope, variables are placed on the parameter servers
+    """
+    if cluster is None:
+        return device or None
+
+    # END IF
+
+    return tf.train.replica_device_setter(worker_device=worker_device+device, cluster=cluster)
+
+
+def wait_for_chief(sess, chief_ready, poll_interval=1.0):
+    """
+    Block until the chief has initialized the variables and loaded the weights of the model
+    Args:
+        :sess:          Session of this worker
+        :chief_ready:   Boolean variable set by the chief once the model is ready to be trained
+        :poll_interval: Number of seconds between checks
+    """
+    while True:
+        try:
+            if sess.run(chief_ready):
+                return
+
+            # END IF
+
+        except tf.errors.FailedPreconditionError:
+            # The chief has not initialized the variables yet
+            pass
+
+        # END TRY
+
+        time.sleep(poll_interval)
+
+    # END WHILE
+
+
+def start_sync_replicas(sess, sync_optimizer, is_chief):
+    """
+    Initialize SyncReplicasOptimizer the way its session run hook does, the chief also starts the queue runner applying aggregated updates
+    Args:
+        :sess:           Session of this worker
+        :sync_optimizer: tf.train.SyncReplicasOptimizer used to build the training op
+        :is_chief:       Boolean indicating whether this worker is the chief
+
+    Return:
+        List of the threads started
+    """
+    if is_chief:
+        sess.run(sync_optimizer.chief_init_op)
+        sess.run(sync_optimizer.get_init_tokens_op())
+
+        # Not registered with the coordinator of the input threads, the daemon threads stay blocked on the parameter servers waiting for gradients once training is done
+        return sync_optimizer.get_chief_queue_runner().create_threads(sess, daemon=True, start=True)
+
+    # END IF
+
+    sess.run(sync_optimizer.local_step_init_op)
+
+    return []
+
+
+def release_workers(sess, sync_optimizer, num_workers):
+    """
+    Called by the chief once training is done, give every worker a token so that workers waiting on the last synchronized step can stop
+    Args:
+        :sess:           Session of the chief
+        :sync_optimizer: tf.train.SyncReplicasOptimizer used to build the training op
+        :num_workers:    Number of workers
+    """
+    sess.run(sync_optimizer.get_init_tokens_op(num_workers))
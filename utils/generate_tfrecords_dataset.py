@@ -1,8 +1,13 @@
 import argparse
-import tensorflow as tf
-import numpy as np
+import tensorflow      as tf
+import numpy           as np
+import multiprocessing as mp
+import heapq
+import json
 import os
 from utils import make_dir
+from utils.load_dataset_tfrecords import SHARD_MANIFEST
+from utils.dataset_manifest_utils import build_manifest
 import cv2
 
 # Definition of arguments used in functions defined within this file
@@ -13,8 +18,18 @@ parser.add_argument('--videos_dir', action='store',
         help = 'Directory containing directories of acions with videos therein')
 parser.add_argument('--save_dir', action='store',
         help = 'Directory to save tfrecords files to')
-
-args = parser.parse_args()
+parser.add_argument('--num_workers', action='store', type=int, default=1,
+        help = 'Number of processes used to decode videos in parallel (default 1)')
+parser.add_argument('--num_shards', action='store', type=int, default=0,
+        help = 'Number of tfrecords files to pack all videos into, 0 indicates one tfrecords file per video (default 0)')
+parser.add_argument('--max_frames', action='store', type=int, default=-1,
+        help = 'Maximum number of frames to keep from each video, -1 keeps every frame (default -1)')
+parser.add_argument('--frame_step', action='store', type=int, default=1,
+        help = 'Keep one out of every frame_step frames while decoding each video (default 1)')
+parser.add_argument('--frame_format', action='store', default='raw',
+        help = 'Format used to store frames: raw stores the entire video as uint8 bytes, jpeg or png store a list of individually encoded frames (default raw)')
+parser.add_argument('--short_side', action='store', type=int, default=0,
+        help = 'Downscale frames while decoding such that their smallest side matches short_side, 0 keeps the source resolution (default 0)')
 
 
 '''
@@ -48,15 +63,39 @@ def _bytes(value):
     """
     return tf.train.Feature(bytes_list=tf.train.BytesList(value=[value]))
 
+def _float(value):
+    """
+    Cast a value to float list
+    Args:
+        :value: Value to be casted to float list
+
+    Returns:
+        Float converted value list 
+    """
+    return tf.train.Feature(float_list=tf.train.FloatList(value=[value]))
+
+def _bytes_list(values):
+    """
+    Cast a list of values to byte list
+    Args:
+        :values: List of values to be casted to byte list
 
-def save_tfrecords(data, label, vidname, save_dir):
+    Returns:
+        Byte converted value list 
+    """
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=values))
+
+
+def save_tfrecords(data, label, vidname, save_dir, frame_format='raw', scale=1.0):
     """
     Save given data as tfrecords 
     Args:
-        :data:     Data to be saved as tfrecord
-        :label:    Corresponding labels of Data to be saved in tfrecord 
-        :vidname:  Name of file to be saved as tfrecord
-        :save_dir: Directory where tfrecord needs to be saved
+        :data:         Data to be saved as tfrecord
+        :label:        Corresponding labels of Data to be saved in tfrecord 
+        :vidname:      Name of file to be saved as tfrecord
+        :save_dir:     Directory where tfrecord needs to be saved
+        :frame_format: Format used to store frames (raw, jpeg or png)
+        :scale:        Ratio between the stored and source frame resolution
 
     Returns:
         Nothing 
@@ -65,110 +104,433 @@ def save_tfrecords(data, label, vidname, save_dir):
     filename = os.path.join(save_dir, vidname+'.tfrecords')
     writer   = tf.python_io.TFRecordWriter(filename)
 
+    writer.write(_serialize_example(data, label, vidname, frame_format, scale))
+    writer.close()
+
+
+def _serialize_example(data, label, vidname, frame_format='raw', scale=1.0):
+    """
+    Serialize given data into a tf.train.Example string using the same features as save_tfrecords
+    Raw videos are stored as a single 'Data' byte string, encoded videos store one jpeg or png image per frame
+    in 'EncodedFrames' along with the 'Format' used to encode them.
+    Args:
+        :data:         Data to be serialized
+        :label:        Corresponding label of the data
+        :vidname:      Name of the video
+        :frame_format: Format used to store frames (raw, jpeg or png)
+        :scale:        Ratio between the stored and source frame resolution
+
+    Returns:
+        Serialized example string
+    """
+
     features             = {}
     features['Label']    = _int64(label)
-    features['Data']     = _bytes(np.array(data).tostring())
+
+    if frame_format == 'raw':
+        features['Data'] = _bytes(np.array(data).tostring())
+
+    else:
+        features['EncodedFrames'] = _bytes_list(_encode_frames(data, frame_format))
+        features['Format']        = _bytes(frame_format)
+
+    # END IF
+
     features['Frames']   = _int64(data.shape[0])
     features['Height']   = _int64(data.shape[1])
     features['Width']    = _int64(data.shape[2])
     features['Channels'] = _int64(data.shape[3])
     features['Name']     = _bytes(str(vidname))
-
+    features['Scale']    = _float(scale)
 
     example = tf.train.Example(features=tf.train.Features(feature=features))
 
-    writer.write(example.SerializeToString())
+    return example.SerializeToString()
+
+
+def _encode_frames(data, frame_format):
+    """
+    Encode every frame of a video as an individual image
+    Args:
+        :data:         Video data of shape [frames, height, width, channels]
+        :frame_format: Image format used to encode frames (jpeg or png)
+
+    Returns:
+        List of encoded image strings, one per frame
+    """
+
+    if frame_format == 'jpeg':
+        extension = '.jpg'
+
+    elif frame_format == 'png':
+        extension = '.png'
+
+    else:
+        raise ValueError('Invalid frame format: '+str(frame_format))
+
+    # END IF
+
+    encoded_frames = []
+
+    for frame in data:
+        flag, encoded = cv2.imencode(extension, frame)
+        encoded_frames.append(encoded.tostring())
+
+    # END FOR
+
+    return encoded_frames
+
+
+def save_tfrecords_shard(shard_filename, videos, max_frames=-1, frame_step=1, frame_format='raw', short_side=0):
+    """
+    Decode a list of videos and pack them all into a single tfrecords shard
+    Args:
+        :shard_filename: Full path of the tfrecords shard to be written
+        :videos:         List of (video_path, label, vidname) tuples to be stored in this shard
+        :max_frames:     Maximum number of frames to keep from each video, -1 keeps every frame
+        :frame_step:     Keep one out of every frame_step frames of each video
+        :frame_format:   Format used to store frames (raw, jpeg or png)
+        :short_side:     Smallest side frames are downscaled to while decoding, 0 keeps the source resolution
+
+    Returns:
+        List of (vidname, shard_name, byte_offset, frames, label) tuples describing where each video was written
+    """
+
+    writer  = tf.python_io.TFRecordWriter(shard_filename)
+    offset  = 0
+    entries = []
+
+    for video_path, label, vidname in videos:
+        data, scale = load_video_data_from_file(video_path, max_frames, frame_step, short_side=short_side, return_scale=True)
+        serialized  = _serialize_example(data, label, vidname, frame_format, scale)
+
+        writer.write(serialized)
+        entries.append((vidname, os.path.basename(shard_filename), offset, data.shape[0], label))
+
+        # Each record is framed by a uint64 length, a uint32 length crc and a uint32 data crc
+        offset += len(serialized) + 16
+
+    # END FOR
+
     writer.close()
 
+    return entries
+
+
+def _save_tfrecords_shard_worker(shard_args):
+    """
+    Unpack a single argument tuple for save_tfrecords_shard, used by multiprocessing.Pool
+    """
+    return save_tfrecords_shard(*shard_args)
+
+
+def _balance_shards(videos, num_shards):
+    """
+    Assign videos to shards such that the total source file size of each shard is approximately equal
+    Args:
+        :videos:     List of (video_path, label, vidname) tuples
+        :num_shards: Number of shards to split the videos into
+
+    Returns:
+        List of num_shards lists of (video_path, label, vidname) tuples
+    """
+
+    shards = [[] for _ in range(num_shards)]
+    heap   = [(0, shard_idx) for shard_idx in range(num_shards)]
+
+    # Largest videos first, each one placed into the currently smallest shard
+    for video in sorted(videos, key=lambda video: os.path.getsize(video[0]), reverse=True):
+        shard_size, shard_idx = heapq.heappop(heap)
+        shards[shard_idx].append(video)
+        heapq.heappush(heap, (shard_size + os.path.getsize(video[0]), shard_idx))
+
+    # END FOR
+
+    return shards
+
+
+
+def _video_frame_count(video):
+    """
+    Query the number of frames reported by the video container
+    Args:
+        :video: cv2.VideoCapture object of an opened video
+
+    Returns:
+        Number of frames reported by the container, 0 if it is unavailable
+    """
+
+    # OpenCV 3+ exposes the property directly, OpenCV 2.4 keeps it under cv2.cv
+    if hasattr(cv2, 'CAP_PROP_FRAME_COUNT'):
+        frame_count = video.get(cv2.CAP_PROP_FRAME_COUNT)
+
+    else:
+        frame_count = video.get(cv2.cv.CV_CAP_PROP_FRAME_COUNT)
+
+    # END IF
+
+    if frame_count is None or np.isnan(frame_count) or frame_count < 0:
+        return 0
+
+    # END IF
+
+    return int(frame_count)
+
 
+def _downscaled_size(height, width, short_side):
+    """
+    Compute the frame size whose smallest side equals short_side while preserving the aspect ratio
+    Matches smallest_size_at_least in utils.preprocessing_utils so that stored frames have exactly the size an
+    aspect preserving resize to short_side would produce. Frames are never upscaled.
+    Args:
+        :height:     Height of source frames
+        :width:      Width of source frames
+        :short_side: Target size of the smallest side, 0 keeps the source resolution
 
-def load_video_data_from_file(video_path):
+    Returns:
+        Tuple of (new_height, new_width)
+    """
+
+    if short_side <= 0 or min(height, width) <= short_side:
+        return height, width
+
+    # END IF
+
+    # Same float32 arithmetic and truncation as the tensorflow helper, float64 rounds some sizes up by one pixel
+    if height > width:
+        scale = np.float32(short_side) / np.float32(width)
+
+    else:
+        scale = np.float32(short_side) / np.float32(height)
+
+    # END IF
+
+    return int(np.float32(height) * scale), int(np.float32(width) * scale)
+
+
+def load_video_data_from_file(video_path, max_frames=-1, frame_step=1, chunk_size=64, short_side=0, return_scale=False):
     """
     Load video data from a specified file 
+    Frames are decoded directly into a preallocated uint8 buffer sized from the frame count reported by the container,
+    the buffer grows in chunks if the container under reports or does not provide the frame count.
     Args:
-        :video_path: Full path from which to read video data
+        :video_path:   Full path from which to read video data
+        :max_frames:   Maximum number of frames to keep, -1 keeps every frame
+        :frame_step:   Keep one out of every frame_step frames, 1 keeps every frame
+        :chunk_size:   Minimum number of frames the buffer is grown by when it runs out of space
+        :short_side:   Downscale frames such that their smallest side equals short_side, 0 keeps the source resolution
+        :return_scale: Also return the ratio between the stored and source frame resolution
 
     Returns:
-        Data read from video as numpy array 
+        Data read from video as numpy array (and the stored scale if return_scale is set)
     """
 
     video       = cv2.VideoCapture(video_path)
+    frame_count = _video_frame_count(video)
     flag, frame = video.read()
 
-    count = 0
-    data1 = np.array([])
-    data2 = np.array([])
+    if not flag:
+        video.release()
 
-    while flag:
-        H,W,C = frame.shape
+        if return_scale:
+            return np.array([]), 1.0
 
-        if count < 150:
-            if count == 0:
-                data1 = frame.reshape(1,H,W,C)
+        # END IF
 
-            else:
-                data1 = np.concatenate((data1, frame.reshape(1,H,W,C)))
+        return np.array([])
+
+    # END IF
+
+    H,W,C  = frame.shape
+    source = (H, W)
+
+    H,W    = _downscaled_size(H, W, short_side)
+    resize = (H, W) != source
+
+    # Number of frames expected to be kept after subsampling and capping
+    capacity = max(-(-frame_count // frame_step), 1)
+
+    if max_frames > 0:
+        capacity = min(capacity, max_frames)
+
+    # END IF
+
+    data = np.empty((capacity, H, W, C), dtype=frame.dtype)
+    kept = 0
+
+    while flag:
+        if kept == data.shape[0]:
+            grow_by = max(chunk_size, kept)
+
+            if max_frames > 0:
+                grow_by = min(grow_by, max_frames - kept)
 
             # END IF
 
+            data = np.concatenate((data, np.empty((grow_by, H, W, C), dtype=data.dtype)))
+
+        # END IF
+
+        if resize:
+            data[kept] = cv2.resize(frame, (W, H), interpolation=cv2.INTER_AREA)
+
         else:
-            if count == 150:
-                data2 = frame.reshape(1,H,W,C)
+            data[kept] = frame
 
-            else:
-                data2 = np.concatenate((data2, frame.reshape(1,H,W,C)))
+        # END IF
 
-            # END IF
+        kept += 1
+
+        if max_frames > 0 and kept >= max_frames:
+            break
 
         # END IF
 
-        count += 1
+        # Skipped frames are only grabbed, not converted into an image
+        for _ in range(frame_step-1):
+            if not video.grab():
+                break
+
+            # END IF
+
+        # END FOR
+
         flag, frame = video.read()
 
-    if len(data2)!=0:
-        data = np.concatenate((data1, data2))
+    # END WHILE
 
-    else:
-        data = np.array(data1)
+    video.release()
+
+    if return_scale:
+        return data[:kept], float(H) / source[0]
 
     # END IF
 
-    return data
+    return data[:kept]
 
 
-def convert_dataset(videos_dir, save_dir):
+def convert_dataset(videos_dir, save_dir, num_workers=1, num_shards=0, max_frames=-1, frame_step=1, frame_format='raw', short_side=0):
     """
     Function to convert any given dataset to tfrecords 
     Args:
-        :videos_dir: Full path to directory containing action specific folders
-        :save_dir:   Full path to directory in which tfrecords need to be saved 
+        :videos_dir:   Full path to directory containing action specific folders
+        :save_dir:     Full path to directory in which tfrecords need to be saved
+        :num_workers:  Number of processes used to decode videos in parallel
+        :num_shards:   Number of size-balanced tfrecords files to pack all videos into, 0 saves one tfrecords file per video
+        :max_frames:   Maximum number of frames to keep from each video, -1 keeps every frame
+        :frame_step:   Keep one out of every frame_step frames of each video
+        :frame_format: Format used to store frames, raw stores the entire video as bytes while jpeg or png store individually encoded frames
+        :short_side:   Smallest side frames are downscaled to while decoding, 0 keeps the source resolution
 
     Returns:
         Nothing 
     """
 
+    videos = _list_videos(videos_dir)
+
+    if num_shards <= 0:
+        if num_workers > 1:
+            pool = mp.Pool(num_workers)
+            pool.map(_save_tfrecords_worker, [(video_path, label, vidname, save_dir, max_frames, frame_step, frame_format, short_side) for video_path, label, vidname in videos])
+            pool.close()
+            pool.join()
+
+        else:
+            for video_path, label, vidname in videos:
+                data, scale = load_video_data_from_file(video_path, max_frames, frame_step, short_side=short_side, return_scale=True)
+                save_tfrecords(data, label, vidname, save_dir, frame_format, scale)
+
+            # END FOR
+
+        # END IF
+
+        # Manifest of the frames, resolution, label and size of every video, read by the loaders and train.py/test.py
+        build_manifest(save_dir)
+
+        return
+
+    # END IF
+
+    shards      = _balance_shards(videos, num_shards)
+    shard_args  = [(os.path.join(save_dir, 'shard-%05d-of-%05d.tfrecords' % (shard_idx, num_shards)), shard, max_frames, frame_step, frame_format, short_side) for shard_idx, shard in enumerate(shards)]
+
+    if num_workers > 1:
+        pool          = mp.Pool(num_workers)
+        shard_entries = pool.map(_save_tfrecords_shard_worker, shard_args)
+        pool.close()
+        pool.join()
+
+    else:
+        shard_entries = map(_save_tfrecords_shard_worker, shard_args)
+
+    # END IF
+
+    # Manifest mapping each video to the shard and byte offset of its record
+    manifest = {}
+
+    for entries in shard_entries:
+        for vidname, shard_name, offset, frames, label in entries:
+            manifest[vidname] = {'shard': shard_name, 'offset': offset, 'frames': frames, 'label': label}
+
+        # END FOR
+
+    # END FOR
+
+    manifest_file = open(os.path.join(save_dir, SHARD_MANIFEST), 'w')
+    json.dump(manifest, manifest_file)
+    manifest_file.close()
+
+    build_manifest(save_dir)
+
+
+def _list_videos(videos_dir):
+    """
+    List all videos of a dataset along with their label and tfrecords name
+    Args:
+        :videos_dir: Full path to directory containing action specific folders
+
+    Returns:
+        List of (video_path, label, vidname) tuples
+    """
+
     actions = os.listdir(videos_dir)
     actions = np.array(map(lambda x: x.lower(), actions))
     actions.sort()
     actions = actions.tolist()
 
+    videos = []
+
     for action in actions:
         for video in os.listdir(os.path.join(videos_dir, action)):
-            data = load_video_data_from_file(os.path.join(videos_dir, action, video))
-            save_tfrecords(data, actions.index(action), action+'_'+video, save_dir)
+            videos.append((os.path.join(videos_dir, action, video), actions.index(action), action+'_'+video))
 
         # END FOR
 
     # END FOR
 
+    return videos
+
+
+def _save_tfrecords_worker(video_args):
+    """
+    Decode a single video and save it as its own tfrecords file, used by multiprocessing.Pool
+    """
+    video_path, label, vidname, save_dir, max_frames, frame_step, frame_format, short_side = video_args
+    data, scale = load_video_data_from_file(video_path, max_frames, frame_step, short_side=short_side, return_scale=True)
+    save_tfrecords(data, label, vidname, save_dir, frame_format, scale)
+
 
 
 
 if __name__=='__main__':
 
+    args = parser.parse_args()
+
     print "Provide as single directory of a dataset splits to convert to tfrecords (--videos_dir). Directory must include subdirectories of action classes in the dataset. Each subdirectory includes all video files to be converted fo that action class."
     print "First ensure that training, testing, and validation dataset splits have been separated."
     print "Also provide a single directory to save all tfrecords files to (--save_dir)."
+    print "Optionally decode videos in parallel (--num_workers) and pack them into a fixed number of tfrecords shards (--num_shards)."
+    print "Frames can be downscaled while decoding (--short_side) to the resolution expected by a model's preprocessing."
 
 
-    convert_dataset(args.videos_dir, args.save_dir)
+    convert_dataset(args.videos_dir, args.save_dir, args.num_workers, args.num_shards, args.max_frames, args.frame_step, args.frame_format, args.short_side)
@@ -0,0 +1,190 @@
+"""
+AGGREGATION OF THE GRADIENTS COMPUTED BY EVERY TOWER
+
+average_gradients averages every gradient separately (expand, concatenate and reduce over towers), which creates a few
+ops and a tower sized copy per variable. fused_average_gradients packs the gradients of each tower into a few large
+buckets, sums every bucket across towers with a pairwise tree of adds spread over the tower devices (or NCCL all-reduce
+on gpus) and unpacks the averaged buckets into one gradient per variable.
+"""
+
+import tensorflow as tf
+
+
+def average_gradients(tower_grads):
+    """
+    Calculate the average gradient for each shared variable across all towers.
+    Note that this function provides a synchronization point across all towers.
+    Args:
+        tower_grads: List of lists of (gradient, variable) tuples. The outer list
+                     is over individual gradients. The inner list is over the gradient
+                     calculation for each tower.
+    Returns:
+        List of pairs of (gradient, variable) where the gradient has been averaged
+        across all towers.
+    """
+
+    average_grads = []
+
+    for grad_and_vars in zip(*tower_grads):
+        # Note that each grad_and_vars looks like the following:
+        #   ((grad0_gpu0, var0_gpu0), ... , (grad0_gpuN, var0_gpuN))
+        grads = []
+
+        for g, _ in grad_and_vars:
+            # Add 0 dimension to the gradients to represent the tower.
+            expanded_g = tf.expand_dims(g, 0)
+
+            # Append on a 'tower' dimension which we will average over below.
+            grads.append(expanded_g)
+
+        # END FOR
+
+        # Average over the 'tower' dimension.
+        grad = tf.concat(axis=0, values=grads)
+        grad = tf.reduce_mean(grad, 0)
+
+        # Keep in mind that the Variables are redundant because they are shared
+        # across towers. So .. we will just return the first tower's pointer to
+        # the Variable.
+        v = grad_and_vars[0][1]
+        grad_and_var = (grad, v)
+        average_grads.append(grad_and_var)
+
+    # END FOR
+    return average_grads
+
+
+def gradient_buckets(grads_and_vars, bucket_bytes):
+    """
+    Group consecutive gradients of the same type into buckets of at least bucket_bytes (except the last bucket of each type)
+    Args:
+        :grads_and_vars: List of (gradient, variable) tuples of a single tower
+        :bucket_bytes:   Minimum size of a bucket in bytes
+
+    Return:
+        List of buckets, each a list of indices into grads_and_vars
+    """
+    buckets      = []
+    bucket       = []
+    bucket_size  = 0
+    bucket_dtype = None
+
+    for grad_idx, (grad, var) in enumerate(grads_and_vars):
+        if grad is None:
+            continue
+
+        # END IF
+
+        if len(bucket) > 0 and (bucket_size >= bucket_bytes or grad.dtype != bucket_dtype):
+            buckets.append(bucket)
+            bucket      = []
+            bucket_size = 0
+
+        # END IF
+
+        bucket.append(grad_idx)
+        bucket_dtype  = grad.dtype
+        bucket_size  += var.get_shape().num_elements() * grad.dtype.size
+
+    # END FOR
+
+    if len(bucket) > 0:
+        buckets.append(bucket)
+
+    # END IF
+
+    return buckets
+
+
+def _tree_sum(tensors, devices):
+    """
+    Sum tensors held by different devices by adding pairs of them on the device of the first tensor of each pair
+    Args:
+        :tensors: List of tensors of identical shape, one per device
+        :devices: List of the devices holding each tensor
+
+    Return:
+        Sum of the tensors, held by devices[0]
+    """
+    while len(tensors) > 1:
+        summed_tensors = []
+        summed_devices = []
+
+        for idx in range(0, len(tensors), 2):
+            if idx + 1 < len(tensors):
+                with tf.device(devices[idx]):
+                    summed_tensors.append(tensors[idx] + tensors[idx+1])
+
+                # END WITH
+
+            else:
+                summed_tensors.append(tensors[idx])
+
+            # END IF
+
+            summed_devices.append(devices[idx])
+
+        # END FOR
+
+        tensors = summed_tensors
+        devices = summed_devices
+
+    # END WHILE
+
+    return tensors[0]
+
+
+def fused_average_gradients(tower_grads, devices, bucket_bytes=32*1024*1024, all_reduce='tree'):
+    """
+    Calculate the average gradient for each shared variable across all towers using a few large packed buckets
+    Args:
+        :tower_grads:  List (one per tower) of lists of (gradient, variable) tuples, as given to average_gradients
+        :devices:      List of the devices of the towers
+        :bucket_bytes: Minimum size in bytes of the buckets gradients are packed into
+        :all_reduce:   "tree" to sum every bucket with a tree of adds over the tower devices or "nccl" to use NCCL all-reduce (gpus only)
+
+    Return:
+        List of pairs of (gradient, variable) where the gradient has been averaged across all towers
+    """
+    num_towers    = len(tower_grads)
+    average_grads = [(None, var) for _, var in tower_grads[0]]
+
+    for bucket_idx, bucket in enumerate(gradient_buckets(tower_grads[0], bucket_bytes)):
+        packed = []
+
+        for tower_idx in range(num_towers):
+            with tf.device(devices[tower_idx]):
+                packed.append(tf.concat([tf.reshape(tower_grads[tower_idx][grad_idx][0], [-1]) for grad_idx in bucket], 0))
+
+            # END WITH
+
+        # END FOR
+
+        # Consecutive buckets are reduced on different devices so that reduction work and transfers are spread over the towers
+        root_idx = bucket_idx % num_towers
+
+        if all_reduce == 'nccl':
+            from tensorflow.contrib import nccl
+
+            summed = nccl.all_sum(packed)[root_idx]
+
+        else:
+            summed = _tree_sum(packed[root_idx:] + packed[:root_idx], devices[root_idx:] + devices[:root_idx])
+
+        # END IF
+
+        with tf.device(devices[root_idx]):
+            averaged = summed / num_towers
+            sizes    = [tower_grads[0][grad_idx][1].get_shape().num_elements() for grad_idx in bucket]
+
+            for grad_idx, grad in zip(bucket, tf.split(averaged, sizes)):
+                var = tower_grads[0][grad_idx][1]
+                average_grads[grad_idx] = (tf.reshape(grad, var.get_shape()), var)
+
+            # END FOR
+
+        # END WITH
+
+    # END FOR
+
+    return average_grads
@@ -1,11 +1,26 @@
 import os
+import json
 
 import numpy      as np
 import tensorflow as tf
 from tensorflow.python.training import queue_runner
-import utils.preprocessing_utils as preproc_utils
+from tensorflow.python.ops      import data_flow_ops
+import utils.preprocessing_utils    as preproc_utils
+import utils.temporal_index_utils   as temporal_index_utils
+import utils.video_store_utils      as video_store_utils
+import utils.dataset_manifest_utils as dataset_manifest_utils
+import utils.video_sampler_utils    as video_sampler_utils
 
-def load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging=0, shuffle_seed=0, verbose=True, reverse=0):
+# Name of the file mapping each video to its shard and byte offset when videos are packed into tfrecords shards
+SHARD_MANIFEST = 'shard_manifest.json'
+
+# Collection of the ops staging the first batch of every device staging area, run once after the queue runners have started
+STAGING_WARMUP = 'staging_warmup'
+
+# Collection of the ops staging the batch of the next step, run alongside every step that uses the staged batches
+STAGING_PUT = 'staging_put'
+
+def load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, video_step, preproc_debugging=0, shuffle_seed=0, verbose=True, reverse=0, input_pipeline='queue', num_parallel_reads=4, num_parallel_calls=4, prefetch_batches=2, num_reader_threads=1, queue_capacity=0, shuffle_queue=0, bucket_boundaries=[], sampler_position=None, shard_index=0, num_shards=1, device=None, video_cache=None, input_alphas=[]):
     """
     Function load dataset, setup queue and read data into queue
     Args:
@@ -23,53 +38,223 @@ def load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_lengt
         :clip_offset:        "none" or "random" indicating where to begin selecting video clips
         :num_clips:          Number of clips to break video into
         :clip_stride:        Number of frames that overlap between clips, 0 indicates no overlap and negative values indicate a gap of frames between clips
+        :input_pipeline:     "queue" to load clips through queue runners or "dataset" to use a tf.data pipeline
+        :num_parallel_reads: Number of tfrecords files read concurrently by the tf.data pipeline
+        :num_parallel_calls: Number of videos loaded and preprocessed in parallel by the tf.data pipeline
+        :prefetch_batches:   Number of batches prepared ahead of time by the tf.data pipeline
+        :num_reader_threads: Number of threads per gpu, each with its own reader, loading videos into the clip queue
+        :queue_capacity:     Maximum number of clips held by the clip queue, 0 indicates num_gpus*batch_size*num_reader_threads
+        :shuffle_queue:      Boolean indicating whether to shuffle clips across videos in the clip queue (training only)
+        :bucket_boundaries:  Frame counts separating length buckets, the clips of each batch are taken from videos of the same bucket (empty disables bucketing)
+        :sampler_position:   Number of videos already loaded by a previous run, loading resumes from the next video of its epoch order (None reads files through string_input_producer)
+        :shard_index:        Index of the shard of videos loaded by this input pipeline
+        :num_shards:         Number of input pipelines (e.g. one per tower) loading disjoint shards of the videos of every epoch
+        :device:             Device the batches are prefetched to, None leaves them on the host
+        :video_cache:        VideoCache keeping decoded videos in memory across epochs, videos are then read by their index in the manifest (None disables caching)
+        :input_alphas:       Input alphas every clip is resampled with in a single pass over the videos, the input alpha of each clip of a batch is stored in model.input_alphas_tensor (empty uses the input alpha of the model)
 
     Return:
         Input data tensor, label tensor and name of loaded data (video/image)
     """
-    # Get a list of tfrecords file names from which to pull videos
-    filenames           = []
-    number_of_tfrecords = 0
+    # Splits converted to a memory-mapped video store are read from the store instead of tfrecords
+    video_store = None
 
-    for f in os.listdir(base_data_path):
-        filenames.append(os.path.join(base_data_path,f))
-        number_of_tfrecords += 1
+    if video_store_utils.is_video_store(base_data_path):
+        video_store   = video_store_utils.VideoStore(base_data_path)
+        filenames     = []
+        record_format = 'store'
 
-    # END FOR
+        if verbose:
+            print "Number of videos available in video store: ", len(video_store)
 
-    if verbose:
-        print "Number of records available: ", number_of_tfrecords
+        # END IF
+
+        # Videos of a store are already decoded and memory mapped
+        if video_cache is not None:
+            print "Caution: videos are read from a video store, the video cache is not used"
+            video_cache = None
+
+        # END IF
+
+    else:
+        manifest = dataset_manifest_utils.load_manifest(base_data_path)
+
+        if manifest is not None:
+            # The manifest lists the tfrecords files and their format, no record is read to find them
+            filenames           = [os.path.join(base_data_path, f) for f in manifest['files']]
+            number_of_tfrecords = len(filenames)
+            record_format       = manifest['record_format']
+
+        else:
+            # Get a list of tfrecords file names from which to pull videos
+            filenames           = []
+            number_of_tfrecords = 0
+
+            for f in os.listdir(base_data_path):
+                if not f.endswith('.tfrecords'):
+                    continue
+
+                # END IF
+
+                filenames.append(os.path.join(base_data_path,f))
+                number_of_tfrecords += 1
+
+            # END FOR
+
+            # Frames are either stored as raw bytes or as individually encoded images, all records in a split share a format
+            record_format = _detect_record_format(filenames)
+
+        # END IF
+
+        if verbose:
+            print "Number of records available: ", number_of_tfrecords
+
+        # END IF
+
+    # END IF
+
+    # Length-bucketed, resumable or sharded loading reads videos by their index in the manifest, in the order given by a sampler
+    # The order of every epoch only depends on the seed and the epoch number, so a run can be resumed at any video
+    sampler       = None
+    record_reader = None
+
+    if len(bucket_boundaries) > 0 or sampler_position is not None or num_shards > 1:
+        manifest = dataset_manifest_utils.get_manifest(base_data_path)
+        sampler  = create_video_sampler(manifest, num_gpus, batch_size, clip_length, num_clips, istraining, shuffle_seed, bucket_boundaries, shard_index, num_shards)
+
+        if sampler_position is not None:
+            sampler.position = sampler.shard_position(sampler_position) if num_shards > 1 else sampler_position
+
+            if verbose:
+                print "Resuming video sampler at epoch ", sampler_position / len(sampler.video_frames), ", video ", sampler_position % len(sampler.video_frames)
+
+            # END IF
+
+        # END IF
+
+        if video_store is None:
+            record_reader = dataset_manifest_utils.RecordReader(base_data_path, manifest)
+
+        # END IF
+
+    # END IF
+
+    # Cached videos are identified by their index in the manifest, so they are read by index even without a sampler
+    if video_cache is not None:
+        if record_reader is None:
+            record_reader = dataset_manifest_utils.RecordReader(base_data_path, dataset_manifest_utils.get_manifest(base_data_path))
+
+        # END IF
+
+        # Hit rate and resident size of the cache are logged with the other tracked variables
+        if hasattr(model, 'add_track_variables'):
+            cache_hit_rate, cache_resident_mb = video_cache.stats()
+            model.add_track_variables('Video_Cache_Hit_Rate', cache_hit_rate)
+            model.add_track_variables('Video_Cache_Resident_MB', cache_resident_mb)
+
+        # END IF
+
+    # END IF
+
+    if input_pipeline == 'dataset' and not preproc_debugging:
+        input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = _load_dataset_tf_data(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, filenames, shuffle_seed, reverse, record_format, num_parallel_reads, num_parallel_calls, prefetch_batches, video_store, sampler, record_reader, device, video_cache, input_alphas)
+
+        if hasattr(model, 'store_alpha'):
+            model.store_alpha = alpha_tensor
+            model.add_track_variables('Parameterization_Variables', model.store_alpha)
+
+        # END IF
+
+        if len(input_alphas) > 1:
+            model.input_alphas_tensor = alpha_tensor
+
+        # END IF
+
+        return input_data_tensor, labels_tensor, names_tensor
 
     # END IF
 
     # Create Queue which will read in videos num_gpus at a time (Queue seeded for repeatability of experiments)
-    tfrecord_file_queue = tf.train.string_input_producer(filenames, shuffle=istraining, name='file_q', seed=shuffle_seed)
+    if sampler is not None:
+        tfrecord_file_queue = _sampler_queue(sampler)
+
+    elif video_store is not None:
+        # The queue holds the indices of videos within the store
+        tfrecord_file_queue = tf.train.range_input_producer(len(video_store), shuffle=istraining, name='file_q', seed=shuffle_seed)
+
+    elif record_reader is not None:
+        # The queue holds the indices of videos within the manifest
+        tfrecord_file_queue = tf.train.range_input_producer(len(record_reader), shuffle=istraining, name='file_q', seed=shuffle_seed)
+
+    else:
+        tfrecord_file_queue = tf.train.string_input_producer(filenames, shuffle=istraining, name='file_q', seed=shuffle_seed)
+
+    # END IF
 
     # Errors occurring in a model's preprocessing function are not properly traced back when using 'clip_q'.
     # If an error occurs stating that "fifo_queue has insufficient elements", then set '--preprocDebugging 1'
     # For debugging, a batch_size other than 1 will cause instability
     if preproc_debugging:
-        input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = _load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step)
+        input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = _load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step, record_format=record_format, video_store=video_store, record_reader=record_reader, video_cache=video_cache, input_alphas=input_alphas)
 
     else:
         tf.set_random_seed(0) # To ensure the numbers are generated for temporal offset consistently
 
         # Number of threads to be used
-        thread_count = 1
+        thread_count = max(num_reader_threads, 1)
+
+        # The queue must be able to hold at least a single batch of clips for every gpu
+        if queue_capacity <= 0:
+            queue_capacity = num_gpus*batch_size*thread_count
+
+        # END IF
+
+        queue_capacity = max(queue_capacity, num_gpus*batch_size)
+
+        # Models normalizing their inputs on the device queue uint8 clips, a quarter of the size of float32 clips
+        clip_dtype = _clip_dtype(model)
 
         # Initialize queue that will contain multiple clips of the format [[clip_frame_count, height, width, channels], [labels_copied_seqLength], [name_of_video]]
-        clip_q = tf.FIFOQueue(num_gpus*batch_size*thread_count, dtypes=[tf.float32, tf.int32, tf.string, tf.float32, tf.float32], shapes=[[input_dims, size[0], size[1], 3],[seq_length],[],[],[]])
-        
+        if shuffle_queue and istraining:
+            # Clips from different videos get mixed, keep half of the space beyond a batch filled to shuffle from
+            clip_q = tf.RandomShuffleQueue(queue_capacity, (queue_capacity - num_gpus*batch_size)/2, dtypes=[clip_dtype, tf.int32, tf.string, tf.float32, tf.float32], shapes=[[input_dims, size[0], size[1], 3],[seq_length],[],[],[]], seed=shuffle_seed, name='clip_q')
+
+        else:
+            clip_q = tf.FIFOQueue(queue_capacity, dtypes=[clip_dtype, tf.int32, tf.string, tf.float32, tf.float32], shapes=[[input_dims, size[0], size[1], 3],[seq_length],[],[],[]], name='clip_q')
 
-        # Attempts to load num_gpus*batch_size number of clips into queue, if there exist too many clips in a video then this function blocks until the clips are dequeued
-        enqueue_op = clip_q.enqueue_many(_load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step, reverse=reverse))
+        # END IF
+
+        # Each thread reads and preprocesses videos with its own reader, attempting to load all clips of a video into the queue at once
+        # If there exist too many clips in a video then the enqueue blocks until the clips are dequeued
+        enqueue_ops = []
+
+        for thread_idx in range(num_gpus*thread_count):
+            enqueue_ops.append(clip_q.enqueue_many(_load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step, reverse=reverse, record_format=record_format, video_store=video_store, record_reader=record_reader, video_cache=video_cache, input_alphas=input_alphas)))
+
+        # END FOR
 
         # Initialize the queuerunner and add it to the collection, this becomes initialized in train_test_TFRecords_multigpu_model.py after the Session is begun
-        qr = tf.train.QueueRunner(clip_q, [enqueue_op]*num_gpus*thread_count)
+        qr = tf.train.QueueRunner(clip_q, enqueue_ops)
         queue_runner.add_queue_runner(qr)
 
+        # Fraction of the queue filled before each dequeue, values near 0 indicate that the model is waiting on the input pipeline
+        queue_fill = tf.cast(clip_q.size(), tf.float32) / queue_capacity
+
+        if hasattr(model, 'add_track_variables'):
+            model.add_track_variables('Queue_Fill_Fraction', queue_fill)
+
+        # END IF
+
         # Dequeue the required number of clips so that each gpu contains batch_size clips
-        input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = clip_q.dequeue_many(num_gpus*batch_size)
+        with tf.control_dependencies([queue_fill]):
+            input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = clip_q.dequeue_many(num_gpus*batch_size)
+
+        # END WITH
+
+        if device is not None:
+            input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor = _stage_to_device([input_data_tensor, labels_tensor, names_tensor, video_step_tensor, alpha_tensor], device)
+
+        # END IF
 
     # END IF
 
@@ -80,10 +265,114 @@ def load_dataset(model, num_gpus, batch_size, output_dims, input_dims, seq_lengt
 
     # END IF
 
+    # Input alpha of each clip of the batch when clips are resampled with several input alphas
+    if len(input_alphas) > 1:
+        model.input_alphas_tensor = alpha_tensor
+
+    # END IF
+
     return input_data_tensor, labels_tensor, names_tensor
 
 
-def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step, reverse=0):
+def create_video_sampler(manifest, num_gpus, batch_size, clip_length, num_clips, istraining, shuffle_seed=0, bucket_boundaries=[], shard_index=0, num_shards=1):
+    """
+    Function to create the sampler deciding the order in which load_dataset loads the videos of a split
+    Args:
+        :manifest:          Dataset manifest of the split
+        :num_gpus:          Number of gpus whose batches are loaded together
+        :batch_size:        Number of clips to load into the model each step
+        :clip_length:       Length of clips to cut video into, -1 indicates using the entire video as one clip
+        :num_clips:         Number of clips to break video into
+        :istraining:        Boolean variable indicating training/testing phase, the videos of every training epoch are shuffled
+        :shuffle_seed:      Seed of the shuffle of the videos
+        :bucket_boundaries: Frame counts separating length buckets, empty disables bucketing
+        :shard_index:       Index of the shard of videos loaded by this input pipeline
+        :num_shards:        Number of input pipelines loading disjoint shards of the videos of every epoch
+
+    Return:
+        VideoSampler producing the indices of the videos loaded by the input pipeline
+    """
+    clips_per_video = dataset_manifest_utils.uniform_clips_per_video(clip_length, num_clips) or 1
+
+    return video_sampler_utils.VideoSampler([video['frames'] for video in manifest['videos']], istraining, shuffle_seed, bucket_boundaries, num_gpus*batch_size/clips_per_video, shard_index, num_shards)
+
+
+def _load_dataset_tf_data(model, num_gpus, batch_size, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, filenames, shuffle_seed, reverse, record_format, num_parallel_reads, num_parallel_calls, prefetch_batches, video_store=None, sampler=None, record_reader=None, device=None, video_cache=None, input_alphas=[]):
+    """
+    Function that builds a tf.data pipeline producing the same batches as the queue runner path of load_dataset
+    Records are read from several tfrecords files concurrently, videos are loaded and preprocessed in parallel, clips
+    are unbatched from their videos and regrouped into batches of num_gpus*batch_size clips which are prefetched.
+    Args:
+        :filenames:          List of tfrecords files of the current split
+        :shuffle_seed:       Seed used to shuffle the order of files during training
+        :record_format:      Format of the frames stored in the tfrecords (raw, jpeg or png)
+        :num_parallel_reads: Number of tfrecords files read concurrently
+        :num_parallel_calls: Number of videos loaded and preprocessed in parallel
+        :prefetch_batches:   Number of batches prepared ahead of time
+        :video_store:        VideoStore of the current split, videos are read from the store instead of filenames when provided
+        :sampler:            VideoSampler giving the order in which videos are loaded by index, used instead of reading filenames in order when provided
+        :record_reader:      RecordReader of the manifest of the split, reads the videos selected by sampler (or all videos in order) out of their tfrecords
+        :device:             Device the batches are prefetched to, None leaves them on the host
+        :video_cache:        VideoCache keeping decoded videos in memory across epochs, requires record_reader
+        :input_alphas:       Input alphas every clip is resampled with
+        (Remaining arguments are identical to those of load_dataset)
+
+    Return:
+        Input data tensor, label tensor, name tensor, video step tensor and alpha tensor of a single batch
+    """
+    tf.set_random_seed(0) # To ensure the numbers are generated for temporal offset consistently
+
+    if sampler is not None:
+        # Records are the indices of videos in the order given by the sampler, which loops over the split indefinitely
+        records = tf.data.Dataset.from_generator(sampler.indices, tf.int64, tf.TensorShape([]))
+
+    elif video_store is not None or record_reader is not None:
+        # Records are the indices of videos within the store or the manifest
+        number_of_videos = len(video_store) if video_store is not None else len(record_reader)
+        records          = tf.data.Dataset.range(number_of_videos)
+
+        if istraining:
+            records = records.shuffle(number_of_videos, seed=shuffle_seed, reshuffle_each_iteration=True)
+
+        # END IF
+
+        # Loop over the split indefinitely, matching range_input_producer, epochs are tracked by train.py and test.py
+        records = records.repeat()
+
+    else:
+        files = tf.data.Dataset.from_tensor_slices(filenames)
+
+        if istraining:
+            files = files.shuffle(len(filenames), seed=shuffle_seed, reshuffle_each_iteration=True)
+
+        # END IF
+
+        # Loop over the split indefinitely, matching string_input_producer, epochs are tracked by train.py and test.py
+        files   = files.repeat()
+        records = files.apply(tf.data.experimental.parallel_interleave(tf.data.TFRecordDataset, cycle_length=num_parallel_reads, sloppy=istraining))
+
+    # END IF
+
+    # Dataset functions can not update the video_step variable, each video is numbered by a counter instead, continuing from the position of a resumed sampler
+    records = tf.data.Dataset.zip((records, tf.data.experimental.Counter(start=sampler.position if sampler is not None else 0)))
+
+    videos  = records.map(lambda serialized_example, video_count: tuple(_load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, None, tf.to_float(video_count), reverse=reverse, record_format=record_format, serialized_example=serialized_example, video_store=video_store, record_reader=record_reader, video_cache=video_cache, input_alphas=input_alphas)),
+                          num_parallel_calls=num_parallel_calls)
+
+    clips   = videos.apply(tf.data.experimental.unbatch())
+    clips   = clips.map(lambda clip, label, name, step, alpha: (tf.reshape(clip, [input_dims, size[0], size[1], 3]), tf.reshape(label, [seq_length]), name, tf.to_float(step), tf.to_float(alpha)))
+    clips   = clips.batch(num_gpus*batch_size, drop_remainder=True)
+    clips   = clips.prefetch(prefetch_batches)
+
+    if device is not None:
+        clips = clips.apply(tf.data.experimental.prefetch_to_device(device, prefetch_batches))
+
+    # END IF
+
+    return clips.make_one_shot_iterator().get_next()
+
+
+def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path, dataset, istraining, clip_length, video_offset, clip_offset, num_clips, clip_stride, tfrecord_file_queue, video_step, reverse=0, record_format='raw', serialized_example=None, video_store=None, record_reader=None, video_cache=None, input_alphas=[]):
     """
     Function to load a single video and preprocess its' frames
     Args:
@@ -100,13 +389,52 @@ def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path
         :num_clips:            Number of clips to break video into
         :clip_stride:         Number of frames that overlap between clips, 0 indicates no overlap and -1 indicates clips are randomly selected and not sequential
         :tfrecord_file_queue:  A queue containing remaining videos to be loaded for the current epoch
+        :video_step:           Variable counting the number of videos loaded, or the number of the current video when loaded by a tf.data pipeline
+        :record_format:        Format of the frames stored in the tfrecords (raw, jpeg or png) or store when reading from video_store
+        :serialized_example:   Serialized example of the video, used instead of reading from tfrecord_file_queue when provided
+        :video_store:          VideoStore of the current split, serialized_example and tfrecord_file_queue then provide the index of the video
+        :record_reader:        RecordReader of the manifest of the split, serialized_example and tfrecord_file_queue then provide the index of the video
+        :video_cache:          VideoCache holding decoded videos across epochs, requires record_reader
+        :input_alphas:         Input alphas each clip is resampled with, the clips of every alpha are returned one after the other (empty uses the input alpha of the model)
 
     Return:
         Input data tensor, label tensor and name of loaded data (video/image)
     """
 
+    # Videos selected by index are read from the video store or out of their tfrecords file
+    if video_store is not None or record_reader is not None:
+        if serialized_example is None:
+            video_index = tfrecord_file_queue.dequeue()
+
+        else:
+            video_index = serialized_example
+
+        # END IF
+
+        if record_reader is not None and video_cache is None:
+            serialized_example = record_reader.read(video_index)
+
+        # END IF
+
+    # END IF
+
     # Dequeue video data from queue and convert it from TFRecord format (int64 or bytes)
-    features = _read_tfrecords(tfrecord_file_queue)
+    if record_format == 'store':
+        features = video_store.features(video_index)
+
+    elif video_cache is not None:
+        # The description of the video comes from the manifest, the record is only read when the video is not cached
+        features = record_reader.features(video_index)
+        video    = video_cache.load_video(video_index, lambda: _decode_video(record_reader.read(video_index), record_format, dataset))
+
+    elif serialized_example is None:
+        features = _read_tfrecords(tfrecord_file_queue, record_format)
+
+    else:
+        features = _parse_tfrecords(serialized_example, record_format)
+
+    # END IF
+
     frames   = tf.cast(features['Frames'], tf.int32)
     height   = tf.cast(features['Height'], tf.int32)
     width    = tf.cast(features['Width'], tf.int32)
@@ -115,35 +443,90 @@ def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path
 
     name     = features['Name']
 
-    # Shape [frames, height, width, channels]
-    input_data_tensor = tf.reshape(tf.decode_raw(features['Data'], tf.uint8), tf.stack([frames,height,width,channel]))
+    # Temporal transforms of the loader and the model are collected in a plan that only composes frame indices, the frames
+    # selected for each clip are materialized once from the record instead of decoding, flipping and looping the entire video
+    if video_cache is not None:
+        # Cached videos were already reduced to 25 fps when decoded
+        plan = temporal_index_utils.TemporalPlan(tf.shape(video)[0])
 
-    # BGR to RGB
-    input_data_tensor = input_data_tensor[...,::-1]
+    else:
+        plan = temporal_index_utils.TemporalPlan(frames)
 
-    # Reduction in fps to 25 for HMDB51 dataset
-    if ('HMDB51' in dataset) or ('MIT' in dataset):
-        input_data_tensor, frames, indices = _reduce_fps(input_data_tensor, frames)
+        # Reduction in fps to 25 for HMDB51 dataset
+        if ('HMDB51' in dataset) or ('MIT' in dataset):
+            plan.reduce_fps()
+
+        # END IF
 
     # END IF
 
     if reverse!=0:
         if reverse==1:
             rand_reverse = tf.random_uniform([1], minval=0, maxval=2, dtype=tf.int32)[0]
+            plan.reverse(tf.not_equal(rand_reverse, 0))
+
         else:
             rand_reverse = 1
+            plan.reverse()
 
-        input_data_tensor = tf.cond(tf.equal(rand_reverse,0), lambda: input_data_tensor, lambda: input_data_tensor[::-1,...])
         label = tf.cond(tf.equal(rand_reverse,0), lambda: label, lambda: label+(output_dims/2))
 
 
     # If clip_length == -1 then the entire video is to be used as a single clip
     if clip_length <= 0:
-        clips = [input_data_tensor]
-        clips = tf.to_int32(clips)  # Usually occurs within _extract_clips
+        plan.whole_video()
+
+    else:
+        plan.clip_windows(num_clips, clip_offset, clip_length, video_offset, clip_stride)
+
+    # END IF
+
+    # Every input alpha resamples the same clips, the record is read and decoded once for all of them
+    if len(input_alphas) > 1:
+        alpha_plans = zip(input_alphas, plan.fork(len(input_alphas)))
+
+    else:
+        alpha_plans = [(None, plan)]
+
+    # END IF
+
+    # Models read their input alpha when their temporal steps and preprocessing are added to the graph
+    model_alpha  = getattr(model, 'input_alpha', 1.0)
+    clip_indices = []
+    fused_steps  = []
+
+    for input_alpha, alpha_plan in alpha_plans:
+        if input_alpha is not None:
+            model.input_alpha = input_alpha
+
+        # END IF
+
+        # Models can add the temporal steps of their preprocessing (looping, resampling, segments) to each clip
+        if hasattr(model, 'add_temporal_steps'):
+            fused_steps.append(model.add_temporal_steps(alpha_plan, input_dims, seq_length, istraining))
+
+        else:
+            fused_steps.append(False)
+
+        # END IF
+
+        clip_indices.append(alpha_plan.indices())
+
+    # END FOR
+
+    # Decode only the frames selected for each clip
+    if record_format == 'store':
+        # Only the selected frames are copied out of the memory-mapped store
+        clip_sets = [video_store.gather_clips(video_index, indices) for indices in clip_indices]
+
+    elif video_cache is not None:
+        clip_sets = [tf.gather(video, indices) for indices in clip_indices]
+
+    elif record_format == 'raw':
+        clip_sets = [_gather_raw_clips(features['Data'], indices, height, width, channel) for indices in clip_indices]
 
     else:
-        clips = _extract_clips(input_data_tensor, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride, height, width, channel)
+        clip_sets = _decode_clip_sets(features['EncodedFrames'], clip_indices, record_format)
 
     # END IF
 
@@ -152,24 +535,67 @@ def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path
         model.preprocess_tfrecords input shape: [clip_length or frames, height, width, channels]
     """
 
-    # Call preprocessing function related to model chosen that preprocesses each clip as an individual video
-    if hasattr(model, 'store_alpha'):
-        clips_tensor = tf.map_fn(lambda clip: model.preprocess_tfrecords(clip[0], tf.shape(clip[0])[0], height, width,channel, input_dims, output_dims, seq_length, size, label, istraining, video_step),
-            (clips, np.array([clips.get_shape()[0].value]*clips.get_shape()[0].value)), dtype=(tf.float32, tf.float32))
+    clips_tensors = []
+    alpha_tensors = []
 
-        alpha_tensor = clips_tensor[1]
-        clips_tensor = clips_tensor[0]
+    for (input_alpha, _), clips, fused in zip(alpha_plans, clip_sets, fused_steps):
+        if input_alpha is not None:
+            model.input_alpha = input_alpha
 
-    else:
-        clips_tensor = tf.map_fn(lambda clip: model.preprocess_tfrecords(clip, tf.shape(clip)[0], height, width,channel, input_dims, output_dims, seq_length, size, label, istraining, video_step),
-            clips, dtype=tf.float32)
+        # END IF
+
+        # Models whose temporal steps were fused into the plan are told not to apply them again
+        preproc_args = {'temporal_steps_fused': True} if fused else {}
 
-        alpha_tensor = np.array([1.0]*clips.get_shape()[0].value)
+        # Call preprocessing function related to model chosen that preprocesses each clip as an individual video
+        if hasattr(model, 'store_alpha'):
+            clips_tensor = tf.map_fn(lambda clip: model.preprocess_tfrecords(clip[0], tf.shape(clip[0])[0], height, width,channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, **preproc_args),
+                (clips, np.array([clips.get_shape()[0].value]*clips.get_shape()[0].value)), dtype=(_clip_dtype(model), tf.float32))
+
+            alpha_tensor = clips_tensor[1]
+            clips_tensor = clips_tensor[0]
+
+        else:
+            clips_tensor = tf.map_fn(lambda clip: model.preprocess_tfrecords(clip, tf.shape(clip)[0], height, width,channel, input_dims, output_dims, seq_length, size, label, istraining, video_step, **preproc_args),
+                clips, dtype=_clip_dtype(model))
+
+            # The alpha of each clip identifies the input alpha it was resampled with when evaluating several input alphas
+            if input_alpha is not None:
+                alpha_tensor = tf.fill([tf.shape(clips_tensor)[0]], float(input_alpha))
+
+            else:
+                alpha_tensor = np.array([1.0]*clips.get_shape()[0].value)
+
+            # END IF
+
+        # END IF
+
+        clips_tensors.append(clips_tensor)
+        alpha_tensors.append(alpha_tensor)
+
+    # END FOR
+
+    if len(clips_tensors) > 1:
+        model.input_alpha = model_alpha
+        clips_tensor      = tf.concat(clips_tensors, 0)
+        alpha_tensor      = tf.concat(alpha_tensors, 0)
+
+    else:
+        clips_tensor = clips_tensors[0]
+        alpha_tensor = alpha_tensors[0]
 
     # END IF
 
     num_clips         = tf.shape(clips_tensor)[0]
-    video_step        = tf.assign_add(video_step, 1)
+
+    if isinstance(video_step, tf.Variable):
+        video_step    = tf.assign_add(video_step, 1)
+
+    else:
+        video_step    = video_step + 1
+
+    # END IF
+
     labels_tensor     = tf.tile( [label], [seq_length])
     names_tensor      = tf.tile( [name], [num_clips])
     video_step_tensor = tf.tile([video_step], [num_clips])
@@ -181,23 +607,140 @@ def _load_video(model, output_dims, input_dims, seq_length, size, base_data_path
     return [clips_tensor, tf.tile([labels_tensor], [num_clips,1]), names_tensor, video_step_tensor, alpha_tensor]
 
 
-def _read_tfrecords(filename_queue):
+def _decode_video(serialized_example, record_format, dataset):
+    """
+    Function that decodes every frame of a video kept by a video cache, reduced to 25 fps for the HMDB51 dataset
+    Args:
+        :serialized_example:  String tensor containing a serialized tf.train.Example
+        :record_format:       Format of the frames stored in the tfrecords (raw, jpeg or png)
+        :dataset:             Name of dataset being processed
+
+    Return:
+        A uint8 tensor containing the RGB video (shape [frames, height, width, channel])
+    """
+    features = _parse_tfrecords(serialized_example, record_format)
+    frames   = tf.cast(features['Frames'], tf.int32)
+
+    # Reduction in fps to 25 for HMDB51 dataset
+    if ('HMDB51' in dataset) or ('MIT' in dataset):
+        indices, _ = temporal_index_utils.reduce_fps_indices(frames)
+
+    else:
+        indices = tf.range(frames)
+
+    # END IF
+
+    if record_format == 'raw':
+        video = _gather_raw_clips(features['Data'], tf.expand_dims(indices, 0), tf.cast(features['Height'], tf.int32), tf.cast(features['Width'], tf.int32), tf.cast(features['Channels'], tf.int32))
+
+    else:
+        video = _decode_clips(features['EncodedFrames'], tf.expand_dims(indices, 0), record_format)
+
+    # END IF
+
+    return video[0]
+
+
+def _clip_dtype(model):
+    """
+    Args:
+        :model: tf-activity-recognition framework model object
+
+    Return:
+        Type of the clips returned by the preprocessing of model, uint8 when the model normalizes its inputs on the device
+    """
+    if getattr(model, 'device_normalization', False):
+        return tf.uint8
+
+    # END IF
+
+    return tf.float32
+
+
+def _stage_to_device(tensors, device):
+    """
+    Function that copies batches dequeued on the host into a staging area on the device, the batch of the next step is copied while the current one is used
+    Args:
+        :tensors: List of the tensors of a dequeued batch
+        :device:  Device holding the staging area
+
+    Return:
+        List of the tensors of the staged batch, the ops in STAGING_PUT must be run in the same step to stage the following batch
+    """
+    with tf.device(device):
+        staging_area = data_flow_ops.StagingArea([tensor.dtype for tensor in tensors], [tensor.get_shape() for tensor in tensors])
+
+        # The first batch is staged once the queue runners have started, see STAGING_WARMUP
+        tf.add_to_collection(STAGING_WARMUP, staging_area.put(tensors))
+
+        # The next batch is staged independently of the current one, so its copy overlaps the computation of the step
+        tf.add_to_collection(STAGING_PUT, staging_area.put(tensors))
+
+        staged_tensors = staging_area.get()
+
+    # END WITH
+
+    return staged_tensors
+
+
+def _sampler_queue(sampler, capacity=32):
+    """
+    Function that creates a queue of video indices filled in the order given by a sampler, replaces string_input_producer
+    Args:
+        :sampler:   VideoSampler of the current split
+        :capacity:  Maximum number of indices held by the queue
+
+    Return:
+        FIFOQueue of int64 video indices
+    """
+    queue       = tf.FIFOQueue(capacity, tf.int64, shapes=[[]], name='file_q')
+    video_index = tf.reshape(tf.py_func(sampler.next_index, [], tf.int64, stateful=True), [])
+
+    # A single enqueue op keeps the indices in the order of the sampler
+    queue_runner.add_queue_runner(tf.train.QueueRunner(queue, [queue.enqueue(video_index)]))
+
+    return queue
+
+
+def _read_tfrecords(filename_queue, record_format='raw'):
     """
     Function that reads and returns the tfrecords of a selected dataset one at a time
     Args:
         :filename_queue:  A queue of all filenames within a dataset
+        :record_format:   Format of the frames stored in the tfrecords (raw, jpeg or png)
 
     Return:
         Dictionary containing features of a single sample
     """
-    feature_dict = {}
-    reader       = tf.TFRecordReader()
+    reader = tf.TFRecordReader()
 
     _, serialized_example = reader.read(filename_queue)
 
+    return _parse_tfrecords(serialized_example, record_format)
+
+
+def _parse_tfrecords(serialized_example, record_format='raw'):
+    """
+    Function that parses a single serialized tfrecords example
+    Args:
+        :serialized_example:  String tensor containing a serialized tf.train.Example
+        :record_format:       Format of the frames stored in the tfrecords (raw, jpeg or png)
+
+    Return:
+        Dictionary containing features of a single sample
+    """
+    feature_dict = {}
 
     feature_dict['Label']    = tf.FixedLenFeature([], tf.int64)
-    feature_dict['Data']     = tf.FixedLenFeature([], tf.string)
+
+    if record_format == 'raw':
+        feature_dict['Data'] = tf.FixedLenFeature([], tf.string)
+
+    else:
+        feature_dict['EncodedFrames'] = tf.VarLenFeature(tf.string)
+
+    # END IF
+
     feature_dict['Frames']   = tf.FixedLenFeature([], tf.int64)
     feature_dict['Height']   = tf.FixedLenFeature([], tf.int64)
     feature_dict['Width']    = tf.FixedLenFeature([], tf.int64)
@@ -206,100 +749,174 @@ def _read_tfrecords(filename_queue):
 
     features = tf.parse_single_example(serialized_example, features=feature_dict)
 
+    if record_format != 'raw':
+        features['EncodedFrames'] = features['EncodedFrames'].values
+
+    # END IF
+
     return features
 
 
-def _extract_clips(video, frames, num_clips, clip_offset, clip_length, video_offset, clip_stride, height, width, channel):
+def _detect_record_format(filenames):
     """
-    Function that extracts clips from a video based off of clip specifications
+    Function that detects the format of the frames stored in a list of tfrecords from the feature keys of the first record
     Args:
-        :video:                The video tensor that needs to be split into clips
-        :frames:               The number of frames of the video
-        :num_clips:            Number of clips to break video into
-        :clip_offset:          "none" or "random" indicating where to begin selecting video clips
-        :clip_length:          Length of clips to cut video into, -1 indicates using the entire video as one clip')
-        :clip_stride:          Number of frames that overlap between clips, 0 indicates no overlap and negative values indicate a gap of frames between clips
+        :filenames:  List of tfrecords filenames
+
+    Return:
+        'raw' if whole videos are stored as bytes, otherwise the image format of the individually encoded frames (jpeg or png)
+    """
+    for filename in filenames:
+        for serialized_example in tf.python_io.tf_record_iterator(filename):
+            return _record_format_from_example(serialized_example)
+
+        # END FOR
+
+    # END FOR
+
+    return 'raw'
 
 
+def _record_format_from_example(serialized_example):
+    """
+    Function that reads the format of the frames stored in a single serialized example
+    Args:
+        :serialized_example:  Serialized tf.train.Example string
+
     Return:
-        A tensor containing the clip(s) extracted from the video (shape [clip_number, clip_frames, height, width, channel])
+        'raw' if the whole video is stored as bytes, otherwise the image format of the individually encoded frames (jpeg or png)
     """
-    if video_offset == 'random':
-        video_start = tf.random_uniform([], maxval=frames-1, dtype=tf.int32)
+    feature = tf.train.Example.FromString(serialized_example).features.feature
 
-    else:
-        video_start = 0
+    if 'EncodedFrames' in feature:
+        return feature['Format'].bytes_list.value[0]
 
-    if clip_offset == 'random':
-        video = tf.cond(tf.greater(clip_length, frames),
-                        lambda: _loop_video_with_offset(video, video, 0, frames, height, width, channel, clip_length),
-                        lambda: video)
+    # END IF
 
-        clip_begin = tf.random_uniform([num_clips], minval=0, maxval=tf.shape(video)[0]-clip_length+1, dtype=tf.int32)
-        rs = tf.reshape(clip_begin, [num_clips,1,1,1])
-        video = tf.to_int32(video)
-        clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+    return 'raw'
+
+
+def _decode_frames(encoded_frames, record_format):
+    """
+    Function that decodes a list of individually encoded frames
+    Args:
+        :encoded_frames:  String tensor of encoded images, shape [frames]
+        :record_format:   Image format of the encoded frames (jpeg or png)
+
+    Return:
+        Decoded RGB frames, shape [frames, height, width, channels]
+    """
+    if record_format == 'jpeg':
+        decode_fn = tf.image.decode_jpeg
 
     else:
-        if num_clips > 0:
-            frames_needed = clip_length + (clip_length-clip_stride) * (num_clips-1)
-            video = tf.cond(tf.greater(frames_needed, frames-video_start),
-                            lambda: _loop_video_with_offset(video[video_start:,:,:,:], video, frames-video_start, frames, height, width, channel, frames_needed),
-                            lambda: video[video_start:,:,:,:])
+        decode_fn = tf.image.decode_png
 
-            clip_begin = tf.range(0, frames_needed, delta = clip_length-clip_stride)[:num_clips]
+    # END IF
 
-            rs = tf.reshape(clip_begin, [num_clips,1,1,1])
-            video = tf.to_int32(video)
-            clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+    return tf.map_fn(decode_fn, encoded_frames, dtype=tf.uint8)
+
+
+def _decode_clips(encoded_frames, clip_indices, record_format):
+    """
+    Function that decodes the frames selected for each clip out of a list of individually encoded frames
+    Args:
+        :encoded_frames:  String tensor of encoded images, shape [frames]
+        :clip_indices:    Frame indices selected for each clip, shape [num_clips, clip_frames]
+        :record_format:   Image format of the encoded frames (jpeg or png)
+
+    Return:
+        A uint8 tensor containing the decoded clip(s) (shape [clip_number, clip_frames, height, width, channel])
+    """
+    return _decode_clip_sets(encoded_frames, [clip_indices], record_format)[0]
 
-        else:
-            # Get total number of clips possible given clip_length stride and offset
 
-            # Need minimum one clip: loop video until at least have clip_length frames
-            video = tf.cond(tf.greater(clip_length, frames-video_start),
-                            lambda: _loop_video_with_offset(video[video_start:,:,:,:], video, frames-video_start, frames, height, width, channel, clip_length+video_start),
-                            lambda: video[video_start:,:,:,:])
+def _decode_clip_sets(encoded_frames, clip_indices, record_format):
+    """
+    Function that decodes the frames selected for several sets of clips (e.g. one per input alpha) out of a list of individually encoded frames
+    Args:
+        :encoded_frames:  String tensor of encoded images, shape [frames]
+        :clip_indices:    List of the frame indices selected for each clip of every set, shapes [num_clips, clip_frames]
+        :record_format:   Image format of the encoded frames (jpeg or png)
+
+    Return:
+        List of uint8 tensors containing the decoded clip(s) of every set (shapes [clip_number, clip_frames, height, width, channel])
+    """
+    # Frames repeated by looping short videos, shared by overlapping clips or by several sets are decoded once
+    unique_indices, positions = tf.unique(tf.concat([tf.reshape(indices, [-1]) for indices in clip_indices], 0))
 
-            number_of_clips = tf.cond(tf.greater(clip_length, frames-video_start),
-                            lambda: 1,
-                            lambda: (frames-video_start-clip_length) / (clip_length - clip_stride) + 1)
+    frames    = _decode_frames(tf.gather(encoded_frames, unique_indices), record_format)
+    positions = tf.split(positions, [tf.size(indices) for indices in clip_indices]) if len(clip_indices) > 1 else [positions]
+    clip_sets = []
 
-            clip_begin = tf.range(0, number_of_clips*(clip_length-clip_stride), delta=clip_length-clip_stride)[:number_of_clips]
+    for indices, set_positions in zip(clip_indices, positions):
+        clips = tf.gather(frames, tf.reshape(set_positions, tf.shape(indices)))
+        clips.set_shape(indices.get_shape().concatenate([None, None, None]))
 
-            rs = tf.reshape(clip_begin, [number_of_clips,1,1,1])
+        clip_sets.append(clips)
+
+    # END FOR
+
+    return clip_sets
+
+
+def _gather_raw_clips(data, clip_indices, height, width, channel):
+    """
+    Function that copies the frames selected for each clip out of a raw video without decoding the entire video
+    Raw videos store frames contiguously, frame i occupies the bytes [i*height*width*channel, (i+1)*height*width*channel)
+    Args:
+        :data:          String tensor containing the raw uint8 (BGR) bytes of the entire video
+        :clip_indices:  Frame indices selected for each clip, shape [num_clips, clip_frames]
+        :height:        Height of frame
+        :width:         Width of frame
+        :channel:       Total number of color channels
+
+    Return:
+        A uint8 tensor containing the RGB clip(s) (shape [clip_number, clip_frames, height, width, channel])
+    """
+    clip_shape    = tf.shape(clip_indices)
 
-            video = tf.to_int32(video)
-            clips = tf.map_fn(lambda clip_start: video[clip_start[0][0][0]:clip_start[0][0][0]+clip_length], rs)
+    # Byte offsets are computed in int64, raw videos larger than 2 GiB overflow int32 offsets
+    frame_indices = tf.cast(tf.reshape(clip_indices, [-1]), tf.int64)
+    frame_size    = tf.cast(height, tf.int64)*tf.cast(width, tf.int64)*tf.cast(channel, tf.int64)
+
+    clips = tf.decode_raw(tf.substr(data, frame_indices*frame_size, tf.fill(tf.shape(frame_indices), frame_size)), tf.uint8)
+    clips = tf.reshape(clips, tf.stack([clip_shape[0], clip_shape[1], height, width, channel]))
+    clips.set_shape(clip_indices.get_shape().concatenate([None, None, None]))
+
+    # BGR to RGB
+    clips = clips[...,::-1]
 
     return clips
 
 
-def _loop_video_with_offset(offset_tensor, input_data_tensor, offset_frames, frames, height, width, channel, footprint):
+def _read_serialized_from_shard(base_data_path, vid_name):
     """
-    Loop the video the number of times necessary for the number of frames to be > footprint
+    Function that reads the serialized example of a single video out of a tfrecords shard using the shard manifest
     Args:
-        :offset_tensor:     Raw input data from offset frame number
-        :input_data_tensor: Raw input data
-        :frames:            Total number of frames
-        :height:            Height of frame
-        :width:             Width of frame
-        :channel:           Total number of color channels
-        :footprint:         Total length of video to be extracted before sampling down
+        :base_data_path:  Full path to directory containing the tfrecords shards and shard manifest
+        :vid_name:        Name of the video to read
 
     Return:
-        Looped video
+        Serialized tf.train.Example string of the video, None if the video is not listed in a shard manifest
     """
+    manifest_path = os.path.join(base_data_path, SHARD_MANIFEST)
 
-    loop_factor       = tf.cast(tf.add(tf.divide(tf.subtract(footprint, offset_frames), frames), 1), tf.int32)
-    loop_stack        = tf.stack([loop_factor,1,1,1])
-    input_data_tensor = tf.tile(input_data_tensor, loop_stack)
-    reshape_stack     = tf.stack([tf.multiply(frames, loop_factor),height,width,channel])
-    input_data_looped = tf.reshape(input_data_tensor, reshape_stack)
+    if not os.path.isfile(manifest_path):
+        return None
 
-    output_data       = tf.concat([offset_tensor, input_data_looped], axis = 0)
+    # END IF
+
+    manifest_file = open(manifest_path, 'r')
+    manifest      = json.load(manifest_file)
+    manifest_file.close()
 
-    return output_data
+    if vid_name not in manifest:
+        return None
+
+    # END IF
+
+    return dataset_manifest_utils.read_record(os.path.join(base_data_path, manifest[vid_name]['shard']), manifest[vid_name]['offset'])
 
 
 def _reduce_fps(video, frame_count):
@@ -313,26 +930,9 @@ def _reduce_fps(video, frame_count):
         Video with reduced number of frames to match 25fps
     """
     # Convert from 30 fps to 25 fps
-    remove_count = tf.cast(tf.ceil(tf.divide(frame_count, 6)), tf.int32)
-
-    intermediate_frames = tf.multiply(remove_count, 5)
-    indices = tf.tile([0,1,2,3,4], [remove_count])                                 # [[0,1,2,3,4],[0,1,2,3,4]..]
-    indices = tf.reshape(indices, [intermediate_frames])                           # [0,1,2,3,4,0,1,2,3,4,0,1,2....]
-    additions = tf.range(remove_count)                                             # [0,1,2,3,4,5,6,....]
-    additions = tf.stack([additions, additions, additions, additions, additions])  # [[0,1,2,3,4,5,6...], [0,1,2,3,4,5,6..], [0,1..], [0,1,..], [0,1,...]]
-    additions = tf.transpose(additions)                                            # [[0,0,0,0,0], [1,1,1,1,1], [2,2,2,2,2], ...]
-    additions = tf.reshape(additions, [intermediate_frames])                       # [0,0,0,0,0,1,1,1,1,1,2,2,2,2,2,3,3,3,3,3....]
-    additions = tf.multiply(additions, 6)                                          # [0,0,0,0,0,6,6,6,6,6,12,12,12,12,12,18,18,18,18,18....]
-    indices = tf.add(indices, additions)                                           # [0,1,2,3,4,6,7,8,9,10,12,13,14,15,16,18,19....]
-
-    remove_count = tf.cond( tf.equal(frame_count, tf.multiply(remove_count, 6)),
-                    lambda: remove_count,
-                    lambda: tf.subtract(remove_count, 1))
-    output_frames = tf.subtract(frame_count, remove_count)
-
-    indices = tf.slice(indices, [0], [output_frames])
-    indices_to_keep = tf.reshape(indices, [output_frames])
-    output = tf.gather(video, indices_to_keep)
+    indices, output_frames = temporal_index_utils.reduce_fps_indices(frame_count)
+
+    output = tf.gather(video, indices)
     return output, output_frames, indices
 
 
@@ -361,11 +961,54 @@ def load_dataset_without_preprocessing(base_data_path, dataset, istraining, vid_
     Return:
         Input data tensor, label tensor and name of loaded data (video/image)
     """
+    # Splits converted to a memory-mapped video store are read from the store instead of tfrecords
+    if video_store_utils.is_video_store(base_data_path):
+        video_store = video_store_utils.VideoStore(base_data_path)
+
+        if verbose:
+            print "Number of videos available in video store: ", len(video_store)
+
+        # END IF
+
+        if vid_name == "default":
+            video_index = tf.train.range_input_producer(len(video_store), shuffle=istraining, name='file_q', seed=0).dequeue()
+
+        else:
+            video_index = video_store.index_of(vid_name)
+
+            if video_index is None:
+                raise ValueError('Video ' + vid_name + ' is not contained in the video store ' + base_data_path)
+
+            # END IF
+
+        # END IF
+
+        features = video_store.features(video_index)
+        frames   = features['Frames']
+
+        # Shape [frames, height, width, channels], already RGB
+        input_data_tensor = video_store.gather_clips(video_index, tf.expand_dims(tf.range(frames), 0))[0]
+
+        # Reduction in fps to 25 for HMDB51 dataset
+        if 'HMDB51' in dataset:
+            input_data_tensor, frames, indices = _reduce_fps(input_data_tensor, frames)
+
+        # END IF
+
+        return input_data_tensor, features['Label'], features['Name']
+
+    # END IF
+
     # Get a list of tfrecords file names from which to pull videos
     filenames           = []
     number_of_tfrecords = 0
 
     for f in os.listdir(base_data_path):
+        if not f.endswith('.tfrecords'):
+            continue
+
+        # END IF
+
         filenames.append(os.path.join(base_data_path,f))
         number_of_tfrecords += 1
 
@@ -374,12 +1017,20 @@ def load_dataset_without_preprocessing(base_data_path, dataset, istraining, vid_
     if verbose:
         print "Number of records available: ", number_of_tfrecords
 
+    # Videos packed into tfrecords shards are read directly from their byte offset
+    serialized_example = None
+
+    if vid_name != "default":
+        serialized_example = _read_serialized_from_shard(base_data_path, vid_name)
+
+    # END IF
+
     if vid_name == "default":
 
         # Create Queue which will read in videos num_gpus at a time (Queue seeded for repeatability of experiments)
         tfrecord_file_queue = tf.train.string_input_producer(filenames, shuffle=istraining, name='file_q', seed=0)
 
-    else:
+    elif serialized_example is None:
         # Create Queue which will read in videos num_gpus at a time (Queue seeded for repeatability of experiments)
         tfrecord_file_queue = tf.train.string_input_producer([os.path.join(base_data_path, f)], shuffle=istraining, name='file_q', seed=0)
 
@@ -390,7 +1041,15 @@ def load_dataset_without_preprocessing(base_data_path, dataset, istraining, vid_
     thread_count = 1
 
     # Dequeue video data from queue and convert it from TFRecord format (int64 or bytes)
-    features = _read_tfrecords(tfrecord_file_queue)
+    if serialized_example is None:
+        record_format = _detect_record_format(filenames)
+        features      = _read_tfrecords(tfrecord_file_queue, record_format)
+
+    else:
+        record_format = _record_format_from_example(serialized_example)
+        features      = _parse_tfrecords(tf.constant(serialized_example), record_format)
+
+    # END IF
     frames   = tf.cast(features['Frames'], tf.int32)
     height   = tf.cast(features['Height'], tf.int32)
     width    = tf.cast(features['Width'], tf.int32)
@@ -400,10 +1059,17 @@ def load_dataset_without_preprocessing(base_data_path, dataset, istraining, vid_
     name     = features['Name']
 
     # Shape [frames, height, width, channels]
-    input_data_tensor = tf.reshape(tf.decode_raw(features['Data'], tf.uint8), tf.stack([frames,height,width,channel]))
+    if record_format == 'raw':
+        input_data_tensor = tf.reshape(tf.decode_raw(features['Data'], tf.uint8), tf.stack([frames,height,width,channel]))
 
-    # BGR to RGB
-    input_data_tensor = input_data_tensor[...,::-1]
+        # BGR to RGB
+        input_data_tensor = input_data_tensor[...,::-1]
+
+    else:
+        # Encoded images are already decoded as RGB
+        input_data_tensor = _decode_frames(features['EncodedFrames'], record_format)
+
+    # END IF
 
     # Reduction in fps to 25 for HMDB51 dataset
     if 'HMDB51' in dataset:
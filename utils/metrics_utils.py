@@ -20,6 +20,8 @@ class Metrics():
         :get_accuracy:
         :get_predictions_array:
         :clear_all:
+        :close_shard:
+        :merge_shard:
         :_save_prediction:
         :_avg_pooling_classify:
         :_last_frame_classify:
@@ -118,6 +120,66 @@ class Metrics():
         self.predictions_array = []
 
 
+    def close_shard(self):
+        """
+        Close the predictions logged while evaluating one shard of the videos, marking them complete for merge_shard
+        Args:
+            None
+        Return:
+            None
+        """
+        self.save_file.attrs['complete'] = 1
+        self.save_file.close()
+
+
+    def merge_shard(self, shard_metrics_dir):
+        """
+        Add the predictions logged by the evaluation of one shard of the videos, as if they were logged by this object
+        The shards hold disjoint videos, the classification of the merged predictions matches a single evaluation of every video
+        Args:
+            :shard_metrics_dir: Name of the sub directory within the experiment storing the metrics of the shard
+        Return:
+            None
+        """
+        shard_path = os.path.join('results', self.model_name, self.dataset, self.preproc_method, self.exp_name, shard_metrics_dir, 'temp'+self.method+'.hdf5')
+
+        if not os.path.isfile(shard_path):
+            print "Error: Predictions of shard " + shard_metrics_dir + " are missing. Evaluate every shard before merging."
+            exit()
+
+        # END IF
+
+        try:
+            shard_file = h5py.File(shard_path, 'r')
+            complete   = shard_file.attrs.get('complete', 0)
+
+        except IOError:
+            # The file of a shard interrupted while logging can not be opened
+            complete   = 0
+
+        # END TRY
+
+        if not complete:
+            print "Error: Predictions of shard " + shard_metrics_dir + " are incomplete. Evaluate every shard before merging."
+            exit()
+
+        # END IF
+
+        for vid_name in shard_file.keys():
+            if vid_name in self.save_file.keys():
+                print "Error: Video " + vid_name + " was evaluated by several shards."
+                exit()
+
+            # END IF
+
+            shard_file.copy(vid_name, self.save_file)
+            self.file_name_dict[vid_name] = len(shard_file[vid_name]['Data'].keys())
+
+        # END FOR
+
+        shard_file.close()
+
+
     def log_prediction(self, label, predictions, names, step):
         """
         Args:
@@ -39,6 +39,8 @@ www.robots.ox.ac.uk/~vgg/research/very_deep/
 import tensorflow as tf
 import numpy      as np
 
+import utils.temporal_index_utils as temporal_index_utils
+
 # Imagenet mean rgb values
 # Used for normalization in models pretrained on imagenet
 _R_MEAN = 123.68
@@ -51,20 +53,24 @@ RESIZE_SIDE_MAX = 512
 
 def random_flip_left_right_clip(clip):
     """Flips the entire clip horizontally with a 50% liklihood.
+    All frames are flipped by a single op, clips may be batched as [clips, frames, height, width, channels].
     Args:
     clip: a tensorflow variable clip of shape [frames, height, width, channels]
     Returns:
-          a clip of the same shape as the input, possibly flipped.
+          a float clip of the same shape as the input, possibly flipped.
     """
+    clip    = tf.convert_to_tensor(clip)
+    rank    = clip.get_shape().ndims
     to_flip = tf.random_uniform(dtype=tf.float32, minval=0, maxval=1, shape=np.asarray([1]))[0]
-    clip = tf.map_fn(lambda img: tf.cond(tf.greater_equal(to_flip, 0.5),
-                                    lambda: tf.image.flip_left_right(img),
-                                    lambda:tf.to_float(img)),
-                                    clip)
+    clip    = tf.cond(tf.greater_equal(to_flip, 0.5),
+                      lambda: tf.to_float(tf.reverse(clip, axis=[rank-2])),
+                      lambda: tf.to_float(clip))
     return clip
 
 def crop_clip(clip, offset_height, offset_width, crop_height, crop_width):
     """Crops the given clip height and width using the provided offsets and sizes.
+    All frames are cropped by a single slice and the crop size is only checked once per clip, clips may be batched
+    as [clips, frames, height, width, channels].
     Args:
     clip: a tensorflow variable clip of shape [frames, height, width, channels].
     offset_height: a scalar tensor indicating the height offset.
@@ -74,9 +80,27 @@ def crop_clip(clip, offset_height, offset_width, crop_height, crop_width):
     Returns:
     the cropped clip.
     """
+    clip           = tf.convert_to_tensor(clip)
+    rank           = clip.get_shape().ndims
     original_shape = tf.shape(clip)
-    clip = tf.map_fn(lambda img: crop(img, offset_height, offset_width, crop_height, crop_width), clip)
-    cropped_shape = tf.stack([original_shape[0], crop_height, crop_width, original_shape[3]])
+
+    size_assertion = tf.Assert(
+        tf.logical_and(
+            tf.greater_equal(original_shape[rank-3], crop_height),
+            tf.greater_equal(original_shape[rank-2], crop_width)),
+        ['Crop size greater than the image size.'])
+
+    offsets    = tf.to_int32(tf.stack([offset_height, offset_width]))
+    crop_sizes = tf.to_int32(tf.stack([crop_height, crop_width]))
+
+    # Leading (batch and frame) dimensions and channels are kept entirely
+    begin = tf.concat([tf.zeros([rank-3], dtype=tf.int32), offsets, [0]], 0)
+    size  = tf.concat([tf.fill([rank-3], -1), crop_sizes, [-1]], 0)
+
+    with tf.control_dependencies([size_assertion]):
+        clip = tf.slice(clip, begin, size)
+
+    cropped_shape = tf.concat([original_shape[:rank-3], crop_sizes, original_shape[rank-1:]], 0)
     return tf.reshape(clip, cropped_shape)
 
 
@@ -91,13 +115,13 @@ def random_crop_clip(clip, crop_height, crop_width):
     Returns:
     the cropped clip.
     """
+    clip           = tf.convert_to_tensor(clip)
+    rank           = clip.get_shape().ndims
     original_shape = tf.shape(clip)
 
-    offset_height = tf.random_uniform([], 0, tf.cast(original_shape[1] - crop_height, tf.float32))
-    offset_width = tf.random_uniform([], 0, tf.cast(original_shape[2] - crop_width, tf.float32))
-    clip = tf.map_fn(lambda img: crop(img, offset_height, offset_width, crop_height, crop_width), clip)
-    cropped_shape = tf.stack([original_shape[0], crop_height, crop_width, original_shape[3]])
-    return tf.reshape(clip, cropped_shape)
+    offset_height = tf.random_uniform([], 0, tf.cast(original_shape[rank-3] - crop_height, tf.float32))
+    offset_width = tf.random_uniform([], 0, tf.cast(original_shape[rank-2] - crop_width, tf.float32))
+    return crop_clip(clip, offset_height, offset_width, crop_height, crop_width)
 
 def central_crop_clip(clip, crop_height, crop_width):
     """Crops the given clip height and width to the provided sizes using random offsets.
@@ -110,18 +134,70 @@ def central_crop_clip(clip, crop_height, crop_width):
     Returns:
     the cropped clip.
     """
+    clip           = tf.convert_to_tensor(clip)
+    rank           = clip.get_shape().ndims
     original_shape = tf.shape(clip)
 
-    image_height = original_shape[1]
-    image_width  = original_shape[2]
+    image_height = original_shape[rank-3]
+    image_width  = original_shape[rank-2]
 
     offset_height = (image_height - crop_height) / 2
     offset_width = (image_width - crop_width) / 2
 
-    clip = tf.map_fn(lambda img: crop(img, offset_height, offset_width, crop_height, crop_width), clip)
-    cropped_shape = tf.stack([original_shape[0], crop_height, crop_width, original_shape[3]])
+    return crop_clip(clip, offset_height, offset_width, crop_height, crop_width)
 
-    return tf.reshape(clip, cropped_shape)
+def oversample_clip(clip, crop_dims):
+    """Crop every frame of a clip into the four corners, center, and their mirrored versions.
+    Equivalent to applying oversample to each frame, without padding frames for tf.map_fn.
+    Args:
+        :clip:      A clip of shape [frames, height, width, channels]
+        :crop_dims: List detailing final height and width of cropped frames.
+
+    Return:
+        :crops:     Tensor of shape [10*frames, crop_height, crop_width, channels], the 10 crops of each frame are consecutive
+    """
+    clip     = tf.convert_to_tensor(clip)
+    shape    = tf.shape(clip)
+    crop_h   = crop_dims[0]
+    crop_w   = crop_dims[1]
+    offset_h = shape[1] - crop_h
+    offset_w = shape[2] - crop_w
+
+    crops = []
+
+    for h in [0, offset_h]:
+        for w in [0, offset_w]:
+            crops.append(crop_clip(clip, h, w, crop_h, crop_w))
+
+    crops.append(central_crop_clip(clip, crop_h, crop_w))
+
+    # Mirror the crops
+    for i in range(len(crops)):
+        crops.append(tf.reverse(crops[i], axis=[2]))
+
+    crops = tf.stack(crops, axis=1)
+
+    return tf.reshape(crops, tf.stack([-1, crop_h, crop_w, shape[3]]))
+
+def rot90_clip(clip):
+    """Rotate every frame of a clip by 90 degrees counter-clockwise, matching tf.image.rot90 with k=1.
+    Args:
+        :clip: A clip of shape [frames, height, width, channels]
+
+    Return:
+        :clip: The rotated clip of shape [frames, width, height, channels]
+    """
+    return tf.transpose(tf.reverse(clip, axis=[2]), [0, 2, 1, 3])
+
+def quantize_clip(clip):
+    """Round a clip resized or cropped in float back to uint8, for models that normalize their inputs on the device.
+    Args:
+        :clip: A float clip of any shape with pixel values in [0, 255]
+
+    Return:
+        :clip: The uint8 clip, a quarter of the size of the float clip
+    """
+    return tf.saturate_cast(tf.round(clip), tf.uint8)
 
 def crop(image, offset_height, offset_width, crop_height, crop_width):
     """Crops the given image using the provided offsets and sizes.
@@ -332,6 +408,23 @@ def mean_image_subtraction(image, means):
   return tf.concat(axis=2, values=channels)
 
 
+def mean_clip_subtraction(clip, means):
+  """Subtracts the given means from each channel of every frame of a clip with a single op.
+  Args:
+    clip: a float tensor of size [..., height, width, C], e.g. [frames, height, width, C].
+    means: a C-vector of values to subtract from each channel.
+  Returns:
+    the centered clip.
+  Raises:
+    ValueError: If the number of channels in `clip` is unknown or doesn't match
+      the number of values in `means`.
+  """
+  num_channels = clip.get_shape().as_list()[-1]
+  if num_channels is None or len(means) != num_channels:
+    raise ValueError('len(means) must match the number of channels')
+  return clip - tf.constant(means, dtype=clip.dtype)
+
+
 def smallest_size_at_least(height, width, smallest_side):
   """Computes new shape with the smallest side equal to `smallest_side`.
   Computes new shape with the smallest side equal to `smallest_side` while
@@ -385,6 +478,41 @@ def largest_size_at_least(height, width, largest_side):
 
   return new_height, new_width
 
+def _resize_if_needed(image, new_height, new_width):
+  """Bilinearly resize images only if they do not already have the requested size.
+  Videos stored pre-resized by generate_tfrecords_dataset (--short_side) already
+  match the size expected by a model, in which case the resize is skipped.
+  Args:
+    :image:      A 3-D image, 4-D clip or 5-D batch of clips `Tensor`.
+    :new_height: Height of the image after resize
+    :new_width:  Width of the image after resize
+
+  Returns:
+    :resized_image: A float tensor with the same rank as image.
+  """
+  image = tf.convert_to_tensor(image)
+  shape = tf.shape(image)
+  rank  = image.get_shape().ndims
+
+  same_size = tf.logical_and(tf.equal(shape[rank-3], new_height),
+                             tf.equal(shape[rank-2], new_width))
+
+  def _resize():
+    if rank == 3:
+      return tf.image.resize_bilinear(tf.expand_dims(image, 0), [new_height, new_width],
+                                      align_corners=True)[0]
+
+    # END IF
+
+    # Batched clips are resized as one large batch of frames
+    frames  = tf.reshape(image, tf.concat([[-1], shape[rank-3:]], 0))
+    resized = tf.image.resize_bilinear(frames, [new_height, new_width],
+                                       align_corners=True)
+    return tf.reshape(resized, tf.concat([shape[:rank-3], tf.shape(resized)[1:]], 0))
+
+  return tf.cond(same_size, lambda: tf.to_float(image), _resize)
+
+
 def resize(image, new_height, new_width):
   """Resize images
   Args:
@@ -396,14 +524,47 @@ def resize(image, new_height, new_width):
     :resized_image: A 3-D tensor containing the resized image.
   """
 
-  image = tf.expand_dims(image, 0)
-  resized_image = tf.image.resize_bilinear(image, [new_height, new_width],
-                                           align_corners=True)
-  resized_image = tf.squeeze(resized_image)
+  resized_image = _resize_if_needed(image, new_height, new_width)
   resized_image.set_shape([None, None, 3])
   return resized_image
 
 
+def resize_clip(clip, new_height, new_width):
+  """Resize every frame of a clip with a single op
+  Args:
+    :clip:          A 4-D clip `Tensor` of shape [frames, height, width, channels], or a 5-D batch of clips.
+    :new_height:    Height of the frames after resize
+    :new_width:     Width of the frames after resize
+
+  Returns:
+    :resized_clip:  A tensor of the same rank containing the resized clip.
+  """
+
+  clip         = tf.convert_to_tensor(clip)
+  resized_clip = _resize_if_needed(clip, new_height, new_width)
+  resized_clip.set_shape([None]*(clip.get_shape().ndims-1) + [3])
+  return resized_clip
+
+
+def aspect_preserving_resize_clip(clip, smallest_side):
+  """Resize every frame of a clip with a single op, preserving the original aspect ratio.
+  Args:
+    clip: A 4-D clip `Tensor` of shape [frames, height, width, channels], or a 5-D batch of clips.
+    smallest_side: A python integer or scalar `Tensor` indicating the size of
+      the smallest side after resize.
+  Returns:
+    resized_clip: A tensor of the same rank containing the resized clip.
+  """
+  clip  = tf.convert_to_tensor(clip)
+  rank  = clip.get_shape().ndims
+  shape = tf.shape(clip)
+
+  new_height, new_width = smallest_size_at_least(shape[rank-3], shape[rank-2], smallest_side)
+  resized_clip = _resize_if_needed(clip, new_height, new_width)
+  resized_clip.set_shape([None]*(rank-1) + [3])
+  return resized_clip
+
+
 def aspect_preserving_resize(image, smallest_side):
   """Resize images preserving the original aspect ratio.
   Args:
@@ -419,10 +580,7 @@ def aspect_preserving_resize(image, smallest_side):
   height = shape[0]
   width = shape[1]
   new_height, new_width = smallest_size_at_least(height, width, smallest_side)
-  image = tf.expand_dims(image, 0)
-  resized_image = tf.image.resize_bilinear(image, [new_height, new_width],
-                                           align_corners=True)
-  resized_image = tf.squeeze(resized_image)
+  resized_image = _resize_if_needed(image, new_height, new_width)
   resized_image.set_shape([None, None, 3])
   return resized_image
 
@@ -489,13 +647,8 @@ def resample_input(video, sample_dims, frame_count, alpha):
         Sampled video
     """
 
-    sample_dims = tf.cast(sample_dims, tf.float32)
-    indices = tf.range(start=0., limit=sample_dims, delta=1., dtype=tf.float32)
-    r_alpha = alpha * tf.cast(frame_count, tf.float32) / sample_dims
-    indices = tf.multiply(tf.tile([r_alpha], [tf.cast(sample_dims, tf.int32)]), indices)
-    indices = tf.clip_by_value(indices, 0., tf.cast(frame_count-1, tf.float32))
-    indices = tf.cast(indices, tf.int32)
-    output  = tf.gather(video, tf.convert_to_tensor(indices))
+    indices = temporal_index_utils.resample_indices(sample_dims, frame_count, alpha)
+    output  = tf.gather(video, indices)
     return output
 
 def resample_model(video, sample_dims, frame_count, alpha):
@@ -509,12 +662,8 @@ def resample_model(video, sample_dims, frame_count, alpha):
         Sampled video
     """
 
-    indices = tf.range(start=0., limit=float(sample_dims), delta=1., dtype=tf.float32)
-    r_alpha = alpha * tf.cast(frame_count, tf.float32) / float(sample_dims)
-    indices = tf.multiply(tf.tile([r_alpha], [int(sample_dims)]), indices)
-    indices = tf.clip_by_value(indices, 0., tf.cast(frame_count-1, tf.float32))
-    indices = tf.cast(indices, tf.int32)
-    output  = tf.gather(video, tf.convert_to_tensor(indices))
+    indices = temporal_index_utils.resample_indices(sample_dims, frame_count, alpha)
+    output  = tf.gather(video, indices)
     return output
 
 
@@ -533,14 +682,9 @@ def resample_model_sinusoidal(video, sample_dims, frame_count, tracker):
     upper_limit = 3.0
     lower_limit = 0.2
 
-    indices = tf.range(start=0., limit=float(sample_dims), delta=1., dtype=tf.float32)
-
     # Sinusoidal variation with alpha being the DC offset
-    r_alpha = (alpha + (upper_limit - lower_limit) / 2.0 * tf.sin(tf.cast(tracker,tf.float32))) * tf.cast(frame_count, tf.float32) / float(sample_dims)
-
-    indices = tf.multiply(tf.tile([r_alpha], [int(sample_dims)]), indices)
-    indices = tf.clip_by_value(indices, 0., tf.cast(frame_count-1, tf.float32))
+    alpha   = alpha + (upper_limit - lower_limit) / 2.0 * tf.sin(tf.cast(tracker,tf.float32))
 
-    indices = tf.cast(indices, tf.int32)
-    output  = tf.gather(video, tf.convert_to_tensor(indices))
-    return output, (alpha + (upper_limit - lower_limit) / 2.0 * tf.sin(tf.cast(tracker,tf.float32)))
+    indices = temporal_index_utils.resample_indices(sample_dims, frame_count, alpha)
+    output  = tf.gather(video, indices)
+    return output, alpha
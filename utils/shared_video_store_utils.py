@@ -0,0 +1,120 @@
+"""
+VIDEO STORES SHARED BY CONCURRENT TRAINING AND TESTING PROCESSES
+
+The first process using a split (dataset, split, fName) decodes its tfrecords once into a video store below a shared
+root directory, typically on /dev/shm, while every other process waits on a file lock. Stores are keyed by the path and
+the file sizes and modification times of the tfrecords they were decoded from, so copies of a split at different paths
+(e.g. downscaled records) and regenerated records are decoded into stores of their own. All processes then memory map
+the same store read-only, so the decoded frames are held once in shared memory by the page cache instead of every
+process reading and decoding the tfrecords on its own.
+
+Stores are kept until removed, e.g. rm -rf /dev/shm/mpact_video_stores once every process using them has finished.
+"""
+
+import os
+import json
+import fcntl
+import shutil
+import hashlib
+
+import tensorflow as tf
+
+from utils.video_store_utils               import is_video_store, VIDEO_STORE_DATA
+from utils.convert_tfrecords_to_video_store import convert_tfrecords
+from utils.dataset_manifest_utils          import record_fingerprint
+
+
+def shared_store_path(shared_store_root, data_path, dataset, split, f_name):
+    """
+    Args:
+        :shared_store_root: Root directory of the shared video stores
+        :data_path:         Split directory containing the tfrecords files
+        :dataset:           Name of dataset being processed
+        :split:             Split of dataset being processed
+        :f_name:            Prefix of the split directory (trainlist or testlist)
+
+    Return:
+        Directory of the shared video store of the tfrecords currently in data_path
+    """
+    key = hashlib.sha1(json.dumps({'data_path': os.path.abspath(data_path), 'records': record_fingerprint(data_path)}, sort_keys=True)).hexdigest()
+
+    return os.path.join(shared_store_root, 'tfrecords_'+dataset, 'Split'+str(split), f_name, key)
+
+
+def attach_shared_store(data_path, shared_store_root, dataset, split, f_name, verbose=True):
+    """
+    Attach to the shared video store of a split, building it from the tfrecords in data_path if no process has yet
+    Args:
+        :data_path:         Split directory containing the tfrecords files
+        :shared_store_root: Root directory of the shared video stores
+        :dataset:           Name of dataset being processed
+        :split:             Split of dataset being processed
+        :f_name:            Prefix of the split directory (trainlist or testlist)
+        :verbose:           Boolean indicating whether to print the state of the store
+
+    Return:
+        Directory of the shared video store, read by load_dataset in place of data_path
+    """
+    # Splits already converted to a video store are memory mapped directly
+    if is_video_store(data_path):
+        return data_path
+
+    # END IF
+
+    store_path = shared_store_path(shared_store_root, data_path, dataset, split, f_name)
+
+    if not is_video_store(store_path):
+        if not os.path.isdir(os.path.dirname(store_path)):
+            try:
+                os.makedirs(os.path.dirname(store_path))
+
+            except OSError:
+                # Created by a concurrent process
+                pass
+
+            # END TRY
+
+        # END IF
+
+        # A single process builds the store, the others block until the lock is released and then find the complete store
+        lock_file = open(store_path + '.lock', 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            if not is_video_store(store_path):
+                if verbose:
+                    print "Building shared video store of ", data_path, " in ", store_path
+
+                # END IF
+
+                # Stores left incomplete by an interrupted process are rebuilt, the complete store only appears once renamed
+                partial_path = store_path + '.partial'
+
+                if os.path.isdir(partial_path):
+                    shutil.rmtree(partial_path)
+
+                # END IF
+
+                with tf.Graph().as_default():
+                    convert_tfrecords(data_path, partial_path)
+
+                # END WITH
+
+                os.rename(partial_path, store_path)
+
+            # END IF
+
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+        # END TRY
+
+    # END IF
+
+    if verbose:
+        print "Attached to shared video store ", store_path, " (%.1f MB)" % (os.path.getsize(os.path.join(store_path, VIDEO_STORE_DATA))/(1024.*1024.))
+
+    # END IF
+
+    return store_path
@@ -0,0 +1,377 @@
+"""
+FRAME INDEX COMPUTATION SHARED BY THE INPUT PIPELINE AND MODEL PREPROCESSING
+
+Every temporal transform applied to a video (fps reduction, reversal, looping, resampling and clip extraction) only
+selects frames, so each transform is expressed as a vector (or matrix) of frame indices. Transforms are composed by
+indexing one index tensor with another and the frames themselves are gathered once, with the final indices, instead of
+materializing an intermediate copy of the video after every transform.
+Index computations whose inputs are python numbers are evaluated with numpy and enter the graph as constants.
+TemporalPlan collects the transforms of the loader and of a model's preprocessing and fuses them into one gather per clip.
+"""
+
+import numbers
+import fractions
+
+import numpy      as np
+import tensorflow as tf
+
+
+def _is_static(*values):
+    """
+    Return:
+        Boolean indicating whether all values are python (or numpy) numbers rather than tensors
+    """
+    return all(isinstance(value, numbers.Number) for value in values)
+
+
+def reduce_fps_indices(frame_count, source_fps=30, target_fps=25):
+    """
+    Indices of the frames kept when dropping frames from a source_fps video to match target_fps
+    Out of every source_fps/gcd consecutive frames the first target_fps/gcd frames are kept, i.e. for 30 to 25 fps
+    the indices are [0,1,2,3,4,6,7,8,9,10,12,...]
+    Args:
+        :frame_count: Total number of frames in the video
+        :source_fps:  Frame rate the video was captured at
+        :target_fps:  Frame rate after dropping frames
+
+    Return:
+        Indices of the kept frames and the number of kept frames
+    """
+    divisor = fractions.gcd(source_fps, target_fps)
+    period  = source_fps / divisor
+    keep    = target_fps / divisor
+
+    if _is_static(frame_count):
+        output_frames = (frame_count / period) * keep + min(frame_count % period, keep)
+        positions     = np.arange(output_frames, dtype=np.int32)
+
+        return tf.constant((positions / keep) * period + positions % keep), output_frames
+
+    # END IF
+
+    output_frames = (frame_count / period) * keep + tf.minimum(frame_count % period, keep)
+    positions     = tf.range(output_frames)
+
+    return (positions / keep) * period + positions % keep, output_frames
+
+
+def reverse_indices(indices):
+    """
+    Args:
+        :indices: Frame indices of a video, shape [frames]
+
+    Return:
+        The frame indices in reverse order
+    """
+    return tf.reverse(indices, axis=[0])
+
+
+def loop_indices(frame_count, footprint, offset=0):
+    """
+    Indices of a video looped as many times as necessary to provide footprint frames starting from frame offset
+    Args:
+        :frame_count: Total number of frames in the video
+        :footprint:   Number of frames required
+        :offset:      Frame the looped video begins with
+
+    Return:
+        Indices of shape [footprint]
+    """
+    if _is_static(frame_count, footprint, offset):
+        return tf.constant((np.arange(footprint, dtype=np.int32) + offset) % frame_count)
+
+    # END IF
+
+    return tf.mod(tf.range(footprint) + offset, frame_count)
+
+
+def resample_indices(sample_dims, frame_count, alpha):
+    """
+    Indices of a video uniformly sampled down (or up) to sample_dims frames at a relative sampling rate of alpha
+    The float index ramp is evaluated in float32 exactly as in the original resampling functions.
+    Args:
+        :sample_dims: Number of frames to sample
+        :frame_count: Total number of frames
+        :alpha:       Relative sampling rate
+
+    Return:
+        Indices of shape [sample_dims]
+    """
+    if _is_static(sample_dims, frame_count, alpha):
+        r_alpha = np.float32(alpha) * np.float32(frame_count) / np.float32(sample_dims)
+        indices = np.arange(int(sample_dims), dtype=np.float32) * r_alpha
+        indices = np.clip(indices, np.float32(0.), np.float32(frame_count-1))
+
+        return tf.constant(indices.astype(np.int32))
+
+    # END IF
+
+    # The ramp is kept as an elementwise product with a tiled rate, rewriting it as a product with a scalar allows graph
+    # optimizations to change the rounding of the indices
+    sample_dims = tf.cast(sample_dims, tf.float32)
+    indices     = tf.range(start=0., limit=sample_dims, delta=1., dtype=tf.float32)
+    r_alpha     = alpha * tf.cast(frame_count, tf.float32) / sample_dims
+    indices     = tf.multiply(tf.tile([r_alpha], [tf.cast(sample_dims, tf.int32)]), indices)
+    indices     = tf.clip_by_value(indices, 0., tf.cast(frame_count-1, tf.float32))
+
+    return tf.cast(indices, tf.int32)
+
+
+def clip_window_indices(frame_count, num_clips, clip_offset, clip_length, video_offset, clip_stride):
+    """
+    Indices of the frames of every clip extracted from a video, videos that are too short are looped by wrapping
+    the indices around the video
+    Args:
+        :frame_count:  Total number of frames in the video
+        :num_clips:    Number of clips to break video into, values <= 0 extract as many clips as the video contains
+        :clip_offset:  "none" or "random" indicating where to begin selecting video clips
+        :clip_length:  Length of clips to cut video into
+        :video_offset: "none" or "random" indicating where to begin selecting clips within the video
+        :clip_stride:  Number of frames that overlap between clips, 0 indicates no overlap and negative values indicate a gap of frames between clips
+
+    Return:
+        Indices of shape [num_clips, clip_length]
+    """
+    if video_offset == 'random':
+        video_start = tf.random_uniform([], maxval=frame_count-1, dtype=tf.int32)
+
+    else:
+        video_start = 0
+
+    # END IF
+
+    if clip_offset == 'random':
+        # Length of the video after looping it enough times to contain at least one clip
+        looped_frames = tf.cond(tf.greater(clip_length, frame_count),
+                                lambda: frame_count * (tf.cast(tf.add(tf.divide(clip_length, frame_count), 1), tf.int32) + 1),
+                                lambda: frame_count)
+
+        clip_begin  = tf.random_uniform([num_clips], minval=0, maxval=looped_frames-clip_length+1, dtype=tf.int32)
+        video_start = 0
+
+    else:
+        if num_clips > 0:
+            clip_begin = tf.constant(np.arange(num_clips, dtype=np.int32) * (clip_length-clip_stride))
+
+        else:
+            # Need minimum one clip: loop video until at least have clip_length frames
+            number_of_clips = tf.cond(tf.greater(clip_length, frame_count-video_start),
+                            lambda: 1,
+                            lambda: (frame_count-video_start-clip_length) / (clip_length - clip_stride) + 1)
+
+            clip_begin = tf.range(number_of_clips) * (clip_length-clip_stride)
+
+        # END IF
+
+    # END IF
+
+    # Looping a video starting from video_start is equivalent to wrapping frame indices around the length of the video
+    clip_indices = tf.expand_dims(clip_begin, 1) + tf.expand_dims(tf.range(clip_length), 0)
+
+    return tf.mod(clip_indices + video_start, frame_count)
+
+
+def compose_indices(indices, positions):
+    """
+    Apply a temporal transform expressed as positions to a video already transformed by indices
+    Args:
+        :indices:   Frame indices of the raw video selected by the previous transforms, shape [frames]
+        :positions: Positions within indices selected by the next transform, any shape
+
+    Return:
+        Frame indices of the raw video, same shape as positions
+    """
+    return tf.gather(indices, positions)
+
+
+class TemporalPlan():
+    """
+    A declarative list of the temporal steps applied to a video, fused into a single index computation so that the
+    frames of every clip are gathered once from the raw video.
+    Steps added before clip_windows (or whole_video) select frames from the entire video, steps added afterwards are
+    applied to every clip independently, e.g. the temporal preprocessing of a model.
+    Every step is a function taking the number of frames it receives and returning the positions it selects among them
+    and the resulting number of frames.
+    Methods:
+        :__init__:
+        :add_step:
+        :reduce_fps:
+        :reverse:
+        :loop:
+        :resample:
+        :clip_windows:
+        :whole_video:
+        :fork:
+        :indices:
+        :gather:
+    """
+
+    def __init__(self, frame_count):
+        """
+        Args:
+            :frame_count: Total number of frames of the video the plan is applied to
+        """
+        self.frame_count = frame_count
+        self.video_steps = []
+        self.clip_steps  = []
+        self.windows     = None
+
+    def add_step(self, step):
+        """
+        Args:
+            :step: Function mapping a number of frames to the selected positions (shape [new_frames]) and new_frames
+        """
+        if self.windows is None:
+            self.video_steps.append(step)
+
+        else:
+            self.clip_steps.append(step)
+
+        # END IF
+
+    def reduce_fps(self, source_fps=30, target_fps=25):
+        """
+        Drop frames to match target_fps from a video captured at source_fps
+        """
+        self.add_step(lambda frames: reduce_fps_indices(frames, source_fps, target_fps))
+
+    def reverse(self, condition=True):
+        """
+        Reverse the order of the frames, only when the boolean (tensor) condition holds
+        """
+        def _reverse(frames):
+            positions = tf.range(frames)
+
+            if condition is True:
+                return reverse_indices(positions), frames
+
+            # END IF
+
+            return tf.cond(condition, lambda: reverse_indices(positions), lambda: positions), frames
+
+        self.add_step(_reverse)
+
+    def loop(self, footprint, offset=0):
+        """
+        Loop the frames as many times as necessary to provide footprint frames starting from frame offset
+        """
+        self.add_step(lambda frames: (loop_indices(frames, footprint, offset), footprint))
+
+    def resample(self, sample_dims=None, alpha=1.0):
+        """
+        Uniformly resample the frames to sample_dims frames (the current number of frames when None) at a relative
+        sampling rate of alpha
+        """
+        def _resample(frames):
+            if sample_dims is None:
+                return resample_indices(frames, frames, alpha), frames
+
+            # END IF
+
+            return resample_indices(sample_dims, frames, alpha), sample_dims
+
+        self.add_step(_resample)
+
+    def clip_windows(self, num_clips, clip_offset, clip_length, video_offset, clip_stride):
+        """
+        Split the video into clips, see clip_window_indices
+        """
+        self.windows = lambda frames: (clip_window_indices(frames, num_clips, clip_offset, clip_length, video_offset, clip_stride), clip_length)
+
+    def whole_video(self):
+        """
+        Use the entire video as a single clip
+        """
+        self.windows = lambda frames: (tf.expand_dims(tf.range(frames), 0), frames)
+
+    def fork(self, count):
+        """
+        Split the plan into count plans that share the frames and clip windows selected so far, random draws made by
+        the steps and windows of the plan (e.g. clip offsets) are made once for all plans, steps added later to each
+        plan only apply to that plan
+        Args:
+            :count: Number of plans
+
+        Return:
+            List of count TemporalPlans
+        """
+        video_indices, video_frames = self._apply(self.video_steps, self.frame_count)
+        windows                     = None
+
+        if self.windows is not None:
+            clip_positions, clip_frames = self.windows(video_frames)
+            windows = lambda frames: (clip_positions, clip_frames)
+
+        # END IF
+
+        plans = []
+
+        for _ in range(count):
+            plan             = TemporalPlan(self.frame_count)
+            plan.video_steps = [lambda frames: (video_indices, video_frames)]
+            plan.clip_steps  = list(self.clip_steps)
+            plan.windows     = windows
+
+            plans.append(plan)
+
+        # END FOR
+
+        return plans
+
+    def _apply(self, steps, frames):
+        """
+        Compose steps into the positions they select from frames frames
+        """
+        positions = None
+
+        for step in steps:
+            step_positions, frames = step(frames)
+
+            if positions is None:
+                positions = step_positions
+
+            else:
+                positions = compose_indices(positions, step_positions)
+
+            # END IF
+
+        # END FOR
+
+        if positions is None:
+            positions = tf.range(frames)
+
+        # END IF
+
+        return positions, frames
+
+    def indices(self):
+        """
+        Return:
+            Frame indices of the raw video, shape [num_clips, clip_frames] once clip windows are set or [frames] otherwise
+        """
+        video_indices, frames = self._apply(self.video_steps, self.frame_count)
+
+        if self.windows is None:
+            return video_indices
+
+        # END IF
+
+        clip_positions, clip_frames = self.windows(frames)
+
+        if len(self.clip_steps) > 0:
+            # Steps may be random, every clip draws its own values
+            clip_positions = tf.map_fn(lambda positions: compose_indices(positions, self._apply(self.clip_steps, clip_frames)[0]), clip_positions)
+
+        # END IF
+
+        return compose_indices(video_indices, clip_positions)
+
+    def gather(self, video):
+        """
+        Args:
+            :video: Tensor of shape [frame_count, ...]
+
+        Return:
+            The frames of video selected by the plan
+        """
+        return tf.gather(video, self.indices())
@@ -0,0 +1,163 @@
+"""
+IN-MEMORY CACHE OF DECODED VIDEOS SHARED BY THE READER THREADS OF A PROCESS
+
+Videos read by their index in the dataset manifest are decoded (and reduced to 25 fps) once and kept as uint8 RGB
+arrays, later epochs gather the frames of their clips directly out of memory instead of reading, parsing and decoding
+the record again. Videos are evicted in least recently used order once the cached videos exceed the memory budget.
+Only the decoded video is cached, clip offsets, reversal, crops and flips are drawn again every time a video is loaded.
+"""
+
+import threading
+import collections
+
+import numpy      as np
+import tensorflow as tf
+
+
+class VideoCache():
+    """
+    A class that keeps decoded videos in memory within a memory budget, evicting the least recently used videos
+    Methods:
+        :__init__:
+        :__len__:
+        :hit_rate:
+        :load_video:
+        :stats:
+        :summary:
+    """
+
+    def __init__(self, memory_budget_mb):
+        """
+        Args:
+            :memory_budget_mb: Maximum size in megabytes of the decoded videos held by the cache
+        """
+        self.memory_budget  = int(memory_budget_mb*1024*1024)
+        self.videos         = collections.OrderedDict()
+        self.resident_bytes = 0
+        self.hits           = 0
+        self.misses         = 0
+        self.lock           = threading.Lock()
+
+    def __len__(self):
+        return len(self.videos)
+
+    def hit_rate(self):
+        """
+        Return:
+            Fraction of the loaded videos found in the cache
+        """
+        lookups = self.hits + self.misses
+
+        if lookups == 0:
+            return 0.0
+
+        # END IF
+
+        return float(self.hits) / lookups
+
+    def _lookup(self, video_index):
+        """
+        Return:
+            Boolean indicating whether the video is cached and the cached video (empty if it is not)
+        """
+        with self.lock:
+            video = self.videos.pop(int(video_index), None)
+
+            if video is None:
+                self.misses += 1
+
+                return False, np.zeros((0, 0, 0, 0), dtype=np.uint8)
+
+            # END IF
+
+            # Reinserting the video marks it as the most recently used
+            self.videos[int(video_index)] = video
+            self.hits += 1
+
+        # END WITH
+
+        return True, video
+
+    def _insert(self, video_index, video):
+        """
+        Cache a decoded video, evicting the least recently used videos until it fits within the memory budget
+        """
+        # Cached videos are shared by every later load, make sure that none of them modifies the cached frames
+        video = np.array(video, dtype=np.uint8)
+        video.setflags(write=False)
+
+        if video.nbytes > self.memory_budget:
+            return video
+
+        # END IF
+
+        with self.lock:
+            previous = self.videos.pop(int(video_index), None)
+
+            # Several reader threads can miss on the same video at once, only the last decoded copy is kept
+            if previous is not None:
+                self.resident_bytes -= previous.nbytes
+
+            # END IF
+
+            while self.resident_bytes + video.nbytes > self.memory_budget:
+                _, evicted = self.videos.popitem(last=False)
+                self.resident_bytes -= evicted.nbytes
+
+            # END WHILE
+
+            self.videos[int(video_index)] = video
+            self.resident_bytes          += video.nbytes
+
+        # END WITH
+
+        return video
+
+    def load_video(self, video_index, decode_fn):
+        """
+        Args:
+            :video_index: Scalar tensor indicating the index of the video in the manifest of the split
+            :decode_fn:   Function building the ops that read and decode the video, only run when the video is not cached
+
+        Return:
+            A uint8 tensor containing the decoded video (shape [frames, height, width, channel])
+        """
+        cached, video = tf.py_func(self._lookup, [video_index], [tf.bool, tf.uint8], stateful=True)
+        cached.set_shape([])
+        video.set_shape([None, None, None, None])
+
+        # Reading, parsing and decoding are built inside the branch so that they are skipped for cached videos
+        def _decode():
+            decoded = tf.py_func(self._insert, [video_index, decode_fn()], tf.uint8, stateful=True)
+            decoded.set_shape([None, None, None, None])
+
+            return decoded
+
+        return tf.cond(cached, lambda: video, _decode)
+
+    def _stats(self):
+        with self.lock:
+            return np.float32(self.hit_rate()), np.float32(self.resident_bytes/(1024.*1024.))
+
+        # END WITH
+
+    def stats(self):
+        """
+        Return:
+            Scalar tensors of the hit rate and of the size in megabytes of the cached videos
+        """
+        hit_rate, resident_mb = tf.py_func(self._stats, [], [tf.float32, tf.float32], stateful=True)
+        hit_rate.set_shape([])
+        resident_mb.set_shape([])
+
+        return hit_rate, resident_mb
+
+    def summary(self):
+        """
+        Return:
+            String describing the hit rate and memory use of the cache
+        """
+        with self.lock:
+            return "Video cache: %d videos, %.1f of %.1f MB resident, hit rate %.3f (%d hits, %d misses)" % (len(self.videos), self.resident_bytes/(1024.*1024.), self.memory_budget/(1024.*1024.), self.hit_rate(), self.hits, self.misses)
+
+        # END WITH
@@ -0,0 +1,201 @@
+"""
+SAMPLER DECIDING THE ORDER IN WHICH THE VIDEOS OF A SPLIT ARE LOADED
+
+The order of every epoch is a deterministic function of the seed and the epoch number. With bucket boundaries, videos
+are grouped by frame count into length buckets and consecutive videos (i.e. the videos of a batch) are taken from the
+same bucket, so videos of similar length are loaded, preprocessed and batched together. With several shards (one per
+tower), the groups of consecutive videos of every epoch are dealt round-robin between shards, so towers load disjoint
+videos.
+"""
+
+import bisect
+import threading
+
+import numpy as np
+
+
+def bucket_of(frames, bucket_boundaries):
+    """
+    Args:
+        :frames:            Number of frames of a video
+        :bucket_boundaries: Sorted list of frame counts separating buckets, bucket i holds videos with boundaries[i-1] <= frames < boundaries[i]
+
+    Return:
+        Index of the bucket of the video
+    """
+    return bisect.bisect_right(bucket_boundaries, frames)
+
+
+class VideoSampler():
+    """
+    A class that produces the indices of the videos of a split in the order they are loaded, epoch after epoch
+    Methods:
+        :__init__:
+        :epoch_groups:
+        :epoch_order:
+        :shard_position:
+        :next_index:
+        :indices:
+    """
+
+    def __init__(self, video_frames, shuffle=False, seed=0, bucket_boundaries=[], videos_per_batch=1, shard_index=0, num_shards=1):
+        """
+        Args:
+            :video_frames:      List containing the number of frames of every video of the split
+            :shuffle:           Boolean indicating whether to shuffle the videos of every epoch
+            :seed:              Seed of the shuffle, combined with the epoch number
+            :bucket_boundaries: Sorted list of frame counts separating length buckets, empty disables bucketing
+            :videos_per_batch:  Number of consecutive videos taken from the same bucket
+            :shard_index:       Index of the shard of videos produced by this sampler
+            :num_shards:        Number of shards the videos of every epoch are split into
+        """
+        self.video_frames      = list(video_frames)
+        self.shuffle           = shuffle
+        self.seed              = seed
+        self.bucket_boundaries = sorted(bucket_boundaries)
+        self.videos_per_batch  = max(videos_per_batch, 1)
+        self.shard_index       = shard_index
+        self.num_shards        = num_shards
+        self.position          = 0
+        self.lock              = threading.Lock()
+        self.order             = None
+        self.order_epoch       = None
+        self.order_start       = 0
+
+        if num_shards > (len(self.video_frames) + self.videos_per_batch - 1) / self.videos_per_batch:
+            raise ValueError('The split contains fewer batches of videos than the ' + str(num_shards) + ' shards requested')
+
+        # END IF
+
+    def epoch_groups(self, epoch):
+        """
+        Args:
+            :epoch: Epoch number
+
+        Return:
+            List of arrays of consecutive video indices (at most videos_per_batch each) of all shards, in the order they are loaded during the epoch
+        """
+        num_videos = len(self.video_frames)
+        rng        = np.random.RandomState(self.seed + epoch)
+
+        if len(self.bucket_boundaries) == 0:
+            if self.shuffle:
+                order = rng.permutation(num_videos)
+
+            else:
+                order = np.arange(num_videos)
+
+            # END IF
+
+            return [order[start:start+self.videos_per_batch] for start in range(0, num_videos, self.videos_per_batch)]
+
+        # END IF
+
+        buckets = {}
+
+        for video_index, frames in enumerate(self.video_frames):
+            buckets.setdefault(bucket_of(frames, self.bucket_boundaries), []).append(video_index)
+
+        # END FOR
+
+        # Split every bucket into groups of consecutive videos, groups of different buckets are interleaved when shuffling
+        groups = []
+
+        for bucket in sorted(buckets.keys()):
+            videos = np.array(buckets[bucket])
+
+            if self.shuffle:
+                videos = rng.permutation(videos)
+
+            # END IF
+
+            groups.extend([videos[start:start+self.videos_per_batch] for start in range(0, len(videos), self.videos_per_batch)])
+
+        # END FOR
+
+        if self.shuffle:
+            groups = [groups[group_index] for group_index in rng.permutation(len(groups))]
+
+        # END IF
+
+        return groups
+
+    def epoch_order(self, epoch):
+        """
+        Args:
+            :epoch: Epoch number
+
+        Return:
+            Array of the indices of the videos of this shard in the order they are loaded during the epoch
+        """
+        return np.concatenate(self.epoch_groups(epoch)[self.shard_index::self.num_shards])
+
+    def shard_position(self, position):
+        """
+        Args:
+            :position: Number of videos loaded by all shards together, taking one group of videos per shard in turn
+
+        Return:
+            Number of those videos loaded by this shard
+        """
+        shard_videos = 0
+        epoch        = 0
+
+        while position > 0:
+            for group_index, group in enumerate(self.epoch_groups(epoch)):
+                if position <= 0:
+                    break
+
+                # END IF
+
+                if group_index % self.num_shards == self.shard_index:
+                    shard_videos += min(len(group), position)
+
+                # END IF
+
+                position -= len(group)
+
+            # END FOR
+
+            epoch += 1
+
+        # END WHILE
+
+        return shard_videos
+
+    def next_index(self):
+        """
+        Return:
+            Index of the next video to load, thread safe
+        """
+        with self.lock:
+            # Epochs of a shard differ in length when groups of a length bucket are not full, they are walked from the first epoch
+            if self.order is None or self.position < self.order_start:
+                self.order       = self.epoch_order(0)
+                self.order_epoch = 0
+                self.order_start = 0
+
+            # END IF
+
+            while self.position >= self.order_start + len(self.order):
+                self.order_start += len(self.order)
+                self.order_epoch += 1
+                self.order        = self.epoch_order(self.order_epoch)
+
+            # END WHILE
+
+            offset         = self.position - self.order_start
+            self.position += 1
+
+            return np.int64(self.order[offset])
+
+        # END WITH
+
+    def indices(self):
+        """
+        Generator looping over the videos indefinitely, used by tf.data.Dataset.from_generator
+        """
+        while True:
+            yield self.next_index()
+
+        # END WHILE
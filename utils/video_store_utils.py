@@ -0,0 +1,167 @@
+"""
+MEMORY-MAPPED RAW VIDEO STORE USED AS AN ALTERNATIVE TO TFRECORDS
+
+All videos of a split are stored back to back as uint8 RGB frames in a single raw file, an index lists the offset,
+shape, label and name of every video. The raw file is memory mapped when read, so loading a clip only copies the
+frames selected for it instead of parsing a protobuf and copying the entire video into a string tensor.
+"""
+
+import os
+import json
+
+import numpy      as np
+import tensorflow as tf
+
+# Files stored within the directory of a video store
+VIDEO_STORE_INDEX = 'video_store.json'
+VIDEO_STORE_DATA  = 'video_store.dat'
+
+
+def is_video_store(path):
+    """
+    Args:
+        :path: Directory of a dataset split
+
+    Return:
+        Boolean indicating whether the directory contains a complete video store
+    """
+    return os.path.isfile(os.path.join(path, VIDEO_STORE_INDEX))
+
+
+class VideoStore():
+    """
+    A class that reads videos out of a memory-mapped video store
+    Methods:
+        :__init__:
+        :__len__:
+        :index_of:
+        :features:
+        :gather_clips:
+    """
+
+    def __init__(self, store_dir):
+        """
+        Args:
+            :store_dir: Directory containing the video store of a split
+        """
+        index_file = open(os.path.join(store_dir, VIDEO_STORE_INDEX), 'r')
+        self.videos = json.load(index_file)['videos']
+        index_file.close()
+
+        self.data = np.memmap(os.path.join(store_dir, VIDEO_STORE_DATA), dtype=np.uint8, mode='r')
+
+    def __len__(self):
+        return len(self.videos)
+
+    def index_of(self, vid_name):
+        """
+        Args:
+            :vid_name: Name of a video
+
+        Return:
+            Index of the video within the store, None if the store does not contain the video
+        """
+        for video_index, video in enumerate(self.videos):
+            if video['name'] == vid_name:
+                return video_index
+
+            # END IF
+
+        # END FOR
+
+        return None
+
+    def features(self, video_index):
+        """
+        Look up the description of a video, mirrors the features parsed from a tfrecords example
+        Args:
+            :video_index: Scalar tensor indicating the index of the video within the store
+
+        Return:
+            Dictionary containing the Frames, Height, Width, Channels, Label and Name of the video
+        """
+        features = {}
+
+        for feature, key in [('Frames', 'frames'), ('Height', 'height'), ('Width', 'width'), ('Channels', 'channels'), ('Label', 'label')]:
+            features[feature] = tf.gather(tf.constant([video[key] for video in self.videos], dtype=tf.int32), video_index)
+
+        # END FOR
+
+        features['Name'] = tf.gather(tf.constant([str(video['name']) for video in self.videos]), video_index)
+
+        return features
+
+    def _gather(self, video_index, clip_indices):
+        """
+        Copy the frames selected for each clip out of the memory-mapped store
+        """
+        video = self.videos[video_index]
+        shape = (video['frames'], video['height'], video['width'], video['channels'])
+        video = self.data[video['offset']:video['offset'] + np.prod(shape)].reshape(shape)
+
+        return video[clip_indices]
+
+    def gather_clips(self, video_index, clip_indices):
+        """
+        Args:
+            :video_index:  Scalar tensor indicating the index of the video within the store
+            :clip_indices: Frame indices selected for each clip, shape [num_clips, clip_frames]
+
+        Return:
+            A uint8 tensor containing the RGB clip(s) (shape [clip_number, clip_frames, height, width, channel])
+        """
+        clips = tf.py_func(self._gather, [video_index, clip_indices], tf.uint8, stateful=False)
+        clips.set_shape(clip_indices.get_shape().concatenate([None, None, None]))
+
+        return clips
+
+
+class VideoStoreWriter():
+    """
+    A class that appends videos to a new video store, the index is only written once every video has been stored so
+    that incomplete stores are never read
+    Methods:
+        :__init__:
+        :add:
+        :close:
+    """
+
+    def __init__(self, save_dir):
+        """
+        Args:
+            :save_dir: Directory in which the video store is written
+        """
+        if not os.path.isdir(save_dir):
+            os.makedirs(save_dir)
+
+        # END IF
+
+        self.save_dir  = save_dir
+        self.videos    = []
+        self.offset    = 0
+        self.data_file = open(os.path.join(save_dir, VIDEO_STORE_DATA), 'wb')
+
+    def add(self, video, label, name):
+        """
+        Append a video to the store
+        Args:
+            :video: uint8 RGB array of shape [frames, height, width, channels]
+            :label: Label of the video
+            :name:  Name of the video
+        """
+        video = np.ascontiguousarray(video, dtype=np.uint8)
+
+        self.data_file.write(video.tostring())
+        self.videos.append({'offset': self.offset, 'frames': video.shape[0], 'height': video.shape[1], 'width': video.shape[2],
+                            'channels': video.shape[3], 'label': int(label), 'name': name})
+        self.offset += video.size
+
+    def close(self):
+        """
+        Write the index of the video store
+        """
+        self.data_file.close()
+
+        index_file = open(os.path.join(self.save_dir, VIDEO_STORE_INDEX), 'w')
+        json.dump({'videos': self.videos}, index_file)
+        index_file.close()